@@ -1,12 +1,11 @@
 import datetime
-import glob
-from google_speech import Speech
 import numpy as np
-import pandas as pd
 from pygame.draw import polygon
 from pygame.font import SysFont
-from pygame_utilities import display_centered_text
-import time
+from pygame_utilities import (
+    display_centered_text,
+    text_cache,
+)
 
 from bead import (
     digitize,
@@ -14,16 +13,13 @@ from bead import (
     height_to_width,
 )
 import operation as op
+from scheduler import ReviewScheduler
 
 
 AS_SUFFIX = '_abacus_as.dat'
 DATE_FORMAT = '%Y_%m_%d'
 
 
-def get_data_filenames(suffix=AS_SUFFIX):
-    return glob.glob('*' + suffix)
-
-
 def date_to_filename(
         dt,
         suffix=AS_SUFFIX
@@ -35,37 +31,6 @@ def storage_filename():
     return date_to_filename(datetime.date.today())
 
 
-# Get listing of appropriate data files by date
-def get_dataset_dates(suffix=AS_SUFFIX):
-    dates = []
-    fns = get_data_filenames(suffix=suffix)
-
-    for fn in fns:
-        dt = datetime.datetime.strptime(
-            fn.split(suffix)[0], DATE_FORMAT
-        ).date()
-        dates.append(dt)
-    dates.sort()
-
-    return dates
-
-
-def read_as_data(date):
-    return pd.read_csv(
-        date_to_filename(date, suffix=AS_SUFFIX),
-        delimiter=',',
-        header=None,
-        names=[
-            'problem',
-            'response_time',
-            'response',
-            'correct',
-            'time_of_day',
-            'presentation_method',
-        ]
-    )
-
-
 def write_problem_result(
         stream,
         operands,
@@ -73,86 +38,103 @@ def write_problem_result(
         response_time,
         is_correct,
         number_style,
+        database=None,
+        scheduler=None,
+        skill_model=None,
+        attempt_key=None,
 ):
-    # n1, n2, time, answer, correct?
-    stream.write(
-        '{},{:.2f},{},{},{},{}\n'.format(
-            ';'.join(map(str, operands)),
-            response_time,
+    # n1, n2, time, answer, correct?, time of day, style[, attempt key]
+    if stream is not None:
+        stream.write(
+            '{},{:.3f},{},{},{},{}{}\n'.format(
+                ';'.join(map(str, operands)),
+                response_time,
+                response,
+                is_correct,
+                datetime.datetime.now().strftime('%Y-%m-%d-%H:%M:%S'),
+                number_style.name,
+                '' if attempt_key is None else ',{}'.format(attempt_key),
+            )
+        )
+    if database is not None:
+        database.record(
+            'abacus_as',
+            operands,
             response,
+            response_time,
             is_correct,
-            datetime.datetime.now().strftime('%Y-%m-%d-%H:%M:%S'),
             number_style.name,
         )
-    )
+    if scheduler is not None:
+        scheduler.add(operands, response_time, is_correct)
+    if skill_model is not None:
+        skill_model.add(operands, response_time, is_correct)
 
 
-def generate_problems(
+def generate_new_problem(
         addition_prob=.5,
         num_digits=6,
         num_operands=5,
-        new_problem_prob=.5,
-        previous_incorrect_prob=.4,
-        previous_slow_prob=.1,
+        op_freq=None,
 ):
-    if new_problem_prob + previous_incorrect_prob + previous_slow_prob != 1.:
-        raise ValueError('Problem selection probabilities must sum to 1.')
-
-    dates = get_dataset_dates()
-
-    add_digit_pair_prob = op.digit_pair_prob(
-        np.ones(op.OPERATION_COUNT) / op.OPERATION_COUNT,
+    """Generates a problem without consulting the history. ``op_freq``
+    weights the bead operations its digits call for (uniform by
+    default).
+    """
+    if op_freq is None:
+        op_freq = np.ones(op.OPERATION_COUNT) / op.OPERATION_COUNT
+    add_sampler = op.compile_digit_pair_sampler(
+        op_freq,
         op.add_op_index_to_digit_pairs
     )
-    sub_digit_pair_prob = op.digit_pair_prob(
-        np.ones(op.OPERATION_COUNT) / op.OPERATION_COUNT,
+    sub_sampler = op.compile_digit_pair_sampler(
+        op_freq,
         op.sub_op_index_to_digit_pairs
     )
 
-    while True:
-        rand = np.random.random()
+    return op.generate_sampled_problem(
+        add_sampler,
+        addition_prob,
+        sub_sampler,
+        num_digits,
+        num_operands,
+    )
+
+
+def generate_problems(
+        addition_prob=.5,
+        num_digits=6,
+        num_operands=5,
+        review_prob=.5,
+        scheduler=None,
+        skill_model=None,
+):
+    """Yields problems forever. While some previously incorrect or
+    slow problem is due for review in ``scheduler``, it is given with
+    probability ``review_prob``; otherwise a new problem is generated,
+    focused on the weakest operations of ``skill_model`` if given.
+    """
+    if not 0. <= review_prob <= 1.:
+        raise ValueError('Review probability must be between 0 and 1.')
 
-        # decide whether to generate a new problem or give a problem where
-        # the answer was previously incorrect or the response was slow
-        if not dates or 0 <= rand < new_problem_prob:
-            operands = op.generate_mixed_problem(
-                add_digit_pair_prob,
+    if scheduler is None:
+        scheduler = ReviewScheduler.load()
+
+    while True:
+        operands = None
+        if np.random.random() < review_prob:
+            operands = scheduler.pop_due()
+
+        if operands is None:
+            op_freq = None
+            if skill_model is not None:
+                op_freq = skill_model.op_freq()
+            operands = generate_new_problem(
                 addition_prob,
-                sub_digit_pair_prob,
                 num_digits,
                 num_operands,
+                op_freq=op_freq,
             )
-        else:
-            date = np.random.choice(dates)
-            df = read_as_data(date)
-            incorrect_df = df[df.correct == False]  # noqa: E712
-
-            # choose a problem where the response was wrong, if possible1
-            if (
-                    incorrect_df.shape[0] > 0
-                    and 0. <= rand - new_problem_prob < previous_incorrect_prob
-            ):
-                row_n = np.random.randint(low=0, high=incorrect_df.shape[0])
-                operands = map(
-                    int,
-                    incorrect_df.iloc[row_n].problem.split(';')
-                )
-                print('Failure from {}'.format(date))
-            else:
-                groups = df.groupby('problem')
-                if not groups:
-                    continue
-                max_time_series = groups.response_time.max()
-                total_max_time = sum(max_time_series)
-                row_n = np.random.choice(
-                    max_time_series.shape[0],
-                    p=max_time_series / total_max_time
-                )
-                operands = map(int, max_time_series.index[row_n].split(';'))
-                print('Slow response {} from {}'.format(
-                    max_time_series.iloc[row_n],
-                    date
-                ))
         yield list(operands)
 
 
@@ -212,7 +194,7 @@ def display_abacus_add_subtract_problem(
         n_digits = len(digits)
 
         sign = '+' if operand >= 0 else '-'
-        sign_surface = font.render(sign, True, color)
+        sign_surface = text_cache.render(font, sign, color)
         sign_width = sign_surface.get_width()
 
         max_sign_width = max(sign_width, max_sign_width)
@@ -274,17 +256,3 @@ def display_abacus_add_subtract_problem(
         ),
         y_ul + row_n * height * line_spacing
     )
-
-
-def read_problem(
-        operands,
-        inter_operand_pause=1.5,
-        language='en',
-):
-    speeches = []
-    for operand in operands:
-        speeches.append(Speech(str(operand), language))
-
-    for speech in speeches:
-        speech.play(None)
-        time.sleep(inter_operand_pause)
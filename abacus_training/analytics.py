@@ -0,0 +1,381 @@
+"""Reports progress across sessions from the daily result files of every
+drill: daily and weekly accuracy, response time percentiles by
+presentation method and operand count, and the flash time trend of
+abacus reading.
+
+Run from the directory holding the result files, e.g.
+
+    python analytics.py
+    python analytics.py --start 2024_01_01 --output report.json
+
+Files are read in bounded memory, in parallel, and what is read from
+each is cached with its modification time, so re-runs only read new or
+changed days.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import glob
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from result_reader import stream_results
+from result_store import (
+    DATE_FORMAT,
+    KIND_SUFFIXES,
+    PARALLEL_MIN_FILES,
+    file_date,
+)
+
+
+CACHE_FILENAME = 'results_analytics_cache.json'
+# Changing what is aggregated from a file must change this, so that
+# cached aggregates are recomputed
+CACHE_VERSION = 1
+
+# Response times are counted in logarithmically spaced bins, each about
+# 4% wider than the last, so that percentiles of any set of files can be
+# taken from the sum of their counts
+RESPONSE_TIME_BINS = np.geomspace(.05, 600., 241)
+PERCENTILES = [50, 90, 99]
+
+TIMED_KINDS = ['abacus_as', 'mult', 'div']
+
+
+def empty_aggregate():
+    return {
+        'results': 0,
+        'correct': 0,
+        # (presentation method, operand count, bins, counts) of the
+        # response times of timed kinds
+        'response_times': [],
+        # of abacus reading
+        'flash_seconds': 0.,
+        'fastest_correct_flash_seconds': None,
+    }
+
+
+def response_time_bins(response_time):
+    bins = np.searchsorted(RESPONSE_TIME_BINS, response_time, side='right')
+    return np.clip(bins - 1, 0, RESPONSE_TIME_BINS.shape[0] - 2)
+
+
+def aggregate_file(kind, filename):
+    """Aggregates one daily result file, read in chunks. Runs in worker
+    processes, so it only depends on its arguments.
+    """
+    aggregate = empty_aggregate()
+    n_bins = RESPONSE_TIME_BINS.shape[0] - 1
+    histograms = {}
+    for table in stream_results([filename], kind):
+        aggregate['results'] += len(table)
+        aggregate['correct'] += int(table.correct.sum())
+
+        if kind == 'abacus_reading':
+            aggregate['flash_seconds'] += float(table.flash_seconds.sum())
+            if table.correct.any():
+                fastest = float(table.flash_seconds[table.correct].min())
+                previous = aggregate['fastest_correct_flash_seconds']
+                if previous is not None:
+                    fastest = min(fastest, previous)
+                aggregate['fastest_correct_flash_seconds'] = fastest
+            continue
+
+        if kind == 'abacus_as':
+            methods = table.presentation_method.tolist()
+        else:
+            methods = [''] * len(table)
+        bins = response_time_bins(table.response_time)
+        for method, n_operands, bin_n in zip(
+                methods, table.n_operands.tolist(), bins.tolist()
+        ):
+            group = method, n_operands
+            if group not in histograms:
+                histograms[group] = np.zeros(n_bins, dtype=np.int64)
+            histograms[group][bin_n] += 1
+
+    for (method, n_operands), counts in sorted(histograms.items()):
+        bins = np.flatnonzero(counts)
+        aggregate['response_times'].append([
+            method,
+            n_operands,
+            bins.tolist(),
+            counts[bins].tolist(),
+        ])
+
+    return aggregate
+
+
+def read_cache(filename):
+    if os.path.exists(filename):
+        with open(filename) as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    return {'version': CACHE_VERSION, 'files': {}}
+
+
+def write_cache(cache, filename):
+    partial_filename = filename + '.part'
+    with open(partial_filename, 'w') as f:
+        json.dump(cache, f)
+    os.replace(partial_filename, filename)
+
+
+def aggregate_all(
+        data_directory='.',
+        cache_filename=CACHE_FILENAME,
+        max_workers=None,
+):
+    """Returns a dict of kind, date and aggregate for every daily result
+    file, reading only those changed since they were cached
+    """
+    cache = read_cache(cache_filename)
+    cached = cache['files']
+    files = {}
+    pending = []
+    for kind, suffix in sorted(KIND_SUFFIXES.items()):
+        for filename in sorted(glob.glob(
+                os.path.join(data_directory, '*' + suffix)
+        )):
+            name = os.path.basename(filename)
+            # taken before reading, so that a file appended to while it
+            # is read is read again next time
+            stat = os.stat(filename)
+            entry = cached.get(name)
+            if (
+                    entry is not None
+                    and entry['mtime_ns'] == stat.st_mtime_ns
+                    and entry['size'] == stat.st_size
+            ):
+                files[name] = entry
+                continue
+            files[name] = {
+                'kind': kind,
+                'date': file_date(filename).isoformat(),
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+            }
+            pending.append((kind, filename))
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if len(pending) >= PARALLEL_MIN_FILES and max_workers > 1:
+        with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+        ) as executor:
+            aggregates = list(executor.map(aggregate_file, *zip(*pending)))
+    else:
+        aggregates = [aggregate_file(*args) for args in pending]
+
+    for (_, filename), aggregate in zip(pending, aggregates):
+        files[os.path.basename(filename)]['aggregate'] = aggregate
+
+    if pending or len(files) != len(cached):
+        cache['files'] = files
+        write_cache(cache, cache_filename)
+
+    return files
+
+
+def merge(aggregates):
+    """Sums aggregates into one, with response time counts as a dict of
+    (presentation method, operand count) to an array of bin counts
+    """
+    merged = empty_aggregate()
+    merged['response_times'] = {}
+    n_bins = RESPONSE_TIME_BINS.shape[0] - 1
+    for aggregate in aggregates:
+        for key in ['results', 'correct', 'flash_seconds']:
+            merged[key] += aggregate[key]
+
+        fastest = aggregate['fastest_correct_flash_seconds']
+        if fastest is not None:
+            previous = merged['fastest_correct_flash_seconds']
+            merged['fastest_correct_flash_seconds'] = (
+                fastest if previous is None else min(fastest, previous)
+            )
+
+        for method, n_operands, bins, counts in aggregate['response_times']:
+            group = method, n_operands
+            if group not in merged['response_times']:
+                merged['response_times'][group] = np.zeros(
+                    n_bins, dtype=np.int64
+                )
+            merged['response_times'][group][bins] += counts
+
+    return merged
+
+
+def histogram_percentiles(counts, percentiles=PERCENTILES):
+    """Percentiles of the response times counted in ``counts``, each
+    the geometric middle of the bin it falls in
+    """
+    cumulative = np.cumsum(counts)
+    ranks = np.maximum(
+        np.ceil(np.asarray(percentiles) / 100. * cumulative[-1]), 1
+    )
+    bins = np.searchsorted(cumulative, ranks, side='left')
+    return np.sqrt(RESPONSE_TIME_BINS[bins] * RESPONSE_TIME_BINS[bins + 1])
+
+
+def day(date):
+    return date
+
+
+def week(date):
+    year, week_n, _ = datetime.date(
+        *[int(part) for part in date.split('-')]
+    ).isocalendar()
+    return '{}-W{:02}'.format(year, week_n)
+
+
+def by_period(files, period):
+    """Merged aggregates keyed by (period, kind), in order"""
+    grouped = {}
+    for entry in files.values():
+        key = period(entry['date']), entry['kind']
+        grouped.setdefault(key, []).append(entry['aggregate'])
+    return {key: merge(grouped[key]) for key in sorted(grouped)}
+
+
+def accuracy(aggregate):
+    return aggregate['correct'] / max(aggregate['results'], 1)
+
+
+def report(files):
+    """Everything printed, as a JSON-serializable dict"""
+    result = {'accuracy': {}, 'response_time_percentiles': [], 'flash': {}}
+    for period_name, period in [('day', day), ('week', week)]:
+        periods = by_period(files, period)
+        result['accuracy'][period_name] = [
+            {
+                period_name: key,
+                'kind': kind,
+                'results': aggregate['results'],
+                'accuracy': accuracy(aggregate),
+            }
+            for (key, kind), aggregate in periods.items()
+        ]
+        result['flash'][period_name] = [
+            {
+                period_name: key,
+                'results': aggregate['results'],
+                'accuracy': accuracy(aggregate),
+                'mean_flash_seconds': (
+                    aggregate['flash_seconds'] / max(aggregate['results'], 1)
+                ),
+                'fastest_correct_flash_seconds': (
+                    aggregate['fastest_correct_flash_seconds']
+                ),
+            }
+            for (key, kind), aggregate in periods.items()
+            if kind == 'abacus_reading'
+        ]
+
+    for kind in TIMED_KINDS:
+        merged = merge(
+            entry['aggregate'] for entry in files.values()
+            if entry['kind'] == kind
+        )
+        for (method, n_operands), counts in sorted(
+                merged['response_times'].items()
+        ):
+            percentiles = histogram_percentiles(counts)
+            row = {
+                'kind': kind,
+                'presentation_method': method,
+                'operands': n_operands,
+                'results': int(counts.sum()),
+            }
+            for percentile, seconds in zip(PERCENTILES, percentiles):
+                row['p{}_seconds'.format(percentile)] = float(seconds)
+            result['response_time_percentiles'].append(row)
+
+    return result
+
+
+def print_report(result):
+    for period_name in ['day', 'week']:
+        print('\nAccuracy by {}'.format(period_name))
+        for row in result['accuracy'][period_name]:
+            print('{:<12} {:<16} {:>8} {:>8.1%}'.format(
+                row[period_name],
+                row['kind'],
+                row['results'],
+                row['accuracy'],
+            ))
+
+    print('\nResponse time percentiles (seconds)')
+    print('{:<16} {:<20} {:>8} {:>8}'.format(
+        'kind', 'presentation', 'operands', 'results'
+    ) + ''.join(' {:>7}'.format('p{}'.format(p)) for p in PERCENTILES))
+    for row in result['response_time_percentiles']:
+        print('{:<16} {:<20} {:>8} {:>8}'.format(
+            row['kind'],
+            row['presentation_method'] or '-',
+            row['operands'],
+            row['results'],
+        ) + ''.join(
+            ' {:>7.2f}'.format(row['p{}_seconds'.format(p)])
+            for p in PERCENTILES
+        ))
+
+    for period_name in ['day', 'week']:
+        print('\nAbacus reading flash time by {}'.format(period_name))
+        print('{:<12} {:>8} {:>8} {:>10} {:>15}'.format(
+            period_name, 'results', 'accuracy', 'mean', 'fastest correct'
+        ))
+        for row in result['flash'][period_name]:
+            fastest = row['fastest_correct_flash_seconds']
+            print('{:<12} {:>8} {:>8.1%} {:>10.3f} {:>15}'.format(
+                row[period_name],
+                row['results'],
+                row['accuracy'],
+                row['mean_flash_seconds'],
+                '-' if fastest is None else '{:.3f}'.format(fastest),
+            ))
+
+
+def parse_date(text):
+    return datetime.datetime.strptime(text, DATE_FORMAT).date().isoformat()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--data-directory',
+        default='.',
+        help='directory holding the daily result files',
+    )
+    parser.add_argument('--cache', default=CACHE_FILENAME)
+    parser.add_argument(
+        '--start',
+        type=parse_date,
+        help='first day, YYYY_MM_DD',
+    )
+    parser.add_argument('--end', type=parse_date, help='last day, YYYY_MM_DD')
+    parser.add_argument('--workers', type=int, help='processes reading files')
+    parser.add_argument('--output', help='JSON file to save the report to')
+    args = parser.parse_args()
+
+    files = aggregate_all(
+        data_directory=args.data_directory,
+        cache_filename=args.cache,
+        max_workers=args.workers,
+    )
+    files = {
+        name: entry for name, entry in files.items()
+        if (args.start is None or entry['date'] >= args.start)
+        and (args.end is None or entry['date'] <= args.end)
+    }
+
+    result = report(files)
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=1)
@@ -1,3 +1,10 @@
+import math
+
+from pygame import (
+    Rect,
+    SRCALPHA,
+    Surface,
+)
 from pygame.draw import (
     polygon,
 )
@@ -6,6 +13,8 @@ from pygame.gfxdraw import (
     filled_polygon,
 )
 
+from frame_profiler import profiled
+
 BEAD_HEIGHT = .75
 BEAD_FLAT = BEAD_HEIGHT * .5 / 1.6
 BEAD_DIAMETER = 1.3
@@ -144,6 +153,75 @@ def draw_column(
         )
 
 
+def render_column(
+        height,
+        color,
+        value,
+        separator_bead_color=None,
+        is_separator_column=False,
+):
+    """Draws a column onto a new transparent surface just large enough
+    to hold it
+    """
+    surface = Surface(
+        (
+            int(math.ceil(height_to_width(height))) + 1,
+            int(math.ceil(height)) + 1,
+        ),
+        SRCALPHA,
+    )
+    draw_column(
+        surface,
+        color,
+        (0, 0),
+        height,
+        value,
+        separator_bead_color=separator_bead_color,
+        is_separator_column=is_separator_column,
+    )
+    return surface
+
+
+class ColumnSpriteCache(object):
+    def __init__(self):
+        """Pre-rendered columns for every digit, so that drawing a
+        column is a single blit. Only the sprites of one height and color
+        scheme are kept; they are discarded when either changes.
+        """
+        self.style = None
+        self.sprites = {}
+
+    def get(
+            self,
+            height,
+            color,
+            separator_bead_color,
+            is_separator_column,
+            digit,
+    ):
+        style = (height, tuple(color), tuple(separator_bead_color))
+        if style != self.style:
+            self.sprites.clear()
+            self.style = style
+
+        key = (is_separator_column, digit)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = render_column(
+                height,
+                color,
+                digit,
+                separator_bead_color=separator_bead_color,
+                is_separator_column=is_separator_column,
+            )
+            self.sprites[key] = sprite
+
+        return sprite
+
+
+column_sprites = ColumnSpriteCache()
+
+
 def digitize(integer):
     remaining_value = integer
     digits = []
@@ -171,6 +249,7 @@ def height_to_width(height):
     return COLUMN_WIDTH * (height / COLUMN_HEIGHT)
 
 
+@profiled('draw_columns')
 def draw_columns(
         screen,
         color,
@@ -179,24 +258,31 @@ def draw_columns(
         digits,
         separator_bead_color=None
 ):
+    """Draws a number as abacus columns and returns the rectangle
+    that was drawn over
+    """
     if separator_bead_color is None:
         separator_bead_color = color
 
     column_width = height_to_width(height)
     x_ul, y_ul = upper_left
     n_digits = len(digits)
+    drawn = Rect(x_ul, y_ul, 0, 0)
 
     for digit_n, digit in enumerate(digits):
         is_separator_column = (
             (n_digits - 1 - digit_n) % 3 == 0
         )
 
-        draw_column(
-            screen,
-            color,
+        drawn.union_ip(screen.blit(
+            column_sprites.get(
+                height,
+                color,
+                separator_bead_color,
+                is_separator_column,
+                digit,
+            ),
             (x_ul + digit_n * column_width, y_ul),
-            height,
-            digit,
-            separator_bead_color=separator_bead_color,
-            is_separator_column=is_separator_column,
-        )
+        ))
+
+    return drawn
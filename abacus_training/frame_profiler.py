@@ -0,0 +1,272 @@
+import atexit
+import functools
+import json
+import os
+import time
+
+import numpy as np
+import pygame
+
+
+# Set ABACUS_PROFILE to a JSON filename to profile every EventLoop; the
+# histograms are saved there at exit. A frame counts as one dropped
+# frame for every ABACUS_PROFILE_FRAME_BUDGET_MS it takes to draw.
+PROFILE_FILENAME = os.environ.get('ABACUS_PROFILE')
+FRAME_BUDGET_MS = float(
+    os.environ.get('ABACUS_PROFILE_FRAME_BUDGET_MS', 1000. / 20)
+)
+
+# Shows and hides the profile of the current loop
+OVERLAY_KEY = pygame.K_F3
+OVERLAY_COLOR = (0xFF, 0xFF, 0xFF)
+OVERLAY_BACKGROUND_COLOR = (0x40, 0x40, 0x40)
+OVERLAY_FONT_SIZE = 16
+
+# Parts of a frame timed by functions decorated with profiled()
+SECTIONS = ['draw_columns', 'text']
+
+# Number of the most recent times kept of each series
+RING_BUFFER_SIZE = 4096
+# Edges of the exported histograms, from 10 us to 10 s
+HISTOGRAM_EDGES_MS = np.geomspace(.01, 10000., 121)
+PERCENTILES = [50, 90, 99]
+
+
+class TimingSeries(object):
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        """Durations in nanoseconds: the most recent ``capacity`` in a
+        ring buffer, and a histogram of all of them
+        """
+        self.recent = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+        self.histogram = np.zeros(
+            HISTOGRAM_EDGES_MS.shape[0] - 1,
+            dtype=np.int64
+        )
+
+    def add(self, duration_ns):
+        self.recent[self.count % self.recent.shape[0]] = duration_ns
+        self.count += 1
+        bin_n = np.searchsorted(HISTOGRAM_EDGES_MS, duration_ns / 1.e6) - 1
+        self.histogram[min(max(bin_n, 0), self.histogram.shape[0] - 1)] += 1
+
+    def recent_ms(self):
+        return self.recent[:min(self.count, self.recent.shape[0])] / 1.e6
+
+    def percentiles_ms(self):
+        recent = self.recent_ms()
+        if recent.shape[0] == 0:
+            return [None] * len(PERCENTILES)
+        return np.percentile(recent, PERCENTILES).tolist()
+
+    def summary(self):
+        """Percentiles of the recent durations, and the histogram of all
+        of them
+        """
+        summary = {'count': self.count}
+        recent = self.recent_ms()
+        if recent.shape[0]:
+            summary['mean_ms'] = float(recent.mean())
+            summary['max_ms'] = float(recent.max())
+        for percentile, ms in zip(PERCENTILES, self.percentiles_ms()):
+            summary['p{}_ms'.format(percentile)] = ms
+        summary['histogram'] = self.histogram.tolist()
+        return summary
+
+
+class LoopProfile(object):
+    def __init__(self):
+        """Frame times of the EventLoops of one name"""
+        self.render = TimingSeries()
+        self.sections = {section: TimingSeries() for section in SECTIONS}
+        self.event_to_flip = TimingSeries()
+        self.dropped_frames = 0
+
+    def summary(self):
+        summary = {
+            'frames': self.render.count,
+            'dropped_frames': self.dropped_frames,
+            'render': self.render.summary(),
+            'event_to_flip': self.event_to_flip.summary(),
+        }
+        for section, series in self.sections.items():
+            summary[section] = series.summary()
+        return summary
+
+
+def format_percentiles(series):
+    """The first and last PERCENTILES of a TimingSeries, for display"""
+    percentiles = series.percentiles_ms()
+    return [
+        '-' if ms is None else '{:.1f}'.format(ms)
+        for ms in [percentiles[0], percentiles[-1]]
+    ]
+
+
+class FrameProfiler(object):
+    def __init__(self, filename, frame_budget_ms=FRAME_BUDGET_MS):
+        """Records how long EventLoops take to draw each frame, how much
+        of that is spent in each of the SECTIONS, how long after an
+        event its frame is flipped, and how many frames are dropped, per
+        loop name. OVERLAY_KEY toggles an overlay of the current loop's
+        figures; export() saves them all to ``filename``.
+        """
+        self.filename = filename
+        self.frame_budget_ns = int(1.e6 * frame_budget_ms)
+        self.loops = {}
+        self.overlay = False
+
+        # nanoseconds spent in each section during the current frame
+        self._section_ns = dict.fromkeys(SECTIONS, 0)
+        self._section_depth = dict.fromkeys(SECTIONS, 0)
+        # (rect, surface) of what the overlay was drawn over
+        self._under_overlay = None
+        self._font = None
+
+    def timed(self, section, fn):
+        """Wraps fn to add its duration to ``section`` of the current
+        frame. Nested calls are only counted once.
+        """
+        @functools.wraps(fn)
+        def timed_fn(*args, **kwargs):
+            if self._section_depth[section]:
+                return fn(*args, **kwargs)
+            self._section_depth[section] += 1
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._section_ns[section] += time.perf_counter_ns() - start
+                self._section_depth[section] -= 1
+
+        return timed_fn
+
+    def frame(self, name, draw, event_time_ns=None):
+        """Calls draw() as a frame of the loop ``name``. event_time_ns is
+        the time.perf_counter_ns time of the event the frame answers.
+        """
+        self._remove_overlay()
+        for section in SECTIONS:
+            self._section_ns[section] = 0
+
+        start = time.perf_counter_ns()
+        draw()
+        end = time.perf_counter_ns()
+
+        profile = self.loops.get(name)
+        if profile is None:
+            profile = self.loops[name] = LoopProfile()
+        profile.render.add(end - start)
+        for section, series in profile.sections.items():
+            if self._section_ns[section]:
+                series.add(self._section_ns[section])
+        if event_time_ns is not None:
+            profile.event_to_flip.add(end - event_time_ns)
+        profile.dropped_frames += (end - start) // self.frame_budget_ns
+
+        if self.overlay:
+            self._draw_overlay(name, profile)
+
+    def handle_event(self, event):
+        """Toggles the overlay on OVERLAY_KEY, returning True if the event
+        was used
+        """
+        if event.type != pygame.KEYDOWN or event.key != OVERLAY_KEY:
+            return False
+        self.overlay = not self.overlay
+        if not self.overlay:
+            self._remove_overlay(update=True)
+        return True
+
+    def _remove_overlay(self, update=False):
+        if self._under_overlay is None:
+            return
+        rect, surface = self._under_overlay
+        self._under_overlay = None
+        screen = pygame.display.get_surface()
+        if screen is not None:
+            screen.blit(surface, rect)
+            if update:
+                pygame.display.update(rect)
+
+    def _draw_overlay(self, name, profile):
+        screen = pygame.display.get_surface()
+        if screen is None:
+            return
+        if self._font is None:
+            self._font = pygame.font.SysFont(
+                'Lucida Console',
+                OVERLAY_FONT_SIZE
+            )
+
+        lines = [
+            '{}: {} frames, {} dropped'.format(
+                name,
+                profile.render.count,
+                profile.dropped_frames,
+            ),
+            'render p50 {} p99 {} ms'.format(
+                *format_percentiles(profile.render)
+            ),
+            'columns {:.1f} text {:.1f} ms'.format(
+                self._section_ns['draw_columns'] / 1.e6,
+                self._section_ns['text'] / 1.e6,
+            ),
+            'event to flip p50 {} p99 {} ms'.format(
+                *format_percentiles(profile.event_to_flip)
+            ),
+        ]
+        surfaces = [
+            self._font.render(
+                line,
+                True,
+                OVERLAY_COLOR,
+                OVERLAY_BACKGROUND_COLOR
+            )
+            for line in lines
+        ]
+
+        rect = pygame.Rect(
+            0,
+            0,
+            max(surface.get_width() for surface in surfaces),
+            sum(surface.get_height() for surface in surfaces),
+        ).clip(screen.get_rect())
+        self._under_overlay = rect, screen.subsurface(rect).copy()
+        y = 0
+        for surface in surfaces:
+            screen.blit(surface, (0, y))
+            y += surface.get_height()
+        pygame.display.update(rect)
+
+    def export(self, filename=None):
+        """Saves the profile of every loop as JSON"""
+        if filename is None:
+            filename = self.filename
+        with open(filename, 'w') as f:
+            json.dump({
+                'frame_budget_ms': self.frame_budget_ns / 1.e6,
+                'histogram_edges_ms': HISTOGRAM_EDGES_MS.tolist(),
+                'loops': {
+                    name: profile.summary()
+                    for name, profile in sorted(self.loops.items())
+                },
+            }, f, indent=1)
+
+
+profiler = None
+if PROFILE_FILENAME:
+    profiler = FrameProfiler(PROFILE_FILENAME)
+    atexit.register(profiler.export)
+
+
+def profiled(section):
+    """Decorator timing a function as ``section`` of the frames of the
+    profiler. Functions are left as they are when profiling is off.
+    """
+    def decorator(fn):
+        if profiler is None:
+            return fn
+        return profiler.timed(section, fn)
+
+    return decorator
@@ -0,0 +1,85 @@
+import numpy as np
+
+from result_store import ResultStore
+
+
+def problem_key(operands):
+    """Key used for a problem in the result files"""
+    return ';'.join(map(str, operands))
+
+
+class HistoryIndex(object):
+    def __init__(self, capacity=1024):
+        """Per-problem aggregates of every add/subtract result, kept in
+        compact arrays, from which review problems are scheduled without
+        touching the result files.
+        """
+        self.problems = []
+
+        self.incorrect = np.zeros(capacity, dtype=bool)
+        self.max_response_time = np.zeros(capacity, dtype=np.float32)
+        self.total_response_time = np.zeros(capacity, dtype=np.float64)
+        self.attempts = np.zeros(capacity, dtype=np.int32)
+
+    @classmethod
+    def load(cls, store=None):
+        """Builds an index from every add/subtract result in the
+        columnar ResultStore, converting any new rows first
+        """
+        if store is None:
+            store = ResultStore()
+        store.update('abacus_as')
+        columns = store.load('abacus_as')
+        if columns is None:
+            return cls()
+        return cls.from_columns(columns)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Builds an index from ResultStore columns of add/subtract
+        results in a single vectorized pass
+        """
+        n_operands = np.asarray(columns['n_operands'], dtype=np.int64)
+        keys = np.hstack([
+            n_operands[:, None],
+            np.asarray(columns['operands']),
+        ])
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        n_problems = unique_keys.shape[0]
+
+        index = cls(capacity=max(n_problems, 1))
+        for key in unique_keys.tolist():
+            index.problems.append(problem_key(key[1:1 + key[0]]))
+
+        response_time = np.asarray(columns['response_time'], dtype=np.float64)
+        index.attempts[:n_problems] = np.bincount(
+            inverse, minlength=n_problems
+        )
+        index.total_response_time[:n_problems] = np.bincount(
+            inverse, weights=response_time, minlength=n_problems
+        )
+        np.maximum.at(index.max_response_time, inverse, response_time)
+        index.incorrect[:n_problems] = np.bincount(
+            inverse,
+            weights=~np.asarray(columns['correct']),
+            minlength=n_problems
+        ) > 0
+
+        return index
+
+    def __len__(self):
+        return len(self.problems)
+
+    def summaries(self):
+        """Yields (problem, attempts, incorrect, total_response_time,
+        max_response_time) for every problem
+        """
+        for problem_n, problem in enumerate(self.problems):
+            yield (
+                problem,
+                int(self.attempts[problem_n]),
+                bool(self.incorrect[problem_n]),
+                float(self.total_response_time[problem_n]),
+                float(self.max_response_time[problem_n]),
+            )
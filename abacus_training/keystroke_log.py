@@ -0,0 +1,151 @@
+import os
+import struct
+import time
+
+import numpy as np
+import pygame
+
+from pygame_utilities import (
+    ENTER_KEYS,
+    NUMBER_KEYS,
+)
+
+
+# Keystroke logs are kept beside the daily result files, e.g.
+# 2024_01_05_abacus_as.keys for 2024_01_05_abacus_as.dat
+KEYSTROKE_SUFFIX = '.keys'
+
+# Every attempt is logged as the wall clock time its problem was shown
+# (nanoseconds since the epoch) and its number of keystrokes, followed
+# by each keystroke: microseconds since the problem was shown and the
+# key.
+ATTEMPT_HEADER = struct.Struct('<qH')
+
+# The shown time is also the attempt's key, which result rows end with
+# (after the columns of parse_row). The result file and the keystroke
+# log are flushed separately, so a crash can lose the last attempts of
+# either and rows are joined to their keystrokes by key, not by order.
+ATTEMPT_KEY_COLUMNS = {
+    'abacus_as': 6,
+    'mult': 5,
+    'div': 5,
+}
+KEYSTROKE_DTYPE = np.dtype([('microseconds', '<u4'), ('key', 'u1')])
+
+# Keys are logged as the digit they enter, or one of
+BACKSPACE = 10
+ENTER = 11
+DIGITS = np.arange(10)
+
+MAX_MICROSECONDS = 2 ** 32 - 1
+MAX_KEYSTROKES = 2 ** 16 - 1
+
+
+def keystroke_filename(result_filename):
+    return os.path.splitext(result_filename)[0] + KEYSTROKE_SUFFIX
+
+
+def key_code(key):
+    """The code a pygame key is logged as, or None if it is not logged"""
+    if key in NUMBER_KEYS:
+        return NUMBER_KEYS[key]
+    if key == pygame.K_BACKSPACE:
+        return BACKSPACE
+    if key in ENTER_KEYS:
+        return ENTER
+    return None
+
+
+class Attempt(object):
+    def __init__(self, shown_ns=None):
+        """Times an attempt at a problem from when it was shown, a
+        time.perf_counter_ns time (by default now), and records its
+        keystrokes
+        """
+        now_ns = time.perf_counter_ns()
+        if shown_ns is None:
+            shown_ns = now_ns
+        self.shown_ns = shown_ns
+        self.wall_shown_ns = time.time_ns() - (now_ns - shown_ns)
+        self.keystrokes = []
+
+    @property
+    def key(self):
+        """Joins the attempt's result row to its keystroke log entry"""
+        return self.wall_shown_ns
+
+    def seconds(self, time_ns):
+        """Seconds from when the problem was shown to ``time_ns``"""
+        return (time_ns - self.shown_ns) / 1.e9
+
+    def record(self, key, time_ns):
+        """Records a key pressed at ``time_ns``"""
+        code = key_code(key)
+        if code is not None:
+            microseconds = (time_ns - self.shown_ns) // 1000
+            self.keystrokes.append((
+                min(max(microseconds, 0), MAX_MICROSECONDS),
+                code,
+            ))
+
+    def to_bytes(self):
+        keystrokes = self.keystrokes[:MAX_KEYSTROKES]
+        return (
+            ATTEMPT_HEADER.pack(self.wall_shown_ns, len(keystrokes))
+            + np.array(keystrokes, dtype=KEYSTROKE_DTYPE).tobytes()
+        )
+
+
+def read_keystroke_log(filename):
+    """Returns the attempts of a keystroke log as (shown, keystrokes)
+    pairs: the wall clock time the problem was shown, in nanoseconds
+    since the epoch, and an array of KEYSTROKE_DTYPE. An attempt still
+    being written is left out.
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    attempts = []
+    offset = 0
+    while offset + ATTEMPT_HEADER.size <= len(data):
+        shown_ns, n_keystrokes = ATTEMPT_HEADER.unpack_from(data, offset)
+        offset += ATTEMPT_HEADER.size
+        end = offset + n_keystrokes * KEYSTROKE_DTYPE.itemsize
+        if end > len(data):
+            break
+        attempts.append((shown_ns, np.frombuffer(
+            data,
+            dtype=KEYSTROKE_DTYPE,
+            count=n_keystrokes,
+            offset=offset,
+        )))
+        offset = end
+
+    return attempts
+
+
+def attempt_key(kind, row):
+    """The attempt key a result row of ``kind`` ends with, or None for
+    rows written without one
+    """
+    column = ATTEMPT_KEY_COLUMNS[kind]
+    if len(row) <= column:
+        return None
+    return int(row[column])
+
+
+def join_keystrokes(kind, rows, filename):
+    """Returns the keystrokes of every result row of ``kind`` from the
+    keystroke log ``filename``, or None for rows whose attempt was not
+    logged
+    """
+    keystrokes = dict(read_keystroke_log(filename))
+    return [keystrokes.get(attempt_key(kind, row)) for row in rows]
+
+
+def digit_latencies(keystrokes):
+    """Seconds from when the problem was shown to the first digit
+    entered, and between every digit and the next
+    """
+    digits = keystrokes['microseconds'][np.isin(keystrokes['key'], DIGITS)]
+    return np.diff(np.concatenate(([0], digits.astype(np.int64)))) / 1.e6
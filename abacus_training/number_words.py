@@ -0,0 +1,357 @@
+"""Splits integers into the words (fragments) they are spoken with, so
+that any number can be spoken by joining a small set of recordings.
+"""
+
+LANGUAGES = ['en', 'zh-CN', 'fr', 'de', 'ja']
+
+# Numbers with more digits are not split into fragments
+MAX_DIGITS = 12
+
+
+def _groups(number, size):
+    """Splits a non-negative integer into groups of ``size`` digits,
+    lowest first
+    """
+    groups = []
+    while True:
+        number, group = divmod(number, 10 ** size)
+        groups.append(group)
+        if number == 0:
+            return groups
+
+
+# English
+
+EN_ONES = [
+    '', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight',
+    'nine', 'ten', 'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen',
+    'sixteen', 'seventeen', 'eighteen', 'nineteen',
+]
+EN_TENS = [
+    '', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy',
+    'eighty', 'ninety',
+]
+EN_SCALES = ['', 'thousand', 'million', 'billion']
+
+
+def _en_below_100(number):
+    if number < 20:
+        return EN_ONES[number]
+    tens, ones = divmod(number, 10)
+    if ones:
+        return EN_TENS[tens] + '-' + EN_ONES[ones]
+    return EN_TENS[tens]
+
+
+def _en_fragments(number):
+    if number == 0:
+        return ['zero']
+
+    fragments = []
+    groups = _groups(number, 3)
+    for scale in range(len(groups) - 1, -1, -1):
+        group = groups[scale]
+        if group == 0:
+            continue
+        hundreds, rest = divmod(group, 100)
+        if hundreds:
+            fragments.append(EN_ONES[hundreds] + ' hundred')
+        if rest:
+            fragments.append(_en_below_100(rest))
+        if scale:
+            fragments.append(EN_SCALES[scale])
+    return fragments
+
+
+def _en_all_fragments():
+    return (
+        ['zero', 'minus']
+        + [_en_below_100(number) for number in range(1, 100)]
+        + [EN_ONES[digit] + ' hundred' for digit in range(1, 10)]
+        + EN_SCALES[1:]
+    )
+
+
+# French
+
+FR_ONES = [
+    'zéro', 'un', 'deux', 'trois', 'quatre', 'cinq', 'six', 'sept', 'huit',
+    'neuf', 'dix', 'onze', 'douze', 'treize', 'quatorze', 'quinze', 'seize',
+]
+FR_TENS = [
+    '', '', 'vingt', 'trente', 'quarante', 'cinquante', 'soixante',
+]
+
+
+def _fr_below_100(number):
+    if number <= 16:
+        return FR_ONES[number]
+    if number < 20:
+        return 'dix-' + FR_ONES[number - 10]
+    if number < 70:
+        tens, ones = divmod(number, 10)
+        if ones == 0:
+            return FR_TENS[tens]
+        if ones == 1:
+            return FR_TENS[tens] + ' et un'
+        return FR_TENS[tens] + '-' + FR_ONES[ones]
+    if number < 80:
+        if number == 71:
+            return 'soixante et onze'
+        return 'soixante-' + _fr_below_100(number - 60)
+    if number == 80:
+        return 'quatre-vingts'
+    return 'quatre-vingt-' + _fr_below_100(number - 80)
+
+
+def _fr_hundreds(digit):
+    if digit == 1:
+        return 'cent'
+    return FR_ONES[digit] + ' cent'
+
+
+def _fr_fragments(number):
+    if number == 0:
+        return ['zéro']
+
+    fragments = []
+    groups = _groups(number, 3)
+    for scale in range(len(groups) - 1, -1, -1):
+        group = groups[scale]
+        if group == 0:
+            continue
+        hundreds, rest = divmod(group, 100)
+        if scale == 1 and group == 1:
+            # 'mille', not 'un mille'
+            fragments.append('mille')
+            continue
+        if hundreds:
+            fragments.append(_fr_hundreds(hundreds))
+        if rest:
+            fragments.append(_fr_below_100(rest))
+        if scale == 1:
+            fragments.append('mille')
+        elif scale == 2:
+            fragments.append('million' if group == 1 else 'millions')
+        elif scale == 3:
+            fragments.append('milliard' if group == 1 else 'milliards')
+    return fragments
+
+
+def _fr_all_fragments():
+    return (
+        ['zéro', 'moins', 'mille', 'million', 'millions', 'milliard',
+         'milliards']
+        + [_fr_below_100(number) for number in range(1, 100)]
+        + [_fr_hundreds(digit) for digit in range(1, 10)]
+    )
+
+
+# German
+
+DE_ONES = [
+    '', 'eins', 'zwei', 'drei', 'vier', 'fünf', 'sechs', 'sieben', 'acht',
+    'neun', 'zehn', 'elf', 'zwölf', 'dreizehn', 'vierzehn', 'fünfzehn',
+    'sechzehn', 'siebzehn', 'achtzehn', 'neunzehn',
+]
+DE_TENS = [
+    '', '', 'zwanzig', 'dreißig', 'vierzig', 'fünfzig', 'sechzig',
+    'siebzig', 'achtzig', 'neunzig',
+]
+
+
+def _de_below_100(number):
+    if number < 20:
+        return DE_ONES[number]
+    tens, ones = divmod(number, 10)
+    if ones == 0:
+        return DE_TENS[tens]
+    return ('ein' if ones == 1 else DE_ONES[ones]) + 'und' + DE_TENS[tens]
+
+
+def _de_hundreds(digit):
+    return ('ein' if digit == 1 else DE_ONES[digit]) + 'hundert'
+
+
+def _de_fragments(number):
+    if number == 0:
+        return ['null']
+
+    fragments = []
+    groups = _groups(number, 3)
+    for scale in range(len(groups) - 1, -1, -1):
+        group = groups[scale]
+        if group == 0:
+            continue
+        if scale >= 2 and group == 1:
+            fragments.append(
+                'eine Million' if scale == 2 else 'eine Milliarde'
+            )
+            continue
+
+        hundreds, rest = divmod(group, 100)
+        if hundreds:
+            fragments.append(_de_hundreds(hundreds))
+        if rest == 1 and scale:
+            # 'eintausend', not 'einstausend'
+            fragments.append('ein')
+        elif rest:
+            fragments.append(_de_below_100(rest))
+
+        if scale == 1:
+            fragments.append('tausend')
+        elif scale == 2:
+            fragments.append('Millionen')
+        elif scale == 3:
+            fragments.append('Milliarden')
+    return fragments
+
+
+def _de_all_fragments():
+    return (
+        ['null', 'minus', 'ein', 'tausend', 'eine Million', 'Millionen',
+         'eine Milliarde', 'Milliarden']
+        + [_de_below_100(number) for number in range(1, 100)]
+        + [_de_hundreds(digit) for digit in range(1, 10)]
+    )
+
+
+# Chinese and Japanese count in groups of four digits
+
+ZH_DIGITS = ['零', '一', '二', '三', '四', '五', '六', '七', '八', '九']
+ZH_UNITS = ['', '十', '百', '千']
+ZH_SCALES = ['', '万', '亿']
+
+
+def _zh_fragments(number):
+    if number == 0:
+        return ['零']
+
+    fragments = []
+    groups = _groups(number, 4)
+    pending_zero = False
+    for scale in range(len(groups) - 1, -1, -1):
+        group = groups[scale]
+        if group == 0:
+            pending_zero = bool(fragments)
+            continue
+
+        digits = [(group // 10 ** place) % 10 for place in range(4)]
+        for place in range(3, -1, -1):
+            digit = digits[place]
+            if digit == 0:
+                pending_zero = bool(fragments)
+                continue
+            if pending_zero:
+                fragments.append('零')
+                pending_zero = False
+            if place == 1 and digit == 1 and not fragments:
+                # 十五, not 一十五, at the start of a number
+                fragments.append('十')
+            else:
+                fragments.append(ZH_DIGITS[digit] + ZH_UNITS[place])
+        if scale:
+            fragments.append(ZH_SCALES[scale])
+            pending_zero = False
+        # a zero between groups is only spoken when the lower group
+        # does not start with its thousands digit
+        if scale and groups[scale - 1] and groups[scale - 1] < 1000:
+            pending_zero = True
+    return fragments
+
+
+def _zh_all_fragments():
+    return (
+        ['零', '负', '十']
+        + [
+            ZH_DIGITS[digit] + unit
+            for digit in range(1, 10)
+            for unit in ZH_UNITS
+        ]
+        + ZH_SCALES[1:]
+    )
+
+
+JA_DIGITS = ['', '一', '二', '三', '四', '五', '六', '七', '八', '九']
+JA_UNITS = ['', '十', '百', '千']
+JA_SCALES = ['', '万', '億']
+
+
+def _ja_unit(digit, place):
+    if digit == 1 and place:
+        # 百, not 一百
+        return JA_UNITS[place]
+    return JA_DIGITS[digit] + JA_UNITS[place]
+
+
+def _ja_fragments(number):
+    if number == 0:
+        return ['ゼロ']
+
+    fragments = []
+    groups = _groups(number, 4)
+    for scale in range(len(groups) - 1, -1, -1):
+        group = groups[scale]
+        if group == 0:
+            continue
+        for place in range(3, -1, -1):
+            digit = (group // 10 ** place) % 10
+            if digit:
+                fragments.append(_ja_unit(digit, place))
+        if scale:
+            fragments.append(JA_SCALES[scale])
+    return fragments
+
+
+def _ja_all_fragments():
+    return (
+        ['ゼロ', 'マイナス']
+        + [
+            _ja_unit(digit, place)
+            for digit in range(1, 10)
+            for place in range(4)
+        ]
+        + JA_SCALES[1:]
+    )
+
+
+_FRAGMENTS = {
+    'en': (_en_fragments, 'minus'),
+    'zh-CN': (_zh_fragments, '负'),
+    'fr': (_fr_fragments, 'moins'),
+    'de': (_de_fragments, 'minus'),
+    'ja': (_ja_fragments, 'マイナス'),
+}
+
+_ALL_FRAGMENTS = {
+    'en': _en_all_fragments,
+    'zh-CN': _zh_all_fragments,
+    'fr': _fr_all_fragments,
+    'de': _de_all_fragments,
+    'ja': _ja_all_fragments,
+}
+
+
+def can_split(number, language):
+    return language in _FRAGMENTS and len(str(abs(number))) <= MAX_DIGITS
+
+
+def number_fragments(number, language):
+    """Returns the list of fragments ``number`` is spoken with in
+    ``language``
+    """
+    if not can_split(number, language):
+        raise ValueError(
+            'Cannot split {} into {} words'.format(number, language)
+        )
+
+    fragments_fn, negative = _FRAGMENTS[language]
+    fragments = fragments_fn(abs(number))
+    if number < 0:
+        fragments.insert(0, negative)
+    return fragments
+
+
+def all_fragments(language):
+    """Every fragment number_fragments can return for ``language``"""
+    return sorted(set(_ALL_FRAGMENTS[language]()))
@@ -1,4 +1,9 @@
-from collections import defaultdict
+from collections import (
+    defaultdict,
+    OrderedDict,
+)
+import threading
+
 import numpy as np
 
 # Each operation can be represented by a tuple consisting of the number of
@@ -7,20 +12,33 @@ import numpy as np
 
 OPERATION_COUNT = 27
 
+# Row i is the one-hot vector of the operation with index i
+_OPERATION_VECTORS = np.eye(OPERATION_COUNT, dtype=np.float64)
+_OPERATION_VECTORS.flags.writeable = False
 
-class Operation(object):
-    def __init__(self, ones, fives, tens):
-        self.ones = ones
-        self.fives = fives
-        self.tens = tens
+_operations = {}
 
-        self.validate()
 
-        self._vector = np.zeros(
-            OPERATION_COUNT,
-            dtype=np.float64
-        )
-        self._vector[self.index] = 1
+class Operation(object):
+    """Operations are flyweights: constructing one returns the shared
+    instance for its (ones, fives, tens), so they must not be modified.
+    """
+    __slots__ = ('ones', 'fives', 'tens')
+
+    def __new__(cls, ones, fives, tens):
+        key = (cls, ones, fives, tens)
+        operation = _operations.get(key)
+        if operation is None:
+            operation = object.__new__(cls)
+            operation.ones = ones
+            operation.fives = fives
+            operation.tens = tens
+            operation.validate()
+            _operations[key] = operation
+        return operation
+
+    def __getnewargs__(self):
+        return self.ones, self.fives, self.tens
 
     @classmethod
     def from_add_index(cls, index):
@@ -74,7 +92,8 @@ class Operation(object):
 
     @property
     def vector(self):
-        return self._vector
+        """Read-only one-hot vector of the operation's index"""
+        return _OPERATION_VECTORS[self.index]
 
 
 def digit_to_beads(digit):
@@ -95,32 +114,47 @@ subtraction_ops = [
     for fives in range(-1, 2)
 ]
 
-add_natural_freq = np.zeros(OPERATION_COUNT, dtype=np.float64)
-sub_natural_freq = np.zeros(OPERATION_COUNT, dtype=np.float64)
-
-add_op_index_to_digit_pairs = defaultdict(list)
-sub_op_index_to_digit_pairs = defaultdict(list)
-
-for digit_1 in range(10):
-    ones_1, fives_1 = digit_to_beads(digit_1)
-    for digit_2 in range(10):
-        add_result = digit_1 + digit_2
-        add_ones, add_fives = digit_to_beads(add_result % 10)
-        add_tens = add_result // 10
-        add_op = Operation(add_ones - ones_1, add_fives - fives_1, add_tens)
-        add_natural_freq[add_op.index] += 1
-        add_op_index_to_digit_pairs[add_op.index].append((digit_1, digit_2))
 
-        sub_result = digit_1 - digit_2
-        sub_ones, sub_fives = digit_to_beads(sub_result % 10)
-        sub_tens = sub_result // 10
-        sub_op = Operation(sub_ones - ones_1, sub_fives - fives_1, sub_tens)
-        sub_natural_freq[sub_op.index] += 1
-        sub_op_index_to_digit_pairs[sub_op.index].append((digit_1, digit_2))
+def _digit_pair_op_index(digit_1, result):
+    """Index of the operation that turns ``digit_1`` into the last digit
+    of ``result``. Vectorized.
+    """
+    result_digit = result % 10
+    ones = result_digit % 5 - digit_1 % 5
+    fives = result_digit // 5 - digit_1 // 5
+    return 9 * (fives + 1) + (ones + 4)
+
+
+_digit_1, _digit_2 = np.indices((10, 10))
+
+# Operation index of adding or subtracting digit_2 from digit_1, indexed
+# by [digit_1, digit_2]
+add_op_index = _digit_pair_op_index(_digit_1, _digit_1 + _digit_2)
+sub_op_index = _digit_pair_op_index(_digit_1, _digit_1 - _digit_2)
+add_op_index.flags.writeable = False
+sub_op_index.flags.writeable = False
+
+add_natural_freq = np.bincount(
+    add_op_index.ravel(),
+    minlength=OPERATION_COUNT
+) / 100.
+sub_natural_freq = np.bincount(
+    sub_op_index.ravel(),
+    minlength=OPERATION_COUNT
+) / 100.
+
+
+def _op_index_to_digit_pairs(op_index):
+    op_index_to_digit_pairs = defaultdict(list)
+    for digit_1, digit_2 in zip(*np.nonzero(op_index >= 0)):
+        op_index_to_digit_pairs[int(op_index[digit_1, digit_2])].append(
+            (int(digit_1), int(digit_2))
+        )
+    return op_index_to_digit_pairs
 
 
-add_natural_freq /= 100.
-sub_natural_freq /= 100.
+add_op_index_to_digit_pairs = _op_index_to_digit_pairs(add_op_index)
+sub_op_index_to_digit_pairs = _op_index_to_digit_pairs(sub_op_index)
 
 
 def digit_pair_prob(
@@ -141,6 +175,162 @@ def digit_pair_prob(
     return p
 
 
+# add_op_index and sub_op_index as nested lists, for fast scalar lookups
+_add_op_index_rows = add_op_index.tolist()
+_sub_op_index_rows = sub_op_index.tolist()
+
+
+def problem_operations(operands):
+    """Returns the indices of the operations an abacus user performs to
+    solve a problem. The first operand is set on the abacus; every
+    following one is added (or subtracted, if negative) column by
+    column from the ones column up, with a carry (or borrow) being a
+    separate +1 (or -1) on the next column.
+    """
+    n_columns = len(str(sum(abs(operand) for operand in operands))) + 1
+    abacus = [
+        (operands[0] // 10 ** column_n) % 10
+        for column_n in range(n_columns)
+    ]
+
+    op_indices = []
+    for operand in operands[1:]:
+        if operand >= 0:
+            op_index_rows = _add_op_index_rows
+            sign = 1
+        else:
+            op_index_rows = _sub_op_index_rows
+            sign = -1
+        digits = []
+        if operand != 0:
+            digits = [int(digit) for digit in reversed(str(abs(operand)))]
+
+        carry = 0
+        for column_n in range(n_columns):
+            if column_n >= len(digits) and not carry:
+                break
+            digit = abacus[column_n]
+            if carry:
+                op_indices.append(op_index_rows[digit][1])
+                carry = int(not 0 <= digit + sign <= 9)
+                digit = (digit + sign) % 10
+            if column_n < len(digits):
+                op_indices.append(op_index_rows[digit][digits[column_n]])
+                result = digit + sign * digits[column_n]
+                carry += int(not 0 <= result <= 9)
+                digit = result % 10
+            abacus[column_n] = digit
+
+    return op_indices
+
+
+def _build_column_lookups():
+    """Lookup arrays, indexed by [is_subtraction, abacus digit, operand
+    digit, carry in], describing what problem_operations does in one
+    column. An operand digit of 10 stands for a column past the end of
+    the operand, where only a carry can happen. -1 marks no operation.
+    """
+    sign = np.array([1, -1])[:, None, None, None]
+    op_index = np.stack([add_op_index, sub_op_index])
+    is_sub, abacus_digit, operand_digit, carry = np.indices((2, 10, 11, 2))
+
+    carry_op = np.where(carry, op_index[is_sub, abacus_digit, 1], -1)
+    after_carry = abacus_digit + sign * carry
+    digit = after_carry % 10
+
+    has_digit = operand_digit < 10
+    operand_digit = np.where(has_digit, operand_digit, 0)
+    digit_op = np.where(has_digit, op_index[is_sub, digit, operand_digit], -1)
+    result = digit + sign * operand_digit
+    next_digit = np.where(has_digit, result % 10, digit)
+    carry_out = (
+        ((after_carry < 0) | (after_carry > 9)).astype(np.int64)
+        + (has_digit & ((result < 0) | (result > 9)))
+    )
+
+    return carry_op, digit_op, next_digit, carry_out
+
+
+(
+    column_carry_op,
+    column_digit_op,
+    column_next_digit,
+    column_carry_out,
+) = _build_column_lookups()
+
+
+# Problems decomposed at a time by operation_histograms, bounding the
+# memory used for whole histories
+HISTOGRAM_CHUNK_SIZE = 2 ** 16
+
+
+def operation_histograms(operands):
+    """Vectorized problem_operation_counts. Maps an integer array of
+    shape (n_problems, n_operands) to an array of shape (n_problems,
+    OPERATION_COUNT) counting the operations each problem needs. Rows
+    may be padded with trailing zero operands.
+    """
+    operands = np.asarray(operands, dtype=np.int64)
+    histograms = np.zeros(
+        (operands.shape[0], OPERATION_COUNT),
+        dtype=np.int64
+    )
+    for start in range(0, operands.shape[0], HISTOGRAM_CHUNK_SIZE):
+        chunk = operands[start:start + HISTOGRAM_CHUNK_SIZE]
+        histograms[start:start + chunk.shape[0]] = _operation_histograms(
+            chunk
+        )
+    return histograms
+
+
+def _operation_histograms(operands):
+    n_problems, n_operands = operands.shape
+
+    # as in problem_operations, each problem gets one more column than
+    # the sum of its operand magnitudes has digits
+    sums = np.abs(operands).sum(axis=1)
+    n_columns = len(str(int(sums.max()))) + 1
+    powers = 10 ** np.arange(n_columns, dtype=np.int64)
+    row_columns = (sums[:, None] >= powers[1:]).sum(axis=1) + 2
+
+    abacus = (operands[:, :1] // powers) % 10
+    rows = np.arange(n_problems)
+    # bin 0 of each row collects the 'no operation' lookups
+    bins = rows * (OPERATION_COUNT + 1) + 1
+    op_bins = []
+    for operand_n in range(1, n_operands):
+        operand = operands[:, operand_n]
+        is_sub = (operand < 0).astype(np.int64)
+        magnitude = np.abs(operand)
+        carry = np.zeros(n_problems, dtype=np.int64)
+        for column_n in range(n_columns):
+            operand_digit = np.where(
+                magnitude >= powers[column_n],
+                (magnitude // powers[column_n]) % 10,
+                10
+            )
+            # a carry or borrow out of a problem's last column is dropped
+            carry *= column_n < row_columns
+            index = is_sub, abacus[:, column_n], operand_digit, carry
+            op_bins.append(bins + column_carry_op[index])
+            op_bins.append(bins + column_digit_op[index])
+            # the index refers to this column of the abacus, so the
+            # carry must be looked up before the column is updated
+            carry = column_carry_out[index]
+            abacus[:, column_n] = column_next_digit[index]
+
+    counts = np.bincount(
+        np.concatenate(op_bins),
+        minlength=n_problems * (OPERATION_COUNT + 1)
+    ).reshape(n_problems, OPERATION_COUNT + 1)
+    return counts[:, 1:]
+
+
+def problem_operation_counts(operands):
+    """Number of times each operation is performed to solve a problem"""
+    return operation_histograms([operands])[0]
+
+
 def digit_vector_to_number(vec):
     num = 0
     for digit in vec:
@@ -148,6 +338,138 @@ def digit_vector_to_number(vec):
     return num
 
 
+class AliasTable(object):
+    """Walker/Vose alias tables for drawing from one or more discrete
+    distributions in constant time. Each row of ``prob`` is a separate
+    (not necessarily normalized) distribution over its column indices.
+    """
+
+    def __init__(self, prob):
+        prob = np.atleast_2d(np.asarray(prob, dtype=np.float64))
+        n_rows, self.size = prob.shape
+
+        self.threshold = np.ones(prob.shape, dtype=np.float64)
+        self.alias = np.tile(np.arange(self.size), (n_rows, 1))
+
+        for row_n, row in enumerate(prob):
+            total = row.sum()
+            # a row that can never be conditioned on is left uniform
+            if total > 0:
+                self._build_row(row_n, row * (self.size / total))
+
+        # plain lists are much faster than arrays for scalar lookups
+        self._threshold_rows = self.threshold.tolist()
+        self._alias_rows = self.alias.tolist()
+
+    def _build_row(self, row_n, scaled):
+        scaled = list(scaled)
+        small = [i for i, p in enumerate(scaled) if p < 1.]
+        large = [i for i, p in enumerate(scaled) if p >= 1.]
+
+        while small and large:
+            small_i = small.pop()
+            large_i = large.pop()
+            self.threshold[row_n, small_i] = scaled[small_i]
+            self.alias[row_n, small_i] = large_i
+            scaled[large_i] += scaled[small_i] - 1.
+            if scaled[large_i] < 1.:
+                small.append(large_i)
+            else:
+                large.append(large_i)
+
+        # whatever remains is (up to rounding) exactly full
+        for i in small + large:
+            self.threshold[row_n, i] = 1.
+            self.alias[row_n, i] = i
+
+    def sample(self, u, row=0):
+        """Maps uniform variates ``u`` in [0, 1) to draws from the
+        distribution(s) in ``row``. Vectorized over ``u`` and ``row``.
+        """
+        scaled = np.asarray(u) * self.size
+        column = np.minimum(scaled.astype(np.int64), self.size - 1)
+        accept = (scaled - column) < self.threshold[row, column]
+        return np.where(accept, column, self.alias[row, column])
+
+    def sample_one(self, u, row=0):
+        """Scalar version of sample that avoids NumPy overhead"""
+        scaled = u * self.size
+        column = min(int(scaled), self.size - 1)
+        if scaled - column < self._threshold_rows[row][column]:
+            return column
+        return self._alias_rows[row][column]
+
+
+class DigitPairSampler(object):
+    """Draws the first digit of a pair from the marginal of
+    ``digit_pair_prob`` and the second digit conditioned on the first,
+    both in constant time.
+    """
+
+    def __init__(self, digit_pair_prob):
+        self.first_digit = AliasTable(digit_pair_prob.sum(axis=1))
+        self.second_given_first = AliasTable(digit_pair_prob)
+
+    def sample_first(self, u):
+        return self.first_digit.sample(u)
+
+    def sample_second(self, first_digit, u):
+        return self.second_given_first.sample(u, row=first_digit)
+
+
+_compiled_samplers = OrderedDict()
+# samplers are compiled on prefetching threads as well as the main one
+_compiled_samplers_lock = threading.Lock()
+# Samplers kept by compile_digit_pair_sampler; operation frequencies
+# that change after every answer would otherwise grow the cache forever
+MAX_COMPILED_SAMPLERS = 64
+
+
+def compile_digit_pair_sampler(op_freq, op_index_to_digit_pairs):
+    """Returns a DigitPairSampler for the digit pairs produced by
+    digit_pair_prob(op_freq, op_index_to_digit_pairs). The most recently
+    used samplers are memoized by the operation frequencies, so reusing
+    a weighting costs nothing after the first call.
+    """
+    op_freq = np.asarray(op_freq, dtype=np.float64)
+    return _memoized_sampler(
+        ('op_freq', id(op_index_to_digit_pairs), op_freq.tobytes()),
+        lambda: digit_pair_prob(op_freq, op_index_to_digit_pairs),
+    )
+
+
+def digit_pair_sampler(digit_pair_prob):
+    """Returns a DigitPairSampler for a 10 x 10 digit pair table,
+    memoized like compile_digit_pair_sampler
+    """
+    digit_pair_prob = np.asarray(digit_pair_prob, dtype=np.float64)
+    return _memoized_sampler(
+        ('digit_pair_prob', digit_pair_prob.shape, digit_pair_prob.tobytes()),
+        lambda: digit_pair_prob,
+    )
+
+
+def _memoized_sampler(key, make_digit_pair_prob):
+    # the raw bytes are the key, so that equal hashes of different
+    # frequencies can never share a sampler
+    with _compiled_samplers_lock:
+        sampler = _compiled_samplers.get(key)
+        if sampler is not None:
+            _compiled_samplers.move_to_end(key)
+            return sampler
+
+    # compiled outside the lock, so another thread may compile the same
+    # sampler meanwhile; either copy will do
+    sampler = DigitPairSampler(make_digit_pair_prob())
+    with _compiled_samplers_lock:
+        _compiled_samplers[key] = sampler
+        _compiled_samplers.move_to_end(key)
+        if len(_compiled_samplers) > MAX_COMPILED_SAMPLERS:
+            _compiled_samplers.popitem(last=False)
+
+    return sampler
+
+
 def generate_mixed_problem(
         add_digit_pair_prob,
         add_prob,
@@ -155,55 +477,66 @@ def generate_mixed_problem(
         num_digits,
         num_operands
 ):
-    assert num_operands > 1
-    digits = np.arange(10)
+    return generate_sampled_problem(
+        digit_pair_sampler(add_digit_pair_prob),
+        add_prob,
+        digit_pair_sampler(sub_digit_pair_prob),
+        num_digits,
+        num_operands,
+    )
 
-    add_first_digit_prob = add_digit_pair_prob.sum(axis=1)
-    sub_first_digit_prob = sub_digit_pair_prob.sum(axis=1)
 
-    add_second_given_first_prob = (
-        add_digit_pair_prob / add_first_digit_prob[:, None]
-    )
-    sub_second_given_first_prob = (
-        sub_digit_pair_prob / sub_first_digit_prob[:, None]
-    )
+def generate_sampled_problem(
+        add_sampler,
+        add_prob,
+        sub_sampler,
+        num_digits,
+        num_operands
+):
+    """Same as generate_mixed_problem, but draws digits from compiled
+    DigitPairSamplers
+    """
+    assert num_operands > 1
 
-    operand_digits = np.zeros((num_operands, num_digits), dtype=np.int32)
-    sum_digits = np.zeros((num_operands, num_digits + 1), dtype=np.int32)
+    operand_digits = [[0] * num_digits for _ in range(num_operands)]
+    sum_digits = [[0] * (num_digits + 1) for _ in range(num_operands)]
 
-    operand_rand = np.random.random(size=num_operands)
+    operand_rand = np.random.random(size=num_operands).tolist()
+    digit_rand = iter(
+        np.random.random(size=num_digits * num_operands).tolist()
+    )
 
+    first_digit_table = add_sampler.first_digit
     for digit_n in range(num_digits - 1, -1, -1):
         for operand_n in range(1, num_operands):
             if operand_n == 1:
-                operand_digits[0, digit_n] = np.random.choice(
-                    digits,
-                    p=add_first_digit_prob
+                operand_digits[0][digit_n] = first_digit_table.sample_one(
+                    next(digit_rand)
                 )
 
             if operand_rand[operand_n] <= add_prob:
-                second_given_first_prob = add_second_given_first_prob
+                second_given_first = add_sampler.second_given_first
                 sign = 1
             else:
-                second_given_first_prob = sub_second_given_first_prob
+                second_given_first = sub_sampler.second_given_first
                 sign = -1
             s = (
-                sum_digits[operand_n, digit_n + 1]
-                + sum_digits[operand_n - 1, digit_n + 1]
-                + operand_digits[operand_n - 1, digit_n]
+                sum_digits[operand_n][digit_n + 1]
+                + sum_digits[operand_n - 1][digit_n + 1]
+                + operand_digits[operand_n - 1][digit_n]
             )
-            sum_digits[operand_n, digit_n] = s // 10
-            sum_digits[operand_n, digit_n + 1] = s % 10
-
-            operand_digits[operand_n, digit_n] = sign * np.random.choice(
-                digits,
-                p=second_given_first_prob[
-                    sum_digits[operand_n, digit_n + 1]
-                ]
+            sum_digits[operand_n][digit_n] = s // 10
+            sum_digits[operand_n][digit_n + 1] = s % 10
+
+            operand_digits[operand_n][digit_n] = (
+                sign * second_given_first.sample_one(
+                    next(digit_rand),
+                    row=sum_digits[operand_n][digit_n + 1]
+                )
             )
 
     operands = [
-        digit_vector_to_number(operand_digits[operand_n, :])
+        digit_vector_to_number(operand_digits[operand_n])
         for operand_n in range(num_operands)
     ]
 
@@ -212,3 +545,86 @@ def generate_mixed_problem(
         operands[0] = operands[0] - mult * (sum(operands) // mult)
 
     return operands
+
+
+def generate_mixed_problems(
+        n_problems,
+        add_digit_pair_prob,
+        add_prob,
+        sub_digit_pair_prob,
+        num_digits,
+        num_operands
+):
+    """Vectorized version of generate_mixed_problem. Returns an integer
+    array of shape (n_problems, num_operands) whose rows follow the same
+    distribution as the operands returned by generate_mixed_problem.
+    """
+    return generate_sampled_problems(
+        n_problems,
+        digit_pair_sampler(add_digit_pair_prob),
+        add_prob,
+        digit_pair_sampler(sub_digit_pair_prob),
+        num_digits,
+        num_operands,
+    )
+
+
+def generate_sampled_problems(
+        n_problems,
+        add_sampler,
+        add_prob,
+        sub_sampler,
+        num_digits,
+        num_operands
+):
+    """Same as generate_mixed_problems, but draws digits from compiled
+    DigitPairSamplers
+    """
+    assert num_operands > 1
+
+    operand_digits = np.zeros(
+        (n_problems, num_operands, num_digits),
+        dtype=np.int64
+    )
+    sum_digits = np.zeros(
+        (n_problems, num_operands, num_digits + 1),
+        dtype=np.int64
+    )
+
+    is_add = np.random.random(size=(n_problems, num_operands)) <= add_prob
+    sign = np.where(is_add, 1, -1)
+
+    for digit_n in range(num_digits - 1, -1, -1):
+        operand_digits[:, 0, digit_n] = add_sampler.sample_first(
+            np.random.random(size=n_problems)
+        )
+
+        for operand_n in range(1, num_operands):
+            s = (
+                sum_digits[:, operand_n, digit_n + 1]
+                + sum_digits[:, operand_n - 1, digit_n + 1]
+                + operand_digits[:, operand_n - 1, digit_n]
+            )
+            sum_digits[:, operand_n, digit_n] = s // 10
+            first_digit = s % 10
+            sum_digits[:, operand_n, digit_n + 1] = first_digit
+
+            u = np.random.random(size=n_problems)
+            operand_digits[:, operand_n, digit_n] = sign[:, operand_n] * (
+                np.where(
+                    is_add[:, operand_n],
+                    add_sampler.sample_second(first_digit, u),
+                    sub_sampler.sample_second(first_digit, u),
+                )
+            )
+
+    # same accumulation as digit_vector_to_number, applied to every operand
+    operands = np.zeros((n_problems, num_operands), dtype=np.int64)
+    for digit_n in range(num_digits):
+        operands += 10 * operands + operand_digits[:, :, digit_n]
+
+    total = operands.sum(axis=1)
+    mult = 10 ** num_digits
+    operands[:, 0] -= np.where(total < 0, mult * (total // mult), 0)
+
+    return operands
@@ -0,0 +1,124 @@
+import queue
+import threading
+
+
+_DONE = object()
+
+
+class Prefetcher(object):
+    def __init__(
+            self,
+            iterator,
+            depth=4,
+            fallback=None,
+            first_timeout=.5,
+    ):
+        """Runs ``iterator`` in a worker thread and keeps up to ``depth``
+        of its items ready, so that next() never waits on whatever the
+        iterator does (reading history, hitting the disk, ...). When no
+        item is ready, next() returns ``fallback()`` instead of waiting,
+        or waits if no fallback is given. The first next() waits up to
+        ``first_timeout`` seconds before falling back, since the worker
+        has only just started.
+        """
+        self.fallback = fallback
+        self.first_timeout = first_timeout
+        self._started = False
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._error = None
+
+        self._thread = threading.Thread(
+            target=self._fill,
+            args=(iterator,),
+            name='prefetcher',
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fill(self, iterator):
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self._error = e
+        self._put(_DONE)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        timeout = 0.
+        if not self._started:
+            self._started = True
+            timeout = self.first_timeout
+        try:
+            if self.fallback is None:
+                item = self._queue.get()
+            else:
+                item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return self.fallback()
+
+        if item is _DONE:
+            # leave the marker for any later calls
+            self._queue.put(_DONE)
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+        return item
+
+    def close(self, timeout=1.):
+        """Stops the worker thread. Items already prefetched are
+        discarded.
+        """
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BackgroundCall(object):
+    def __init__(self, fn, *args, **kwargs):
+        """Calls ``fn(*args, **kwargs)`` on a daemon thread, so that the
+        call never delays quitting. result() waits for its return value
+        (or raises its exception).
+        """
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._call,
+            args=(fn, args, kwargs),
+            name='background-call',
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _call(self, fn, args, kwargs):
+        try:
+            self._result = fn(*args, **kwargs)
+        except Exception as e:
+            self._error = e
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
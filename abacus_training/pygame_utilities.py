@@ -1,6 +1,15 @@
+from collections import OrderedDict
+import heapq
+import math
 import pygame
+import time
 from typing import List
 
+from frame_profiler import (
+    profiled,
+    profiler,
+)
+
 NUMBER_TO_KEYS = [
     {pygame.K_0, pygame.K_KP0},
     {pygame.K_1, pygame.K_KP1},
@@ -39,6 +48,9 @@ NUMBER_KEYS = {
 
 ENTER_KEYS = {pygame.K_KP_ENTER, pygame.K_RETURN}
 
+# Posted to wake an EventLoop when a scheduled callback is due
+TIMER_EVENT = pygame.USEREVENT
+
 
 def format_number(num, columns=10, sign=True):
     format_string = '{: >'
@@ -48,6 +60,43 @@ def format_number(num, columns=10, sign=True):
     return format_string.format(num)
 
 
+class TextCache(object):
+    def __init__(self, maxsize=256):
+        """Least-recently-used cache of rendered text surfaces, so that
+        text that does not change is rasterized only once
+        """
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @profiled('text')
+    def render(self, font, text, color, antialias=True):
+        """Same as font.render(text, antialias, color)"""
+        # the font itself is part of the key so that it is kept alive
+        # and its id cannot be reused by another font
+        key = (font, font.get_height(), text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            self.misses += 1
+            surface = font.render(text, antialias, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.maxsize:
+                self.surfaces.popitem(last=False)
+        else:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+text_cache = TextCache()
+
+
+@profiled('text')
 def display_centered_text(
         screen,
         text,
@@ -60,7 +109,7 @@ def display_centered_text(
     height = 0.
 
     for line in lines:
-        surface = font.render(line, True, color)
+        surface = text_cache.render(font, line, color)
         surfaces.append(surface)
 
         width = max(width, surface.get_width())
@@ -86,6 +135,160 @@ def display_centered_text(
     return text_x, text_y, width
 
 
+class EventLoop(object):
+    def __init__(
+            self,
+            draw=None,
+            handle_event=None,
+            name='event_loop',
+    ):
+        """Runs until stop() is called, sleeping in pygame.event.wait
+        between events instead of polling at a fixed frame rate.
+
+        draw() is called when the loop starts and after redraw() has
+        been requested, once the waiting events have been handled.
+        handle_event(event) is called for every event. Callbacks given
+        to schedule() are called on the loop when they are due, which
+        allows timed events (flashes, speech, ...) without polling.
+
+        While an event is handled, event_time_ns is the
+        time.perf_counter_ns time it was taken off the queue, for timing
+        responses without the delay of handling the events before it.
+        pygame does not give the time SDL queued an event at, so events
+        that arrive while a frame is drawn are timed once it is done.
+
+        When profiling is on (see frame_profiler), every draw() is
+        recorded as a frame of the loops called ``name``.
+        """
+        self.draw = draw
+        self.handle_event = handle_event
+        self.name = name
+        self.timers = []
+        self.timer_count = 0
+        self.dirty = True
+        self.running = False
+        self.result = None
+        self.event_time_ns = None
+
+    def redraw(self):
+        self.dirty = True
+
+    def stop(self, result=None):
+        """Ends the loop; run() returns ``result``"""
+        self.running = False
+        self.result = result
+
+    def schedule(self, delay, callback):
+        """Calls callback() on the loop after ``delay`` seconds"""
+        heapq.heappush(
+            self.timers,
+            (time.monotonic() + delay, self.timer_count, callback)
+        )
+        self.timer_count += 1
+
+    def _run_due_callbacks(self):
+        now = time.monotonic()
+        while self.running and self.timers and self.timers[0][0] <= now:
+            _, _, callback = heapq.heappop(self.timers)
+            callback()
+
+    def _set_wake_up(self):
+        if self.timers:
+            delay = self.timers[0][0] - time.monotonic()
+            pygame.time.set_timer(
+                TIMER_EVENT,
+                max(1, int(math.ceil(1000 * delay)))
+            )
+        else:
+            pygame.time.set_timer(TIMER_EVENT, 0)
+
+    def run(self):
+        self.running = True
+        # time of the first events that called for the next frame
+        event_time_ns = None
+        try:
+            while True:
+                self._run_due_callbacks()
+                if not self.running:
+                    break
+
+                if self.dirty:
+                    self.dirty = False
+                    if self.draw is not None and profiler is None:
+                        self.draw()
+                    elif self.draw is not None:
+                        profiler.frame(self.name, self.draw, event_time_ns)
+                    event_time_ns = None
+
+                self._set_wake_up()
+                events = [pygame.event.wait()]
+                times_ns = [time.perf_counter_ns()]
+                while True:
+                    event = pygame.event.poll()
+                    if event.type == pygame.NOEVENT:
+                        break
+                    events.append(event)
+                    times_ns.append(time.perf_counter_ns())
+                self._handle_events(events, times_ns)
+                if self.dirty and event_time_ns is None:
+                    event_time_ns = times_ns[0]
+                if not self.running:
+                    break
+        finally:
+            pygame.time.set_timer(TIMER_EVENT, 0)
+
+        return self.result
+
+    def _handle_events(self, events, times_ns):
+        for event_n, event in enumerate(events):
+            self.event_time_ns = times_ns[event_n]
+            if event.type == pygame.VIDEOEXPOSE:
+                self.redraw()
+            if profiler is not None and profiler.handle_event(event):
+                self.redraw()
+                continue
+            if event.type != TIMER_EVENT and self.handle_event:
+                self.handle_event(event)
+
+            if not self.running:
+                # leave the remaining events for whatever runs next
+                for event in events[event_n + 1:]:
+                    if event.type != TIMER_EVENT:
+                        pygame.event.post(event)
+                return
+
+
+def wait_for_keypress(draw=None):
+    """Shows whatever draw() draws and returns the key of the next
+    keypress
+    """
+    loop = EventLoop(draw=draw, name='wait_for_keypress')
+
+    def handle_event(event):
+        if event.type == pygame.KEYDOWN:
+            loop.stop(event.key)
+
+    loop.handle_event = handle_event
+    return loop.run()
+
+
+def show_for(seconds, draw):
+    """Shows whatever draw() draws for the given time. Events that
+    arrive in the meantime are left for whatever comes next.
+    """
+    early_events = []
+    loop = EventLoop(
+        draw=draw,
+        handle_event=early_events.append,
+        name='show_for',
+    )
+    loop.schedule(seconds, loop.stop)
+    loop.run()
+
+    for event in early_events:
+        pygame.event.post(event)
+
+
 class MenuChoice(object):
     def __init__(
             self,
@@ -157,12 +360,10 @@ class Menu(object):
     ):
         """Presents the menu and returns the result associated
         with the selected menu item. Ignores keypresses not
-        associated with any menu item.
+        associated with any menu item. The menu is only drawn when
+        presented, so ``frames_per_second`` is not used.
         """
-        clock = pygame.time.Clock()
-
-        menu_choice = None
-        while True:
+        def draw():
             screen.fill(background_color)
             display_centered_text(
                 screen,
@@ -172,17 +373,16 @@ class Menu(object):
             )
             pygame.display.flip()
 
-            for event in pygame.event.get():
-                if event.type == pygame.KEYDOWN:
-                    menu_choice = self.key_to_menu_choice.get(
-                        event.key
-                    )
+        loop = EventLoop(draw=draw, name='menu')
+
+        def handle_event(event):
+            if event.type == pygame.KEYDOWN:
+                menu_choice = self.key_to_menu_choice.get(event.key)
                 if menu_choice:
-                    break
-            if menu_choice:
-                break
+                    loop.stop(menu_choice)
 
-            clock.tick(frames_per_second)
+        loop.handle_event = handle_event
+        menu_choice = loop.run()
 
         if callable(menu_choice.result):
             return menu_choice.result
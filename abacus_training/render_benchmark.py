@@ -0,0 +1,241 @@
+"""Times the abacus and problem rendering functions without a display.
+
+Run from this directory, e.g.
+
+    python render_benchmark.py --output before.json
+    python render_benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import time
+
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+import numpy as np  # noqa: E402
+import pygame  # noqa: E402
+
+BACKGROUND_COLOR = (0x00, 0x00, 0x00)
+BEAD_COLOR = (0x00, 0xFF, 0x00)
+SEPARATOR_BEAD_COLOR = (0xFF, 0xA0, 0x00)
+
+SCREEN_SIZE = (800, 800)
+HEIGHTS = [25, 50, 100]
+DIGIT_COUNTS = [1, 3, 6, 9]
+OPERAND_COUNTS = [2, 5, 10]
+PERCENTILES = [50, 90, 99]
+
+
+def time_calls(fn, repeat, warmup=3):
+    """Returns the duration in seconds of each of ``repeat`` calls"""
+    for _ in range(warmup):
+        fn()
+
+    durations = np.empty(repeat, dtype=np.float64)
+    for call_n in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations[call_n] = time.perf_counter() - start
+
+    return durations
+
+
+def summarize(durations):
+    summary = {
+        'calls': int(durations.shape[0]),
+        'mean_ms': 1000. * float(durations.mean()),
+        'fps': float(1. / durations.mean()),
+    }
+    for percentile in PERCENTILES:
+        summary['p{}_ms'.format(percentile)] = (
+            1000. * float(np.percentile(durations, percentile))
+        )
+    return summary
+
+
+def random_operands(n_digits, n_operands):
+    magnitudes = np.random.randint(
+        10 ** (n_digits - 1),
+        10 ** n_digits,
+        size=n_operands
+    )
+    signs = np.where(np.random.random(size=n_operands) < .5, -1, 1)
+    return [int(operand) for operand in signs * magnitudes]
+
+
+def cases(screen):
+    """Yields (name, parameters, function) for every benchmark. The
+    functions refer to loop variables, so each must be run before the
+    next one is generated.
+    """
+    from add_subtract import (
+        display_abacus_add_subtract_problem,
+        display_arabic_add_subtract_problem,
+    )
+    from bead import (
+        draw_bead,
+        draw_column,
+        draw_columns,
+    )
+    from pygame_utilities import display_centered_text
+
+    def frame(draw):
+        def fn():
+            screen.fill(BACKGROUND_COLOR)
+            draw()
+        return fn
+
+    for height in HEIGHTS:
+        yield 'draw_bead', {'height': height}, frame(
+            lambda: draw_bead(screen, BEAD_COLOR, (400, 400), .15 * height)
+        )
+        yield 'draw_column', {'height': height}, frame(
+            lambda: draw_column(
+                screen,
+                BEAD_COLOR,
+                (400, 400),
+                height,
+                7,
+                separator_bead_color=SEPARATOR_BEAD_COLOR,
+                is_separator_column=True,
+            )
+        )
+        font = pygame.font.SysFont('Lucida Console', height)
+        yield 'display_centered_text', {'height': height}, frame(
+            lambda: display_centered_text(
+                screen,
+                'Main Menu\n(1) Addition and Subtraction\n(Q) Quit',
+                BEAD_COLOR,
+                font,
+            )
+        )
+
+        for n_digits in DIGIT_COUNTS:
+            digits = [
+                int(digit) for digit in np.random.randint(10, size=n_digits)
+            ]
+            yield 'draw_columns', {
+                'height': height,
+                'digits': n_digits,
+            }, frame(
+                lambda: draw_columns(
+                    screen,
+                    BEAD_COLOR,
+                    (25, 25),
+                    height,
+                    digits,
+                    separator_bead_color=SEPARATOR_BEAD_COLOR,
+                )
+            )
+
+            for n_operands in OPERAND_COUNTS:
+                operands = random_operands(n_digits, n_operands)
+                parameters = {
+                    'height': height,
+                    'digits': n_digits,
+                    'operands': n_operands,
+                }
+                yield 'display_abacus_add_subtract_problem', parameters, frame(
+                    lambda: display_abacus_add_subtract_problem(
+                        screen,
+                        BEAD_COLOR,
+                        SEPARATOR_BEAD_COLOR,
+                        (25, 25),
+                        height,
+                        operands,
+                        font=font,
+                    )
+                )
+                yield 'display_arabic_add_subtract_problem', parameters, frame(
+                    lambda: display_arabic_add_subtract_problem(
+                        screen,
+                        BEAD_COLOR,
+                        operands,
+                        font,
+                    )
+                )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(repeat, name_filter=None):
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    np.random.seed(0)
+
+    results = []
+    for name, parameters, fn in cases(screen):
+        if name_filter and name_filter not in name:
+            continue
+        result = {'name': name, 'parameters': parameters}
+        result.update(summarize(time_calls(fn, repeat)))
+        results.append(result)
+        print('{:<40} {:<40} {:>10.3f} ms {:>10.0f} fps'.format(
+            name,
+            json.dumps(parameters, sort_keys=True),
+            result['mean_ms'],
+            result['fps'],
+        ))
+
+    return {
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(),
+        'pygame_version': pygame.version.ver,
+        'screen_size': SCREEN_SIZE,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def result_key(result):
+    return result['name'], json.dumps(result['parameters'], sort_keys=True)
+
+
+def compare(report, baseline):
+    """Prints the change in median time of every benchmark in both
+    reports
+    """
+    baseline_results = {
+        result_key(result): result for result in baseline['results']
+    }
+    print('\nChange in median time relative to {}'.format(
+        baseline.get('commit') or 'baseline'
+    ))
+    for result in report['results']:
+        old = baseline_results.get(result_key(result))
+        if old is None:
+            continue
+        print('{:<40} {:<40} {:>+8.1f}%'.format(
+            result['name'],
+            json.dumps(result['parameters'], sort_keys=True),
+            100. * (result['p50_ms'] / old['p50_ms'] - 1.),
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--filter', help='only run benchmarks containing this')
+    parser.add_argument('--output', help='JSON file to save results to')
+    parser.add_argument('--compare', help='JSON results to compare against')
+    args = parser.parse_args()
+
+    report = run(args.repeat, name_filter=args.filter)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
@@ -0,0 +1,232 @@
+import calendar
+import datetime
+import sqlite3
+import threading
+
+import numpy as np
+
+from result_store import (
+    COLUMN_DTYPES,
+    parse_operands,
+)
+from result_writer import BatchWriter
+
+
+DATABASE_FILENAME = 'abacus_results.sqlite'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS problems (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    operands TEXT NOT NULL,
+    n_operands INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    incorrect INTEGER NOT NULL DEFAULT 0,
+    max_response_time REAL NOT NULL DEFAULT 0,
+    UNIQUE (kind, operands)
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    problem_id INTEGER NOT NULL REFERENCES problems (id),
+    response INTEGER,
+    response_time REAL,
+    correct INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    presentation_method TEXT
+);
+CREATE INDEX IF NOT EXISTS problems_kind ON problems (kind);
+CREATE INDEX IF NOT EXISTS attempts_problem ON attempts (problem_id);
+CREATE INDEX IF NOT EXISTS attempts_correct ON attempts (correct);
+CREATE INDEX IF NOT EXISTS attempts_response_time
+    ON attempts (response_time);
+CREATE INDEX IF NOT EXISTS attempts_date ON attempts (date);
+'''
+
+
+class ResultDatabase(object):
+    def __init__(
+            self,
+            filename=DATABASE_FILENAME,
+            kind='abacus_as',
+            batch_size=32,
+            flush_seconds=2.,
+    ):
+        """SQLite alternative to the daily result files. Results are
+        inserted by a BatchWriter thread in batches of up to
+        ``batch_size``, each in a single transaction, so recording a
+        result never waits on the disk. A session is only added once
+        its first results are, so the history can be read without
+        recording anything.
+
+        ``kind`` is the kind of the results read by summaries() and
+        load().
+        """
+        self.kind = kind
+        self.started_at = calendar.timegm(datetime.datetime.now().timetuple())
+        self.session_id = None
+
+        # problems may be chosen from a prefetching thread
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            filename,
+            check_same_thread=False
+        )
+        self.connection.executescript(SCHEMA)
+
+        self._writer = BatchWriter(
+            self._insert,
+            flush_rows=batch_size,
+            flush_seconds=flush_seconds,
+            name='result-database',
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._writer.close()
+        with self.lock:
+            self.connection.close()
+
+    def record(
+            self,
+            kind,
+            operands,
+            response,
+            response_time,
+            is_correct,
+            presentation_method=None,
+    ):
+        now = datetime.datetime.now()
+        self._writer.put((
+            kind,
+            ';'.join(map(str, operands)),
+            len(operands),
+            response,
+            response_time,
+            int(bool(is_correct)),
+            calendar.timegm(now.timetuple()),
+            now.strftime('%Y-%m-%d'),
+            presentation_method,
+        ))
+
+    def flush(self):
+        """Waits until every recorded result has been inserted"""
+        self._writer.flush()
+
+    def _insert(self, pending):
+        with self.lock, self.connection:
+            if self.session_id is None:
+                self.session_id = self.connection.execute(
+                    'INSERT INTO sessions (started_at) VALUES (?)',
+                    (self.started_at,)
+                ).lastrowid
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO problems (kind, operands, n_operands) '
+                'VALUES (?, ?, ?)',
+                [row[:3] for row in pending]
+            )
+            self.connection.executemany(
+                'UPDATE problems SET '
+                'attempts = attempts + 1, '
+                'incorrect = MAX(incorrect, 1 - ?), '
+                'max_response_time = MAX(max_response_time, ?) '
+                'WHERE kind = ? AND operands = ?',
+                [
+                    (row[5], row[4] or 0., row[0], row[1])
+                    for row in pending
+                ]
+            )
+            self.connection.executemany(
+                'INSERT INTO attempts ('
+                'session_id, problem_id, response, response_time, '
+                'correct, timestamp, date, presentation_method'
+                ') VALUES (?, '
+                '(SELECT id FROM problems WHERE kind = ? AND operands = ?), '
+                '?, ?, ?, ?, ?, ?)',
+                [
+                    (self.session_id, row[0], row[1]) + row[3:]
+                    for row in pending
+                ]
+            )
+
+    def summaries(self):
+        """Yields (problem, attempts, incorrect, total_response_time,
+        max_response_time) for every problem, as HistoryIndex.summaries
+        does, once every recorded result has been inserted
+        """
+        self.flush()
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT problems.operands, problems.attempts, '
+                'problems.incorrect, '
+                'COALESCE(SUM(attempts.response_time), 0), '
+                'problems.max_response_time '
+                'FROM problems LEFT JOIN attempts '
+                'ON attempts.problem_id = problems.id '
+                'WHERE problems.kind = ? GROUP BY problems.id',
+                (self.kind,)
+            ).fetchall()
+        for operands, attempts, incorrect, total_response_time, \
+                max_response_time in rows:
+            yield (
+                operands,
+                attempts,
+                bool(incorrect),
+                total_response_time,
+                max_response_time,
+            )
+
+    def load(self):
+        """Returns the operands, n_operands, response, response_time,
+        correct and timestamp columns of every result, in the form
+        ResultStore.load gives them, or None if there are none. Every
+        recorded result is inserted first.
+        """
+        self.flush()
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT problems.operands, attempts.response, '
+                'attempts.response_time, attempts.correct, '
+                'attempts.timestamp '
+                'FROM attempts JOIN problems '
+                'ON attempts.problem_id = problems.id '
+                'WHERE problems.kind = ? ORDER BY attempts.id',
+                (self.kind,)
+            ).fetchall()
+        if not rows:
+            return None
+
+        operands, response, response_time, correct, timestamp = zip(*rows)
+        operands = [parse_operands(text) for text in operands]
+        n_operands = [len(row) for row in operands]
+        columns = {
+            'operands': np.zeros(
+                (len(rows), max(n_operands)),
+                dtype=COLUMN_DTYPES['operands']
+            ),
+            'n_operands': np.array(
+                n_operands,
+                dtype=COLUMN_DTYPES['n_operands']
+            ),
+        }
+        for row_n, row in enumerate(operands):
+            columns['operands'][row_n, :len(row)] = row
+        for name, values in [
+                ('response', response),
+                ('response_time', response_time),
+                ('correct', correct),
+                ('timestamp', timestamp),
+        ]:
+            columns[name] = np.array(values, dtype=COLUMN_DTYPES[name])
+
+        return columns
@@ -0,0 +1,129 @@
+import csv
+import itertools
+
+import numpy as np
+
+from history import problem_key
+from result_store import (
+    concatenate_columns,
+    file_date,
+    format_timestamp,
+    parse_result_file,
+    parse_rows,
+    rows_to_columns,
+)
+
+
+class ResultTable(object):
+    def __init__(self, columns):
+        """Typed columns of results read from daily result files:
+        operands (a zero-padded int64 matrix), n_operands, response,
+        correct, timestamp (epoch seconds), date, and response_time and
+        presentation_method (as names) or flash_seconds depending on the
+        kind of result.
+
+        Columns are attributes, as they were of the pandas DataFrame
+        read_as_data used to return, which also had 'problem' (the
+        operands as logged, e.g. '12;-3') and 'time_of_day'. Indexing
+        with a column name returns the column; indexing with a boolean
+        mask, indices or a slice selects rows.
+        """
+        self.columns = columns
+        self._problem = None
+
+    def __len__(self):
+        return self.columns['n_operands'].shape[0]
+
+    @property
+    def shape(self):
+        return len(self), len(self.columns)
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get('columns', {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return ResultTable({
+            name: values[key] for name, values in self.columns.items()
+        })
+
+    @property
+    def problem(self):
+        if self._problem is None:
+            self._problem = np.array(
+                [
+                    problem_key(operands[:n_operands])
+                    for operands, n_operands in zip(
+                        self.columns['operands'].tolist(),
+                        self.columns['n_operands'].tolist(),
+                    )
+                ],
+                dtype=object
+            )
+        return self._problem
+
+    @property
+    def time_of_day(self):
+        return np.array(
+            [
+                format_timestamp(timestamp)
+                for timestamp in self.columns['timestamp'].tolist()
+            ],
+            dtype=object
+        )
+
+    def group_max(self, column, by='problem'):
+        """Returns the distinct values of ``by`` and the largest value of
+        ``column`` for each, like DataFrame.groupby(by)[column].max()
+        """
+        keys, inverse = np.unique(self[by], return_inverse=True)
+        values = np.asarray(self[column])
+        maxima = np.full(keys.shape[0], -np.inf, dtype=np.float64)
+        np.maximum.at(maxima, inverse.reshape(-1), values)
+        return keys, maxima.astype(values.dtype)
+
+
+def read_results(filename, kind='abacus_as'):
+    """Reads a whole daily result file of ``kind`` into a ResultTable"""
+    columns, _ = parse_result_file(kind, filename)
+    return ResultTable(columns)
+
+
+def read_many_results(filenames, kind='abacus_as'):
+    """Reads daily result files into a single ResultTable"""
+    tables = [read_results(filename, kind) for filename in filenames]
+    tables = [table for table in tables if len(table)]
+    if not tables:
+        return ResultTable(rows_to_columns(kind, [], None))
+    return ResultTable(concatenate_columns([
+        table.columns for table in tables
+    ]))
+
+
+def _complete_lines(f):
+    # a line still being written has no newline yet
+    for line in f:
+        if line.endswith('\n'):
+            yield line
+
+
+def stream_results(filenames, kind='abacus_as', chunk_rows=4096):
+    """Yields ResultTables of up to ``chunk_rows`` rows of each daily
+    result file in turn, so that any amount of history can be read in
+    bounded memory
+    """
+    for filename in filenames:
+        date = file_date(filename)
+        with open(filename, newline='') as f:
+            reader = csv.reader(_complete_lines(f))
+            while True:
+                chunk = list(itertools.islice(reader, chunk_rows))
+                if not chunk:
+                    break
+                rows = parse_rows(kind, chunk, filename)
+                if rows:
+                    yield ResultTable(rows_to_columns(kind, rows, date))
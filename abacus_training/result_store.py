@@ -0,0 +1,531 @@
+import calendar
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import datetime
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import zlib
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+STORE_DIRECTORY = 'results_store'
+MANIFEST_FILENAME = 'manifest.json'
+TIMESTAMP_FORMAT = '%Y-%m-%d-%H:%M:%S'
+DATE_FORMAT = '%Y_%m_%d'
+
+# Result files are parsed by a pool of processes when at least this
+# many have new rows; fewer are parsed in this process
+PARALLEL_MIN_FILES = 8
+
+# Chunks are merged when there would be more than this many of a kind
+MAX_CHUNKS = 32
+
+# Number of bytes before the end of what was read of a daily file that
+# are checksummed, to notice files that were rewritten rather than
+# appended to
+TAIL_BYTES = 256
+
+# Suffixes of the daily result files written by each drill
+KIND_SUFFIXES = {
+    'abacus_as': '_abacus_as.dat',
+    'mult': '_mult.dat',
+    'div': '_div.dat',
+    'abacus_reading': '_abacus_reading.dat',
+}
+
+COLUMN_DTYPES = {
+    'operands': np.int64,
+    'n_operands': np.int8,
+    'response': np.int64,
+    'correct': bool,
+    'timestamp': np.int64,
+    'response_time': np.float32,
+    'presentation_method': np.int8,
+    'flash_seconds': np.float32,
+    # date of the daily file a result was logged in
+    'date': 'datetime64[D]',
+}
+
+KIND_COLUMNS = {
+    'abacus_as': [
+        'operands', 'n_operands', 'response', 'correct', 'timestamp',
+        'response_time', 'presentation_method', 'date',
+    ],
+    'mult': [
+        'operands', 'n_operands', 'response', 'correct', 'timestamp',
+        'response_time', 'date',
+    ],
+    'div': [
+        'operands', 'n_operands', 'response', 'correct', 'timestamp',
+        'response_time', 'date',
+    ],
+    'abacus_reading': [
+        'operands', 'n_operands', 'response', 'correct', 'timestamp',
+        'flash_seconds', 'date',
+    ],
+}
+
+
+def parse_timestamp(text):
+    """Seconds since the epoch of a logged (local, naive) timestamp"""
+    if len(text) == 19:
+        # much faster than strptime, which dominates parsing otherwise
+        return calendar.timegm((
+            int(text[0:4]), int(text[5:7]), int(text[8:10]),
+            int(text[11:13]), int(text[14:16]), int(text[17:19]),
+        ))
+    return calendar.timegm(
+        datetime.datetime.strptime(text, TIMESTAMP_FORMAT).timetuple()
+    )
+
+
+def format_timestamp(timestamp):
+    return datetime.datetime.utcfromtimestamp(timestamp).strftime(
+        TIMESTAMP_FORMAT
+    )
+
+
+def parse_operands(text):
+    return [int(operand) for operand in text.split(';')]
+
+
+def parse_correct(text):
+    return text == 'True'
+
+
+def parse_row(kind, row):
+    """Parses one line of a daily result file of ``kind``. The
+    presentation method of add/subtract results is left as its name.
+    """
+    if kind == 'abacus_reading':
+        time_of_day, number, response, flash_seconds, correct = row
+        return {
+            'operands': [int(number)],
+            'response': int(response),
+            'correct': parse_correct(correct),
+            'timestamp': parse_timestamp(time_of_day),
+            'flash_seconds': float(flash_seconds),
+        }
+
+    parsed = {
+        'operands': parse_operands(row[0]),
+        'response_time': float(row[1]),
+        'response': int(row[2]),
+        'correct': parse_correct(row[3]),
+        'timestamp': parse_timestamp(row[4]),
+    }
+    if kind == 'abacus_as':
+        parsed['presentation_method'] = row[5]
+
+    return parsed
+
+
+def parse_rows(kind, rows, filename):
+    """Parses lines of a daily result file of ``kind`` with parse_row,
+    leaving out (and logging) those that are malformed
+    """
+    parsed = []
+    n_malformed = 0
+    for row in rows:
+        if not row:
+            continue
+        try:
+            parsed.append(parse_row(kind, row))
+        except (ValueError, IndexError):
+            n_malformed += 1
+    if n_malformed:
+        logger.warning(
+            'Skipped %d malformed rows of %s', n_malformed, filename
+        )
+    return parsed
+
+
+def file_date(filename):
+    """Date of a daily result file, from its name"""
+    return datetime.datetime.strptime(
+        os.path.basename(filename)[:len('YYYY_MM_DD')],
+        DATE_FORMAT
+    ).date()
+
+
+def rows_to_columns(kind, rows, date):
+    """Turns rows returned by parse_row into columns of the result
+    file of ``date``. Presentation methods are kept as names.
+    """
+    width = max([len(row['operands']) for row in rows] + [1])
+    columns = {
+        'operands': np.zeros((len(rows), width), dtype=np.int64),
+        'n_operands': np.array(
+            [len(row['operands']) for row in rows],
+            dtype=COLUMN_DTYPES['n_operands']
+        ),
+    }
+    for row_n, row in enumerate(rows):
+        columns['operands'][row_n, :len(row['operands'])] = row['operands']
+    for column in KIND_COLUMNS[kind]:
+        if column == 'presentation_method':
+            columns[column] = np.array(
+                [row[column] for row in rows],
+                dtype=object
+            )
+        elif column not in columns and column != 'date':
+            columns[column] = np.array(
+                [row[column] for row in rows],
+                dtype=COLUMN_DTYPES[column]
+            )
+
+    columns['date'] = np.full(
+        len(rows),
+        np.datetime64(date, 'D'),
+        dtype=COLUMN_DTYPES['date']
+    )
+
+    return columns
+
+
+def tail_checksum(filename, offset):
+    """Checksum of the TAIL_BYTES of a file before ``offset``"""
+    with open(filename, 'rb') as f:
+        start = max(0, offset - TAIL_BYTES)
+        f.seek(start)
+        return zlib.crc32(f.read(offset - start))
+
+
+def parse_result_file(kind, filename, offset=0):
+    """Parses the complete lines of a daily result file past ``offset``
+    into columns, and returns them with the offset just past the last
+    line. Runs in worker processes, so it only depends on its arguments.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    end = data.rfind(b'\n') + 1
+    lines = data[:end].decode('utf-8').splitlines()
+    rows = parse_rows(kind, csv.reader(lines), filename)
+
+    return rows_to_columns(kind, rows, file_date(filename)), offset + end
+
+
+class ResultStore(object):
+    def __init__(self, directory=STORE_DIRECTORY, data_directory='.'):
+        """Columnar copy of the daily result files. Every kind of result
+        is kept as chunks of rows with one .npy file per column: operands
+        as a zero-padded int64 matrix, response times as float32,
+        correctness as bool and timestamps as epoch seconds.
+
+        Each update writes its rows as a new chunk, then the manifest
+        listing the chunks and how far each daily file has been read.
+        Malformed lines are skipped. A daily file that is shorter than
+        what was read of it, older, or different in the bytes before
+        where reading stopped was rewritten, and everything is converted
+        again.
+        Rows only count as converted once the manifest is written, so
+        an interrupted update leaves nothing but an unlisted chunk,
+        which the next update removes. Small chunks are merged into
+        bigger ones like the digits of a binary counter, so that there
+        are few chunks and each row is only rewritten a few times.
+        """
+        self.directory = directory
+        self.data_directory = data_directory
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST_FILENAME)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        filename = os.path.join(self.directory, MANIFEST_FILENAME)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(filename + '.tmp', filename)
+
+    def _column_filename(self, kind, chunk, column):
+        return os.path.join(self.directory, kind, chunk, column + '.npy')
+
+    def _is_complete(self, kind):
+        """Whether every column of every chunk of ``kind`` in the
+        manifest is stored with the number of rows the manifest gives.
+        A store written before a column was added, or before rows were
+        stored in chunks, is incomplete.
+        """
+        kind_manifest = self.manifest.get(kind)
+        if kind_manifest is None:
+            return True
+        if 'chunks' not in kind_manifest:
+            return not kind_manifest.get('offsets')
+        for chunk in kind_manifest['chunks']:
+            for column in KIND_COLUMNS[kind]:
+                filename = self._column_filename(kind, chunk['name'], column)
+                try:
+                    values = np.load(filename, mmap_mode='r')
+                except (IOError, ValueError):
+                    return False
+                if values.shape[0] != chunk['rows']:
+                    return False
+        return True
+
+    def _rewritten_files(self, kind):
+        """Names of the daily files of ``kind`` that were rewritten since
+        they were read. Files that were removed keep their rows.
+        """
+        kind_manifest = self.manifest.get(kind, {})
+        sources = kind_manifest.get('sources', {})
+        rewritten = []
+        for name, offset in sorted(kind_manifest.get('offsets', {}).items()):
+            filename = os.path.join(self.data_directory, name)
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            source = sources.get(name)
+            if stat.st_size < offset:
+                rewritten.append(name)
+            elif source is None or (
+                    stat.st_mtime_ns == source['mtime_ns']
+                    and stat.st_size == offset
+            ):
+                continue
+            elif (
+                    stat.st_mtime_ns < source['mtime_ns']
+                    or tail_checksum(filename, offset) != source['tail']
+            ):
+                rewritten.append(name)
+        return rewritten
+
+    def _remove_unlisted_chunks(self, kind):
+        """Removes chunks left by interrupted or superseded updates"""
+        kind_directory = os.path.join(self.directory, kind)
+        if not os.path.isdir(kind_directory):
+            return
+        listed = {
+            chunk['name']
+            for chunk in self.manifest.get(kind, {}).get('chunks', [])
+        }
+        for name in os.listdir(kind_directory):
+            if name not in listed:
+                path = os.path.join(kind_directory, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+
+    def update(self, kind, max_workers=None):
+        """Converts whatever has been appended to the daily result files
+        of ``kind`` since the last update. Returns the number of new rows.
+        When many files have new rows (as on the first conversion of a
+        long history) they are parsed in parallel by up to
+        ``max_workers`` processes.
+        """
+        if not self._is_complete(kind):
+            # convert everything again rather than mix stores
+            self.manifest.pop(kind, None)
+        rewritten = self._rewritten_files(kind)
+        if rewritten:
+            logger.warning(
+                'Converting every %s result file again, as %s changed',
+                kind,
+                ', '.join(rewritten),
+            )
+            self.manifest.pop(kind, None)
+        self._remove_unlisted_chunks(kind)
+
+        suffix = KIND_SUFFIXES[kind]
+        kind_manifest = self.manifest.setdefault(kind, {'offsets': {}})
+        kind_manifest.setdefault('chunks', [])
+        # only replaced once the new rows are stored
+        offsets = dict(kind_manifest['offsets'])
+        sources = dict(kind_manifest.get('sources', {}))
+
+        pending = []
+        mtimes = []
+        for filename in sorted(glob.glob(
+                os.path.join(self.data_directory, '*' + suffix)
+        )):
+            offset = offsets.get(os.path.basename(filename), 0)
+            # taken before reading, so that a file appended to while it
+            # is read is checked again next time
+            stat = os.stat(filename)
+            if stat.st_size > offset:
+                pending.append((kind, filename, offset))
+                mtimes.append(stat.st_mtime_ns)
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if len(pending) >= PARALLEL_MIN_FILES and max_workers > 1:
+            # spawned rather than forked, so that workers do not inherit
+            # the threads and SDL state of the trainer
+            with ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+            ) as executor:
+                parsed = list(executor.map(parse_result_file, *zip(*pending)))
+        else:
+            parsed = [parse_result_file(*args) for args in pending]
+
+        new = []
+        for (_, filename, _), mtime_ns, (columns, offset) in zip(
+                pending, mtimes, parsed
+        ):
+            name = os.path.basename(filename)
+            offsets[name] = offset
+            sources[name] = {
+                'mtime_ns': mtime_ns,
+                'tail': tail_checksum(filename, offset),
+            }
+            if columns['n_operands'].shape[0]:
+                new.append(columns)
+
+        n_rows = sum(columns['n_operands'].shape[0] for columns in new)
+        merged = []
+        if new:
+            if kind == 'abacus_as':
+                self._encode_presentation_methods(new)
+            merged = self._append(kind, concatenate_columns(new))
+        kind_manifest['offsets'] = offsets
+        kind_manifest['sources'] = sources
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self._write_manifest()
+
+        for chunk in merged:
+            shutil.rmtree(
+                os.path.join(self.directory, kind, chunk),
+                ignore_errors=True
+            )
+
+        return n_rows
+
+    def _encode_presentation_methods(self, new):
+        """Replaces the presentation method names parsed from the files
+        by their codes, adding new names to the manifest
+        """
+        presentation_methods = self.manifest['abacus_as'].setdefault(
+            'presentation_methods', []
+        )
+        for columns in new:
+            names = columns['presentation_method'].tolist()
+            for name in dict.fromkeys(names):
+                if name not in presentation_methods:
+                    presentation_methods.append(name)
+            codes = {
+                name: code for code, name in enumerate(presentation_methods)
+            }
+            columns['presentation_method'] = np.array(
+                [codes[name] for name in names],
+                dtype=COLUMN_DTYPES['presentation_method']
+            )
+
+    def update_all(self, max_workers=None):
+        return {
+            kind: self.update(kind, max_workers=max_workers)
+            for kind in KIND_SUFFIXES
+        }
+
+    def _append(self, kind, new):
+        """Stores new rows as a chunk of ``kind`` in the manifest, merged
+        with the last chunks while they are no bigger, and returns the
+        names of the chunks it replaces
+        """
+        kind_manifest = self.manifest[kind]
+        chunks = kind_manifest['chunks']
+        merged = []
+        n_rows = new['n_operands'].shape[0]
+        while chunks and (
+                chunks[-1]['rows'] <= n_rows or len(chunks) >= MAX_CHUNKS
+        ):
+            chunk = chunks.pop()
+            merged.append(chunk['name'])
+            new = concatenate_columns([
+                self._load_chunk(kind, chunk['name'], mmap_mode=None),
+                new,
+            ])
+            n_rows = new['n_operands'].shape[0]
+
+        name = 'chunk_{:06}'.format(kind_manifest.get('next_chunk', 0))
+        kind_manifest['next_chunk'] = kind_manifest.get('next_chunk', 0) + 1
+        chunk_directory = os.path.join(self.directory, kind, name)
+        if not os.path.isdir(chunk_directory):
+            os.makedirs(chunk_directory)
+        for column, values in new.items():
+            np.save(self._column_filename(kind, name, column), values)
+        chunks.append({'name': name, 'rows': n_rows})
+
+        return merged
+
+    def _load_chunk(self, kind, chunk, mmap_mode='r'):
+        return {
+            column: np.load(
+                self._column_filename(kind, chunk, column),
+                mmap_mode=mmap_mode
+            )
+            for column in KIND_COLUMNS[kind]
+        }
+
+    def load(self, kind, mmap_mode='r'):
+        """Returns a dict of the columns stored for ``kind`` (memory
+        mapped by default when there is a single chunk), or None if
+        nothing has been converted yet
+        """
+        chunks = self.manifest.get(kind, {}).get('chunks')
+        if not chunks:
+            return None
+        parts = [
+            self._load_chunk(kind, chunk['name'], mmap_mode=mmap_mode)
+            for chunk in chunks
+        ]
+        if len(parts) == 1:
+            return parts[0]
+        return concatenate_columns(parts)
+
+    def presentation_methods(self):
+        """Names of the presentation_method codes of the add/subtract
+        results
+        """
+        return self.manifest.get('abacus_as', {}).get(
+            'presentation_methods', []
+        )
+
+
+def concatenate_columns(parts):
+    """Concatenates dicts of columns, padding the operand matrices to the
+    widest
+    """
+    width = max(part['operands'].shape[1] for part in parts)
+    columns = {
+        'operands': np.vstack([
+            _pad_columns(np.asarray(part['operands']), width)
+            for part in parts
+        ])
+    }
+    for column in parts[0]:
+        if column != 'operands':
+            columns[column] = np.concatenate([
+                np.asarray(part[column]) for part in parts
+            ])
+    return columns
+
+
+def _pad_columns(array, width):
+    if array.shape[1] == width:
+        return array
+    padded = np.zeros((array.shape[0], width), dtype=array.dtype)
+    padded[:, :array.shape[1]] = array
+    return padded
+
+
+if __name__ == '__main__':
+    # one-shot/incremental conversion of the result files in the
+    # working directory
+    for kind, n_rows in sorted(ResultStore().update_all().items()):
+        print('{}: {} new rows'.format(kind, n_rows))
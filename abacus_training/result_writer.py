@@ -0,0 +1,177 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+
+
+logger = logging.getLogger(__name__)
+
+_CLOSE = object()
+
+# Writers still open at exit are closed, writing whatever they hold
+_open_writers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_writers():
+    for writer in list(_open_writers):
+        writer.close()
+
+
+class BatchWriter(object):
+    def __init__(
+            self,
+            commit,
+            flush_rows=16,
+            flush_seconds=2.,
+            max_pending=4096,
+            name='batch-writer',
+    ):
+        """Calls commit(items) from a background thread with groups of
+        the items given to put(), so that disk latency never reaches the
+        drills.
+
+        Items are committed in groups: once ``flush_rows`` are waiting
+        or ``flush_seconds`` after the oldest of them was put, whichever
+        is first. Up to ``max_pending`` items are buffered before put()
+        blocks. An exception raised by commit is logged and raised by
+        the next put() or flush(). Everything is committed on close(),
+        which also happens at exit.
+        """
+        self.commit = commit
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self.closed = False
+
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+        _open_writers.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def put(self, item):
+        if self.closed:
+            raise ValueError('put to closed {}'.format(type(self).__name__))
+        self._raise_error()
+        self._queue.put(item)
+
+    def flush(self):
+        """Waits until everything put so far has been committed"""
+        committed = threading.Event()
+        self._queue.put(committed)
+        committed.wait()
+        self._raise_error()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        _open_writers.discard(self)
+        self._closed()
+        self._raise_error()
+
+    def _closed(self):
+        """Called once the thread has committed everything"""
+
+    def _commit(self, items):
+        if not items:
+            return
+        try:
+            self.commit(items)
+        except Exception as e:
+            # raised by the next put() or flush() rather than ending
+            # the thread, which would leave them waiting forever
+            logger.exception('Could not commit in %s', self._thread.name)
+            self._error = e
+
+    def _run(self):
+        items = []
+        deadline = None
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0., deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _CLOSE and not isinstance(
+                    item, threading.Event
+            ):
+                items.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+                if len(items) < self.flush_rows:
+                    continue
+
+            try:
+                self._commit(items)
+            finally:
+                items = []
+                deadline = None
+                if isinstance(item, threading.Event):
+                    item.set()
+            if item is _CLOSE:
+                return
+
+
+class ResultWriter(BatchWriter):
+    def __init__(
+            self,
+            filename,
+            flush_rows=16,
+            flush_seconds=2.,
+            fsync=False,
+            max_pending=4096,
+            binary=False,
+    ):
+        """Appends lines to a result file from a background thread. It
+        has the write() of a text file, so it works with csv.writer.
+
+        Lines are committed in groups as by BatchWriter. Each group is
+        written with one call and flushed, and also fsynced if ``fsync``
+        is set. With ``binary`` set it takes bytes instead of text.
+        """
+        self.filename = filename
+        self.fsync = fsync
+        self._file = open(filename, 'ab' if binary else 'a')
+        self._empty = b'' if binary else ''
+        super().__init__(
+            self._write_lines,
+            flush_rows=flush_rows,
+            flush_seconds=flush_seconds,
+            max_pending=max_pending,
+            name='result-writer',
+        )
+
+    def write(self, text):
+        self.put(text)
+        return len(text)
+
+    def _write_lines(self, lines):
+        self._file.write(self._empty.join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _closed(self):
+        self._file.close()
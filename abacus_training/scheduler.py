@@ -0,0 +1,224 @@
+import heapq
+import json
+import os
+import threading
+import time
+
+from history import (
+    HistoryIndex,
+    problem_key,
+)
+
+
+SCHEDULE_FILENAME = 'abacus_as_schedule.json'
+
+# Seconds until a problem answered incorrectly is given again
+RETRY_INTERVAL = 120.
+# Problems whose interval grows past this are considered learned and
+# leave the schedule
+RETIRE_INTERVAL = 90 * 24 * 60 * 60.
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+MAX_EASE = 3.
+
+# A response is slow when it takes longer than this times the running
+# mean response time
+SLOW_FACTOR = 1.5
+# Weight of each new response time in the running mean
+MEAN_RESPONSE_TIME_WEIGHT = .05
+
+
+class Review(object):
+    __slots__ = ('due', 'interval', 'ease', 'lapses', 'reviews')
+
+    def __init__(
+            self,
+            due,
+            interval=RETRY_INTERVAL,
+            ease=INITIAL_EASE,
+            lapses=0,
+            reviews=0,
+    ):
+        self.due = due
+        self.interval = interval
+        self.ease = ease
+        self.lapses = lapses
+        self.reviews = reviews
+
+    def to_list(self):
+        return [self.due, self.interval, self.ease, self.lapses, self.reviews]
+
+
+class ReviewScheduler(object):
+    def __init__(self, filename=SCHEDULE_FILENAME, mean_response_time=None):
+        """Spaced-repetition schedule (SM-2 style) of the add/subtract
+        problems that were answered incorrectly or slowly.
+
+        Every scheduled problem has a due time. An incorrect answer
+        brings it back after RETRY_INTERVAL and lowers its ease; a
+        correct answer multiplies its interval by its ease, which a slow
+        answer lowers and a fast one raises. Due times are kept in a
+        heap, so choosing and rescheduling a problem are O(log n).
+        Entries left in the heap by rescheduling are skipped when
+        popped.
+        """
+        self.filename = filename
+        self.mean_response_time = mean_response_time
+        self.reviews = {}
+        self.heap = []
+        # due times of the problems popped but not answered yet
+        self.unanswered = {}
+        # problems are chosen from a prefetching thread
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, filename=SCHEDULE_FILENAME, history=None):
+        """Loads the schedule saved in ``filename``. When there is none,
+        the schedule is seeded from ``history`` (a HistoryIndex or
+        ResultDatabase), loading a HistoryIndex if none is given.
+        """
+        if not os.path.exists(filename):
+            if history is None:
+                history = HistoryIndex.load()
+            return cls.from_history(history, filename=filename)
+
+        with open(filename) as f:
+            state = json.load(f)
+
+        scheduler = cls(filename, state['mean_response_time'])
+        for problem, review in state['reviews'].items():
+            scheduler.reviews[problem] = Review(*review)
+        scheduler.heap = [
+            (review.due, problem)
+            for problem, review in scheduler.reviews.items()
+        ]
+        heapq.heapify(scheduler.heap)
+
+        return scheduler
+
+    @classmethod
+    def from_history(cls, history, filename=SCHEDULE_FILENAME, now=None):
+        """Schedules every incorrect or slow problem in ``history``,
+        all due immediately
+        """
+        if now is None:
+            now = time.time()
+
+        summaries = list(history.summaries())
+        scheduler = cls(filename)
+        if not summaries:
+            return scheduler
+
+        total_response_time = sum(summary[3] for summary in summaries)
+        total_attempts = sum(summary[1] for summary in summaries)
+        if total_attempts:
+            scheduler.mean_response_time = (
+                total_response_time / total_attempts
+            )
+
+        for problem, attempts, incorrect, total_response_time, \
+                max_response_time in summaries:
+            if incorrect or scheduler.is_slow(max_response_time):
+                review = Review(now, lapses=int(incorrect), reviews=attempts)
+                scheduler.reviews[problem] = review
+                scheduler.heap.append((review.due, problem))
+        heapq.heapify(scheduler.heap)
+
+        return scheduler
+
+    def __len__(self):
+        return len(self.reviews)
+
+    def save(self):
+        with self.lock:
+            state = {
+                'mean_response_time': self.mean_response_time,
+                'reviews': {
+                    problem: review.to_list()
+                    for problem, review in self.reviews.items()
+                },
+            }
+
+        partial_filename = self.filename + '.part'
+        with open(partial_filename, 'w') as f:
+            json.dump(state, f)
+        os.replace(partial_filename, self.filename)
+
+    def is_slow(self, response_time):
+        return (
+            self.mean_response_time is not None
+            and response_time > SLOW_FACTOR * self.mean_response_time
+        )
+
+    def pop_due(self, now=None):
+        """Operands of the scheduled problem that has been due the
+        longest, or None if no problem is due. The problem is
+        rescheduled when its result is added, or by
+        restore_unanswered() if it never is.
+        """
+        if now is None:
+            now = time.time()
+
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                due, problem = heapq.heappop(self.heap)
+                review = self.reviews.get(problem)
+                if review is not None and review.due == due:
+                    self.unanswered[problem] = due
+                    return [int(operand) for operand in problem.split(';')]
+
+        return None
+
+    def restore_unanswered(self):
+        """Puts back the problems popped but never answered, such as
+        those prefetched when a session ends, as they were due
+        """
+        with self.lock:
+            for problem, due in self.unanswered.items():
+                review = self.reviews.get(problem)
+                if review is not None and review.due == due:
+                    heapq.heappush(self.heap, (due, problem))
+            self.unanswered.clear()
+
+    def add(self, operands, response_time, is_correct, now=None):
+        """Records one result, as written by write_problem_result"""
+        if now is None:
+            now = time.time()
+
+        problem = problem_key(operands)
+        with self.lock:
+            self.unanswered.pop(problem, None)
+            is_slow = self.is_slow(response_time)
+            if self.mean_response_time is None:
+                self.mean_response_time = response_time
+            else:
+                self.mean_response_time += MEAN_RESPONSE_TIME_WEIGHT * (
+                    response_time - self.mean_response_time
+                )
+
+            review = self.reviews.get(problem)
+            if review is None:
+                if is_correct and not is_slow:
+                    return
+                review = Review(now)
+                self.reviews[problem] = review
+
+            review.reviews += 1
+            if not is_correct:
+                review.lapses += 1
+                review.ease = max(MIN_EASE, review.ease - .2)
+                review.interval = RETRY_INTERVAL
+            elif is_slow:
+                review.ease = max(MIN_EASE, review.ease - .15)
+                review.interval *= MIN_EASE
+            else:
+                review.ease = min(MAX_EASE, review.ease + .05)
+                review.interval *= review.ease
+
+            if review.interval > RETIRE_INTERVAL:
+                del self.reviews[problem]
+                return
+
+            review.due = now + review.interval
+            heapq.heappush(self.heap, (review.due, problem))
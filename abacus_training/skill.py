@@ -0,0 +1,143 @@
+import threading
+
+import numpy as np
+
+import operation as op
+from result_store import ResultStore
+
+
+# Prior belief about the seconds each operation takes, and how strongly
+# it is held (in units of observed problems)
+PRIOR_OPERATION_SECONDS = .5
+PRIOR_PRECISION = 1.
+# Prior pseudo-counts of errors and correct answers for every operation
+PRIOR_ERRORS = 1.
+PRIOR_CORRECT = 9.
+
+# Relative weight of error rate and latency in an operation's weakness
+ERROR_WEIGHT = 1.
+LATENCY_WEIGHT = 1.
+# Share of op_freq spread uniformly so that no operation disappears
+EXPLORATION = .2
+
+
+class SkillModel(object):
+    def __init__(self):
+        """Per-operation estimates of how slow and error prone the
+        student is with each of the OPERATION_COUNT bead operations.
+
+        Response times of correct answers are modelled as a constant
+        plus the sum of the seconds of each operation performed, fitted
+        by Bayesian linear regression: the posterior precision matrix
+        and weighted targets are running sums, so adding a result is a
+        rank one update and the fit a 28 x 28 solve. Every error is
+        shared between the operations of the problem in proportion to
+        how often each was performed, giving Beta posteriors of the
+        per-operation error rates.
+        """
+        n_features = op.OPERATION_COUNT + 1
+        self.precision = PRIOR_PRECISION * np.eye(n_features)
+        self.weighted_targets = np.zeros(n_features)
+        self.weighted_targets[:op.OPERATION_COUNT] = (
+            PRIOR_PRECISION * PRIOR_OPERATION_SECONDS
+        )
+        self.errors = np.full(op.OPERATION_COUNT, PRIOR_ERRORS)
+        self.correct = np.full(op.OPERATION_COUNT, PRIOR_CORRECT)
+
+        # results are added on the main thread while problems are
+        # generated on a prefetching thread
+        self.lock = threading.Lock()
+        self._op_freq = None
+
+    @classmethod
+    def load(cls, store=None, database=None):
+        """Fits a model to every add/subtract result, read from
+        ``database`` (an add/subtract ResultDatabase) if given, or else
+        from the ResultStore
+        """
+        if database is not None:
+            columns = database.load()
+        else:
+            if store is None:
+                store = ResultStore()
+            store.update('abacus_as')
+            columns = store.load('abacus_as')
+        model = cls()
+        if columns is not None:
+            model.add_columns(columns)
+        return model
+
+    def add_columns(self, columns):
+        """Adds ResultStore columns of add/subtract results"""
+        # operands are padded with zeros, which need no operations
+        self.add_counts(
+            op.operation_histograms(columns['operands']),
+            np.asarray(columns['response_time'], dtype=np.float64),
+            np.asarray(columns['correct'], dtype=bool),
+        )
+
+    def add_counts(self, counts, response_times, correct):
+        """Adds results given the operation counts of their problems, an
+        array of shape (n_results, OPERATION_COUNT)
+        """
+        counts = np.asarray(counts, dtype=np.float64)
+        features = np.hstack([counts, np.ones((counts.shape[0], 1))])
+
+        timed = features[correct]
+        shares = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1.)
+        with self.lock:
+            self.precision += timed.T @ timed
+            self.weighted_targets += timed.T @ response_times[correct]
+            self.errors += shares[~correct].sum(axis=0)
+            self.correct += shares[correct].sum(axis=0)
+            self._op_freq = None
+
+    def add(self, operands, response_time, is_correct):
+        """Records one result, as written by write_problem_result"""
+        self.add_counts(
+            op.problem_operation_counts(operands)[None, :],
+            np.array([response_time], dtype=np.float64),
+            np.array([is_correct], dtype=bool),
+        )
+
+    def operation_seconds(self):
+        """Posterior mean of the seconds each operation takes"""
+        with self.lock:
+            return self._operation_seconds()
+
+    def _operation_seconds(self):
+        weights = np.linalg.solve(self.precision, self.weighted_targets)
+        return weights[:op.OPERATION_COUNT]
+
+    def error_rates(self):
+        """Posterior mean of the error rate of each operation"""
+        with self.lock:
+            return self._error_rates()
+
+    def _error_rates(self):
+        return self.errors / (self.errors + self.correct)
+
+    def op_freq(self):
+        """Operation frequencies for digit_pair_prob that favour the
+        slowest and most error prone operations
+        """
+        # computed under the lock so that a result added meanwhile
+        # cannot be missed by the cached frequencies
+        with self.lock:
+            if self._op_freq is None:
+                self._op_freq = self._compute_op_freq()
+            return self._op_freq
+
+    def _compute_op_freq(self):
+        seconds = np.maximum(self._operation_seconds(), 0.)
+        error_rates = self._error_rates()
+        weakness = (
+            LATENCY_WEIGHT * seconds / max(seconds.mean(), 1.e-6)
+            + ERROR_WEIGHT * error_rates / error_rates.mean()
+        )
+        op_freq = (
+            (1. - EXPLORATION) * weakness / weakness.sum()
+            + EXPLORATION / op.OPERATION_COUNT
+        )
+        # digit_pair_prob needs frequencies summing to 1 within 1e-6
+        return op_freq / op_freq.sum()
@@ -0,0 +1,504 @@
+import hashlib
+import logging
+import math
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import wave
+
+import numpy as np
+import pygame
+
+from number_words import (
+    all_fragments,
+    can_split,
+    number_fragments,
+)
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'abacus_training', 'speech'
+)
+CACHE_MAX_BYTES = 50 * 2 ** 20
+
+# Name of the synthesis backend used by default_speech_cache
+SPEECH_BACKEND = os.environ.get('ABACUS_SPEECH_BACKEND', 'google')
+
+# Audio files pygame.mixer.Sound can decode; pygame 1.9 cannot decode
+# MP3, so other files are converted with CONVERTER for NumberSpeech
+SOUND_EXTENSIONS = {'.wav', '.ogg'}
+CONVERTER = 'ffmpeg'
+
+
+class SpeechBackend(object):
+    """Turns text into an audio file"""
+    name = None
+    extension = None
+
+    def synthesize(self, text, language, filename):
+        raise NotImplementedError()
+
+
+class GoogleSpeechBackend(SpeechBackend):
+    """Google Translate text to speech (needs network access)"""
+    name = 'google'
+    extension = '.mp3'
+
+    def synthesize(self, text, language, filename):
+        from google_speech import Speech
+        Speech(text, language).save(filename)
+
+
+class EspeakBackend(SpeechBackend):
+    """Offline synthesis with the espeak command line program"""
+    name = 'espeak'
+    extension = '.wav'
+
+    def synthesize(self, text, language, filename):
+        subprocess.check_call(
+            ['espeak', '-v', language, '-w', filename, text]
+        )
+
+
+class ToneBackend(SpeechBackend):
+    """Stand-in that 'speaks' every character as a short tone, for
+    testing without a synthesizer
+    """
+    name = 'tone'
+    extension = '.wav'
+    sample_rate = 22050
+    tone_seconds = .12
+
+    def synthesize(self, text, language, filename):
+        n_samples = int(self.sample_rate * self.tone_seconds)
+        samples = []
+        for character in text:
+            step = 2 * math.pi * 220. * 2 ** ((ord(character) % 24) / 12.)
+            samples.extend(
+                int(8000 * math.sin(step * n / self.sample_rate))
+                for n in range(n_samples)
+            )
+
+        with wave.open(filename, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            f.writeframes(struct.pack('<{}h'.format(len(samples)), *samples))
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (GoogleSpeechBackend, EspeakBackend, ToneBackend)
+}
+
+
+class SpeechCache(object):
+    def __init__(
+            self,
+            backend,
+            directory=CACHE_DIRECTORY,
+            max_bytes=CACHE_MAX_BYTES,
+    ):
+        """On-disk cache of synthesized speech keyed by text and
+        language. The least recently used files are removed once the
+        cache grows past ``max_bytes``.
+        """
+        self.backend = backend
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def filename(self, text, language):
+        key = hashlib.sha1(
+            '\0'.join((self.backend.name, language, text)).encode('utf-8')
+        ).hexdigest()
+        return os.path.join(self.directory, key + self.backend.extension)
+
+    def get(self, text, language):
+        """Returns the name of an audio file of ``text`` spoken in
+        ``language``, synthesizing it if it is not cached
+        """
+        filename = self.filename(text, language)
+        if os.path.exists(filename):
+            # record the use for least-recently-used eviction
+            os.utime(filename, None)
+            return filename
+
+        partial_filename = filename + '.part' + self.backend.extension
+        self.backend.synthesize(text, language, partial_filename)
+        os.replace(partial_filename, filename)
+        self.evict(keep=filename)
+
+        return filename
+
+    def can_make_sounds(self):
+        """Whether sound() can give files pygame.mixer.Sound decodes"""
+        return (
+            self.backend.extension in SOUND_EXTENSIONS
+            or shutil.which(CONVERTER) is not None
+        )
+
+    def sound(self, text, language):
+        """Same as get, but returns a file pygame.mixer.Sound can
+        decode. Files of other formats are converted to WAV once, and
+        only the WAV file is kept.
+        """
+        if self.backend.extension in SOUND_EXTENSIONS:
+            return self.get(text, language)
+
+        filename = os.path.splitext(self.filename(text, language))[0] + '.wav'
+        if os.path.exists(filename):
+            os.utime(filename, None)
+            return filename
+
+        source = self.get(text, language)
+        partial_filename = filename + '.part.wav'
+        subprocess.check_call([
+            CONVERTER, '-loglevel', 'error', '-y',
+            '-i', source,
+            partial_filename,
+        ])
+        os.replace(partial_filename, filename)
+        os.remove(source)
+        self.evict(keep=filename)
+
+        return filename
+
+    def evict(self, keep=None):
+        """Removes the least recently used files until the cache fits
+        in max_bytes, except for ``keep``
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            # files still being synthesized are about to be renamed
+            if path == keep or '.part' in name:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # evicted by another thread meanwhile
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        if keep is not None and os.path.exists(keep):
+            total_bytes += os.path.getsize(keep)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+
+_default_speech_cache = None
+
+
+def default_speech_cache():
+    global _default_speech_cache
+    if _default_speech_cache is None:
+        _default_speech_cache = SpeechCache(BACKENDS[SPEECH_BACKEND]())
+    return _default_speech_cache
+
+
+def _init_mixer():
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+
+
+class NumberSpeech(object):
+    def __init__(
+            self,
+            language,
+            speech_cache=None,
+            gap_seconds=.04,
+            silence_threshold=.02,
+    ):
+        """Speaks any number by joining recordings of the fragments it
+        is made of ('three hundred', 'thousand', ...), so that only the
+        small fragment set of a language is ever synthesized. load()
+        decodes every fragment into the mixer's sample format, trimming
+        the silence around it; after that sound() builds the speech of
+        a number in memory.
+        """
+        self.language = language
+        self.speech_cache = speech_cache or default_speech_cache()
+        self.gap_seconds = gap_seconds
+        self.silence_threshold = silence_threshold
+        self.samples = {}
+        # set when the fragments cannot be loaded, so that numbers are
+        # spoken whole
+        self.failed = False
+        self._loaded = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._loaded.is_set()
+
+    def can_speak(self, number):
+        return can_split(number, self.language)
+
+    def _trim(self, samples):
+        if samples.dtype.kind == 'u':
+            center = (np.iinfo(samples.dtype).max + 1) // 2
+            full_scale = center
+        elif samples.dtype.kind == 'i':
+            center = 0
+            full_scale = np.iinfo(samples.dtype).max
+        else:
+            center = 0
+            full_scale = 1.
+
+        amplitude = np.abs(samples.astype(np.float64) - center)
+        if amplitude.ndim > 1:
+            amplitude = amplitude.max(axis=1)
+        loud = np.flatnonzero(amplitude > self.silence_threshold * full_scale)
+        if loud.shape[0] == 0:
+            return samples[:0]
+        return samples[loud[0]:loud[-1] + 1]
+
+    def load(self):
+        """Synthesizes (or finds) and decodes every fragment"""
+        _init_mixer()
+        frequency = pygame.mixer.get_init()[0]
+        for fragment in all_fragments(self.language):
+            sound = pygame.mixer.Sound(
+                self.speech_cache.sound(fragment, self.language)
+            )
+            self.samples[fragment] = self._trim(pygame.sndarray.array(sound))
+
+        example = next(iter(self.samples.values()))
+        self._gap = np.zeros(
+            (int(self.gap_seconds * frequency),) + example.shape[1:],
+            dtype=example.dtype
+        )
+        if example.dtype.kind == 'u':
+            self._gap += (np.iinfo(example.dtype).max + 1) // 2
+        self._loaded.set()
+
+    def _load_until_shutdown(self):
+        try:
+            self.load()
+        except Exception:
+            # the mixer may have been shut down under the thread, as at
+            # exit
+            if pygame.mixer.get_init():
+                self.failed = True
+                logger.exception(
+                    'Could not load the %s number fragments; numbers '
+                    'are spoken whole',
+                    self.language,
+                )
+
+    def load_in_background(self):
+        if self._thread is not None or self.failed:
+            return
+        if not self.speech_cache.can_make_sounds():
+            # checked first, so that no fragment is synthesized in vain
+            self.failed = True
+            logger.warning(
+                'Numbers are spoken whole: pygame cannot decode %s files '
+                'and %s was not found to convert them',
+                self.speech_cache.backend.extension,
+                CONVERTER,
+            )
+            return
+
+        self._thread = threading.Thread(
+            target=self._load_until_shutdown,
+            name='number-speech',
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def sound(self, number):
+        """A pygame Sound of ``number`` spoken. load() must have
+        finished.
+        """
+        parts = []
+        for fragment in number_fragments(number, self.language):
+            if parts:
+                parts.append(self._gap)
+            parts.append(self.samples[fragment])
+        return pygame.sndarray.make_sound(
+            np.ascontiguousarray(np.concatenate(parts))
+        )
+
+
+def as_number(text):
+    """The integer ``text`` spells with digits, or None"""
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+
+# Seconds between checks of whether an audio file pygame cannot decode
+# as a Sound has finished playing
+MUSIC_POLL_SECONDS = .02
+
+# Posted by SpeechPlayer after each text has been spoken, with the
+# attributes 'utterance', 'spoken' and 'total'
+SPEECH_EVENT = pygame.USEREVENT + 1
+
+
+class SpeechPlayer(object):
+    def __init__(self, speech_cache=None, compose_numbers=True):
+        """Speaks a sequence of texts on a background thread, so that
+        the event loop keeps handling input while numbers are read.
+        Progress is reported by posting SPEECH_EVENTs.
+
+        With ``compose_numbers``, texts that are integers are spoken
+        with NumberSpeech once its fragments have been loaded for the
+        language, rather than synthesized one by one.
+        """
+        self.speech_cache = speech_cache or default_speech_cache()
+        self.compose_numbers = compose_numbers
+        self.number_speech = {}
+        self.utterance = 0
+        self._thread = None
+        self._stop = threading.Event()
+        # held while checking for a stop and starting playback, so that
+        # no thread starts playing once stop() has returned
+        self._playback_lock = threading.Lock()
+
+    def preload(self, language):
+        """Starts loading the number fragments of ``language`` in the
+        background
+        """
+        if not self.compose_numbers:
+            return None
+        number_speech = self.number_speech.get(language)
+        if number_speech is None:
+            number_speech = NumberSpeech(language, self.speech_cache)
+            self.number_speech[language] = number_speech
+            number_speech.load_in_background()
+        return number_speech
+
+    def speak(self, texts, language, inter_text_pause=1.5):
+        """Starts speaking ``texts``, interrupting anything being
+        spoken
+        """
+        self.stop()
+        self.preload(language)
+        self.utterance += 1
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._speak,
+            args=(
+                self.utterance,
+                list(texts),
+                language,
+                inter_text_pause,
+                self._stop,
+            ),
+            name='speech',
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _audio(self, text, language):
+        """A Sound of ``text``, built from number fragments when
+        possible or else decoded from the cache. The name of its audio
+        file is returned instead when pygame cannot decode it.
+        """
+        number_speech = self.number_speech.get(language)
+        number = as_number(text)
+        if (
+                number_speech is not None
+                and number_speech.ready
+                and number is not None
+                and number_speech.can_speak(number)
+        ):
+            return number_speech.sound(number)
+        if self.speech_cache.can_make_sounds():
+            return pygame.mixer.Sound(self.speech_cache.sound(text, language))
+        return self.speech_cache.get(text, language)
+
+    def _speak(self, utterance, texts, language, inter_text_pause, stop):
+        try:
+            self._speak_texts(
+                utterance,
+                texts,
+                language,
+                inter_text_pause,
+                stop,
+            )
+        except (pygame.error, SystemError):
+            # pygame may be shut down under a thread that was stopped or
+            # is left behind at exit
+            if pygame.get_init() and not stop.is_set():
+                raise
+
+    def _speak_texts(
+            self,
+            utterance,
+            texts,
+            language,
+            inter_text_pause,
+            stop,
+    ):
+        _init_mixer()
+        # synthesize (or find) every text before speaking the first one
+        audio = [self._audio(text, language) for text in texts]
+
+        for text_n, sound in enumerate(audio):
+            with self._playback_lock:
+                if stop.is_set():
+                    return
+                if isinstance(sound, pygame.mixer.Sound):
+                    # the channel playing longest is taken over when
+                    # none is free; with no channels at all the text
+                    # goes unheard, but is still waited for
+                    if pygame.mixer.get_num_channels():
+                        pygame.mixer.find_channel(True).play(sound)
+                else:
+                    pygame.mixer.music.load(sound)
+                    pygame.mixer.music.play()
+
+            # channel end events are only posted to the event queue, so
+            # a Sound is waited for by its length; music files, which
+            # have no known length, are polled
+            if isinstance(sound, pygame.mixer.Sound):
+                if stop.wait(sound.get_length()):
+                    return
+            else:
+                while pygame.mixer.music.get_busy():
+                    if stop.wait(MUSIC_POLL_SECONDS):
+                        return
+
+            pygame.event.post(pygame.event.Event(
+                SPEECH_EVENT,
+                utterance=utterance,
+                spoken=text_n + 1,
+                total=len(texts),
+            ))
+            if text_n + 1 < len(audio) and stop.wait(inter_text_pause):
+                return
+
+    @property
+    def speaking(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        """Stops speaking without waiting for the background thread,
+        which may still be synthesizing; it leaves without playing
+        anything
+        """
+        with self._playback_lock:
+            self._stop.set()
+            if self.speaking and pygame.mixer.get_init():
+                pygame.mixer.music.stop()
+                pygame.mixer.stop()
+        self._thread = None
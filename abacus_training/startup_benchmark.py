@@ -0,0 +1,198 @@
+"""Times a cold start of training.py, from launching the interpreter to
+the first frame of the main menu, without a display. It starts in an
+empty temporary directory, so no result files or stores are read or
+written.
+
+For example
+
+    python startup_benchmark.py --output before.json
+    python startup_benchmark.py --compare before.json
+
+Exits with status 1 if the median start time is more than
+--max-regression slower than the compared run, or over --budget-ms.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SOURCE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Runs training.py as __main__, leaving as soon as its first frame has
+# been drawn
+LAUNCHER = '''
+import os
+import runpy
+import sys
+
+import pygame
+
+
+def exit_after(draw):
+    def draw_and_exit(*args, **kwargs):
+        draw(*args, **kwargs)
+        os._exit(0)
+    return draw_and_exit
+
+
+pygame.display.flip = exit_after(pygame.display.flip)
+pygame.display.update = exit_after(pygame.display.update)
+runpy.run_path(sys.argv[1], run_name='__main__')
+'''
+
+IMPORT_TIME = re.compile(
+    r'import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<name>.+)'
+)
+
+
+def start_once():
+    """Returns the seconds to the first frame and the -X importtime
+    lines of one cold start
+    """
+    env = dict(
+        os.environ,
+        SDL_VIDEODRIVER='dummy',
+        SDL_AUDIODRIVER='dummy',
+        PYTHONPATH=os.pathsep.join(
+            [SOURCE_DIRECTORY] + os.environ.get('PYTHONPATH', '').split(
+                os.pathsep
+            )
+        ).rstrip(os.pathsep),
+    )
+    # the result files, store and schedule are found in the working
+    # directory
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        process = subprocess.run(
+            [
+                sys.executable,
+                '-X',
+                'importtime',
+                '-c',
+                LAUNCHER,
+                os.path.join(SOURCE_DIRECTORY, 'training.py'),
+            ],
+            cwd=directory,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        duration = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(
+            'training.py failed to start:\n' + process.stderr.decode()
+        )
+
+    return duration, process.stderr.decode().splitlines()
+
+
+def slowest_imports(lines, count):
+    """The ``count`` top level imports with the largest cumulative times,
+    as (name, milliseconds)
+    """
+    imports = []
+    for line in lines:
+        match = IMPORT_TIME.match(line)
+        # nested imports are indented
+        if match is not None and not match.group('name').startswith(' '):
+            imports.append((
+                match.group('name'),
+                int(match.group('cumulative')) / 1000.
+            ))
+    imports.sort(key=lambda item: -item[1])
+    return imports[:count]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=SOURCE_DIRECTORY,
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(repeat, n_imports):
+    durations = np.empty(repeat, dtype=np.float64)
+    for run_n in range(repeat):
+        durations[run_n], lines = start_once()
+
+    imports = slowest_imports(lines, n_imports)
+    for name, milliseconds in imports:
+        print('{:<40} {:>10.1f} ms'.format(name, milliseconds))
+    print('{:<40} {:>10.1f} ms (median of {})'.format(
+        'first frame',
+        1000. * float(np.median(durations)),
+        repeat,
+    ))
+
+    return {
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(),
+        'python_version': sys.version.split()[0],
+        'repeat': repeat,
+        'first_frame_ms': [1000. * float(d) for d in durations],
+        'median_first_frame_ms': 1000. * float(np.median(durations)),
+        'slowest_imports_ms': imports,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--imports',
+        type=int,
+        default=10,
+        help='number of slowest imports to list',
+    )
+    parser.add_argument('--output', help='JSON file to save results to')
+    parser.add_argument('--compare', help='JSON results to compare against')
+    parser.add_argument(
+        '--max-regression',
+        type=float,
+        default=.2,
+        help='largest allowed slowdown relative to --compare',
+    )
+    parser.add_argument(
+        '--budget-ms',
+        type=float,
+        help='largest allowed median time to the first frame',
+    )
+    args = parser.parse_args()
+
+    report = run(args.repeat, args.imports)
+    median = report['median_first_frame_ms']
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    failed = False
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        change = median / baseline['median_first_frame_ms'] - 1.
+        print('\nChange relative to {}: {:+.1f}%'.format(
+            baseline.get('commit') or 'baseline',
+            100. * change,
+        ))
+        if change > args.max_regression:
+            print('Start up regressed by more than {:.0f}%'.format(
+                100. * args.max_regression
+            ))
+            failed = True
+    if args.budget_ms is not None and median > args.budget_ms:
+        print('Start up took longer than {:.0f} ms'.format(args.budget_ms))
+        failed = True
+
+    sys.exit(1 if failed else 0)
@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 import csv
 import datetime
 from enum import Enum
@@ -11,8 +12,8 @@ from add_subtract import (
     display_abacus_add_subtract_problem,
     display_arabic_add_subtract_problem,
     format_operand,
+    generate_new_problem,
     generate_problems,
-    read_problem,
     storage_filename,
     write_problem_result,
 )
@@ -22,19 +23,60 @@ from bead import (
     height_to_width,
     numerify,
 )
+from keystroke_log import (
+    Attempt,
+    keystroke_filename,
+)
+from prefetch import (
+    BackgroundCall,
+    Prefetcher,
+)
 from pygame_utilities import (
     display_centered_text,
     ENTER_KEYS,
+    EventLoop,
     format_number,
     Menu,
     MenuChoice,
     NUMBER_TO_KEYS,
     NUMBER_KEYS,
+    show_for,
+    text_cache,
+    wait_for_keypress,
+)
+from result_database import ResultDatabase
+from result_store import ResultStore
+from result_writer import ResultWriter
+from scheduler import ReviewScheduler
+from skill import SkillModel
+from speech import (
+    SPEECH_EVENT,
+    SpeechPlayer,
+    default_speech_cache,
 )
 
 
 os.environ['SDL_VIDEO_CENTERED'] = '1'
 
+# Path of an SQLite database to record results in instead of the daily
+# result files
+RESULT_DATABASE = os.environ.get('ABACUS_RESULT_DATABASE')
+
+# Results are written to the daily files by a background thread, in
+# groups of up to ABACUS_RESULT_FLUSH_ROWS rows at most
+# ABACUS_RESULT_FLUSH_SECONDS apart. Set ABACUS_RESULT_FSYNC=1 to fsync
+# every group.
+RESULT_WRITER_OPTIONS = {
+    'flush_rows': int(os.environ.get('ABACUS_RESULT_FLUSH_ROWS', 16)),
+    'flush_seconds': float(
+        os.environ.get('ABACUS_RESULT_FLUSH_SECONDS', 2.)
+    ),
+    'fsync': os.environ.get('ABACUS_RESULT_FSYNC') == '1',
+}
+
+# Number of add/subtract problems generated ahead of time
+PREFETCH_DEPTH = 4
+
 SCREEN_HEIGHT = 800
 SCREEN_WIDTH = 800
 SCREEN_SIZE = (SCREEN_WIDTH, SCREEN_HEIGHT)
@@ -89,20 +131,21 @@ def give_problem(
         prior_response_time=None,
         number_style=NumberStyle.ARABIC,
         language='en',
+        scheduler=None,
+        skill_model=None,
+        database=None,
+        speech_player=None,
+        keystroke_log=None,
 ):
     if font is None:
         font = pygame.font.SysFont(
             'Lucida Console', font_size
         )
-    column_width = height_to_width(font_size)
-    clock = pygame.time.Clock()
     entered_digits = []
 
     # wait for start
-    while True:
+    def draw_start():
         screen.fill(BLACK)
-
-        exit_while = False
         if prior_response_time:
             display_centered_text(
                 screen,
@@ -110,132 +153,309 @@ def give_problem(
                 bead_color,
                 font,
             )
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_q:
-                    return True, None
-                start_time = pygame.time.get_ticks()
-                exit_while = True
-        if exit_while:
-            break
-
         pygame.display.flip()
-        clock.tick(frames_per_second)
+
+    if wait_for_keypress(draw_start) == pygame.K_q:
+        return True, None
+
+    # render the problem once; afterwards only the response is redrawn
+    problem_layer = pygame.Surface(screen.get_size())
+    problem_layer.fill(BLACK)
+    x_response, y_response, width = None, None, None
+    if number_style == NumberStyle.ABACUS:
+        x_response, y_response = display_abacus_add_subtract_problem(
+            problem_layer,
+            bead_color,
+            separator_bead_color,
+            (25, 25),
+            font_size,
+            operands,
+            font=font,
+        )
+    elif number_style == NumberStyle.ARABIC:
+        (
+            x_response,
+            y_response,
+            width
+        ) = display_arabic_add_subtract_problem(
+            problem_layer,
+            bead_color,
+            operands,
+            font
+        )
+    screen.blit(problem_layer, (0, 0))
+    pygame.display.flip()
+    # timed from when the problem is on screen
+    attempt = Attempt()
 
     # present problem and collect response
-    read = True
-    while True:
-        if read and number_style == NumberStyle.VERBAL:
-            read_problem(
-                operands,
-                inter_operand_pause=2.,
-                language=language
-            )
-            read = False
+    response_rect = None
 
-        screen.fill(BLACK)
-        if number_style == NumberStyle.ABACUS:
-            x_response, y_response = display_abacus_add_subtract_problem(
-                screen,
-                bead_color,
-                separator_bead_color,
-                (25, 25),
-                font_size,
-                operands,
-                font=font,
+    def draw():
+        nonlocal response_rect
+
+        dirty_rects = []
+        if response_rect is not None:
+            screen.blit(problem_layer, response_rect, response_rect)
+            dirty_rects.append(response_rect)
+        response_rect = display_response(
+            screen,
+            entered_digits,
+            number_style,
+            x_response,
+            y_response,
+            width,
+            font,
+            font_size,
+            bead_color,
+            separator_bead_color,
+            status='{}/{}'.format(spoken, len(operands)),
+        )
+        dirty_rects.append(response_rect)
+        pygame.display.update(dirty_rects)
+
+    if number_style == NumberStyle.VERBAL and speech_player is None:
+        speech_player = SpeechPlayer(default_speech_cache())
+    spoken = 0
+
+    def read():
+        nonlocal spoken
+
+        if number_style == NumberStyle.VERBAL:
+            spoken = 0
+            speech_player.speak(
+                [str(operand) for operand in operands],
+                language,
+                inter_text_pause=2.,
             )
-            draw_columns(
-                screen,
-                bead_color,
-                (x_response - len(entered_digits) * column_width,
-                 y_response),
-                font_size,
+
+    def handle_event(event):
+        nonlocal attempt, spoken
+
+        if (
+                event.type == SPEECH_EVENT
+                and speech_player is not None
+                and event.utterance == speech_player.utterance
+        ):
+            spoken = event.spoken
+            loop.redraw()
+        if event.type != pygame.KEYDOWN:
+            return
+        attempt.record(event.key, loop.event_time_ns)
+        collect_digits(entered_digits, event.key)
+        loop.redraw()
+
+        if event.key in ENTER_KEYS:
+            response_time = attempt.seconds(loop.event_time_ns)
+            correct, response = check_response(
                 entered_digits,
-                separator_bead_color=separator_bead_color,
+                operands
             )
-        elif number_style == NumberStyle.ARABIC:
-            (
-                x_response,
-                y_response,
-                width
-            ) = display_arabic_add_subtract_problem(
-                screen,
-                bead_color,
+            write_problem_result(
+                result_file,
                 operands,
-                font
-            )
-            surface = font.render(
-                format_operand(numerify(entered_digits)),
-                True,
-                bead_color
-            )
-            screen.blit(
-                surface,
-                (x_response + width - surface.get_width(), y_response)
-            )
-        elif number_style == NumberStyle.VERBAL:
-            display_centered_text(
-                screen,
-                format_number(numerify(entered_digits)),
-                bead_color,
-                font,
+                response,
+                response_time,
+                correct,
+                number_style,
+                database=database,
+                scheduler=scheduler,
+                skill_model=skill_model,
+                attempt_key=attempt.key,
             )
+            if keystroke_log is not None:
+                keystroke_log.write(attempt.to_bytes())
+            if correct:
+                loop.stop((False, response_time))
+            else:
+                attempt = Attempt(loop.event_time_ns)
+                entered_digits.clear()
+                loop.schedule(0., read)
+        elif event.key == pygame.K_q:
+            loop.stop((True, None))
         else:
             pass
 
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                collect_digits(entered_digits, event.key)
-
-                if event.key in ENTER_KEYS:
-                    response_time = (
-                        pygame.time.get_ticks() - start_time
-                    ) / 1000.
-                    correct, response = check_response(
-                        entered_digits,
-                        operands
-                    )
-                    write_problem_result(
-                        result_file,
-                        operands,
-                        response,
-                        response_time,
-                        correct,
-                        number_style,
-                    )
-                    if correct:
-                        return False, response_time
-                    else:
-                        start_time = pygame.time.get_ticks()
-                        entered_digits.clear()
-                        read = True
-                elif event.key == pygame.K_q:
-                    return True, None
-                else:
-                    pass
+    loop = EventLoop(
+        draw=draw,
+        handle_event=handle_event,
+        name='add_subtract',
+    )
+    loop.schedule(0., read)
+    try:
+        return loop.run()
+    finally:
+        if speech_player is not None:
+            speech_player.stop()
 
-        pygame.display.flip()
-        clock.tick(frames_per_second)
+
+def display_response(
+        screen,
+        entered_digits,
+        number_style,
+        x_response,
+        y_response,
+        width,
+        font,
+        font_size,
+        bead_color,
+        separator_bead_color,
+        status=None,
+):
+    """Draws the response entered so far below an add/subtract problem
+    and returns the rectangle that was drawn over. For spoken problems
+    ``status`` (e.g. how many operands have been read) is shown above
+    the response.
+    """
+    if number_style == NumberStyle.ABACUS:
+        return draw_columns(
+            screen,
+            bead_color,
+            (x_response - len(entered_digits) * height_to_width(font_size),
+             y_response),
+            font_size,
+            entered_digits,
+            separator_bead_color=separator_bead_color,
+        )
+    elif number_style == NumberStyle.ARABIC:
+        surface = text_cache.render(
+            font,
+            format_operand(numerify(entered_digits)),
+            bead_color
+        )
+        return screen.blit(
+            surface,
+            (x_response + width - surface.get_width(), y_response)
+        )
+    elif number_style == NumberStyle.VERBAL:
+        # the response is the only thing on the screen
+        screen.fill(BLACK)
+        text = format_number(numerify(entered_digits))
+        if status is not None:
+            text = status + '\n' + text
+        display_centered_text(
+            screen,
+            text,
+            bead_color,
+            font,
+        )
+        return screen.get_rect()
+    else:
+        return pygame.Rect(0, 0, 0, 0)
+
+
+@contextmanager
+def result_storage(filename, kind):
+    """Yields a (stream, database) pair for recording results of the
+    given kind, either a ResultWriter of the daily result file or, when
+    ABACUS_RESULT_DATABASE is set, the SQLite result database
+    """
+    if RESULT_DATABASE:
+        with ResultDatabase(RESULT_DATABASE, kind=kind) as database:
+            yield None, database
+    else:
+        with ResultWriter(filename, **RESULT_WRITER_OPTIONS) as stream:
+            yield stream, None
+
+
+@contextmanager
+def keystroke_storage(filename):
+    """Yields a ResultWriter of the keystroke log kept beside the daily
+    result file ``filename``
+    """
+    with ResultWriter(
+            keystroke_filename(filename),
+            binary=True,
+            **RESULT_WRITER_OPTIONS
+    ) as log:
+        yield log
+
+
+# Loads the result history in the background; see start_history_warmup
+_history_warmup = None
+
+
+def load_history():
+    """Fits a SkillModel to the add/subtract results: those of the
+    SQLite result database when ABACUS_RESULT_DATABASE is set, or else
+    those of the ResultStore, once the new rows of every daily result
+    file have been converted into it
+    """
+    if RESULT_DATABASE:
+        with ResultDatabase(RESULT_DATABASE, kind='abacus_as') as database:
+            return SkillModel.load(database=database)
+    store = ResultStore()
+    store.update_all()
+    return SkillModel.load(store)
+
+
+def start_history_warmup():
+    global _history_warmup
+    if _history_warmup is None:
+        _history_warmup = BackgroundCall(load_history)
+
+
+def history_skill_model():
+    """The SkillModel fitted by the history warm up, waiting for it if
+    it is still running. The same model is kept for the whole run, as
+    every session adds its results to it.
+    """
+    start_history_warmup()
+    return _history_warmup.result()
 
 
 def add_subtract(
         number_style=NumberStyle.ARABIC,
         language=None,
 ):
-    problems = generate_problems()
     response_time = None
-
-    with open(storage_filename(), 'a') as result_file:
-        while True:
-            end, response_time = give_problem(
-                next(problems),
-                result_file,
-                prior_response_time=response_time,
-                number_style=number_style,
-                language=language,
-            )
-            if end:
-                break
+    filename = storage_filename()
+
+    with result_storage(
+            filename,
+            'abacus_as'
+    ) as (result_file, database), keystroke_storage(filename) as keystrokes:
+        # the history must be up to date before the scheduler reads it
+        skill_model = history_skill_model()
+        # seeded from the result history the first time
+        scheduler = ReviewScheduler.load(history=database)
+        speech_player = None
+        if number_style == NumberStyle.VERBAL:
+            # operands and number fragments are synthesized once, into
+            # the speech cache
+            speech_player = SpeechPlayer(default_speech_cache())
+            # number fragments load while the first problem is shown
+            speech_player.preload(language)
+
+        # problems are generated in the background so that choosing one
+        # never stalls the session; 'q' closes the prefetcher
+        try:
+            with Prefetcher(
+                    generate_problems(
+                        scheduler=scheduler,
+                        skill_model=skill_model,
+                    ),
+                    depth=PREFETCH_DEPTH,
+                    fallback=generate_new_problem,
+            ) as problems:
+                while True:
+                    end, response_time = give_problem(
+                        next(problems),
+                        result_file,
+                        prior_response_time=response_time,
+                        number_style=number_style,
+                        language=language,
+                        scheduler=scheduler,
+                        skill_model=skill_model,
+                        database=database,
+                        speech_player=speech_player,
+                        keystroke_log=keystrokes,
+                    )
+                    if end:
+                        break
+        finally:
+            scheduler.restore_unanswered()
+            scheduler.save()
 
 
 def abacus_reading_problem(
@@ -247,7 +467,6 @@ def abacus_reading_problem(
 ):
     n_digits = len(display_digits)
     column_width = height_to_width(font.get_height())
-    clock = pygame.time.Clock()
 
     x_display = .5 * (
         SCREEN_WIDTH - n_digits * column_width
@@ -255,61 +474,66 @@ def abacus_reading_problem(
     y_display = .5 * (SCREEN_HEIGHT - font.get_height())
 
     # display number for specified period of time
-    screen.fill(BLACK)
-    draw_columns(
-        screen,
-        GREY,
-        # GREEN,
-        (x_display, y_display),
-        font.get_height(),
-        display_digits,
-        separator_bead_color=ORANGE,
-    )
-    pygame.display.flip()
-    pygame.time.wait(int(1000 * flash_seconds))
+    def draw_number():
+        screen.fill(BLACK)
+        draw_columns(
+            screen,
+            GREY,
+            # GREEN,
+            (x_display, y_display),
+            font.get_height(),
+            display_digits,
+            separator_bead_color=ORANGE,
+        )
+        pygame.display.flip()
+
+    show_for(flash_seconds, draw_number)
 
     # get response
     entered_digits = []
-    clock = pygame.time.Clock()
-    break_out = False
-    while True:
-        screen.fill(BLACK)
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                collect_digits(entered_digits, event.key)
-                if event.key in ENTER_KEYS:
-                    break_out = True
-                    is_correct = (
-                        entered_digits == display_digits
-                    )
-        if break_out:
-            break
 
-        x_display = .5 * (
-            SCREEN_WIDTH - len(entered_digits) * column_width
-        )
+    def draw_response():
+        screen.fill(BLACK)
         draw_columns(
             screen,
             GREY,
             # GREEN,
-            (x_display, y_display),
+            (
+                .5 * (SCREEN_WIDTH - len(entered_digits) * column_width),
+                y_display
+            ),
             font.get_height(),
             entered_digits,
             separator_bead_color=ORANGE,
         )
         pygame.display.flip()
-        clock.tick(fps)
 
-    # Display whether correct or not
-    screen.fill(BLACK)
-    display_centered_text(
-        screen,
-        'Correct' if is_correct else 'Incorrect',
-        GREY,
-        font,
+    def handle_event(event):
+        if event.type == pygame.KEYDOWN:
+            collect_digits(entered_digits, event.key)
+            loop.redraw()
+            if event.key in ENTER_KEYS:
+                loop.stop(entered_digits == display_digits)
+
+    loop = EventLoop(
+        draw=draw_response,
+        handle_event=handle_event,
+        name='abacus_reading',
     )
-    pygame.display.flip()
-    pygame.time.wait(750)
+    is_correct = loop.run()
+
+    # Display whether correct or not
+    def draw_result():
+        screen.fill(BLACK)
+        display_centered_text(
+            screen,
+            'Correct' if is_correct else 'Incorrect',
+            GREY,
+            font,
+        )
+        pygame.display.flip()
+
+    show_for(.75, draw_result)
 
     return is_correct, numerify(entered_digits)
 
@@ -328,16 +552,15 @@ def multiplication_and_division_loop(
         operation,
     )
     response_time = None
-    clock = pygame.time.Clock()
 
     font_size = 100
     font = font or pygame.font.SysFont('Lucida Console', font_size)
 
-    with open(filename, 'a') as stream:
+    with result_storage(filename, operation) as (stream, database), \
+            keystroke_storage(filename) as keystrokes:
         while True:
             # See if user wants to do another
-            another = False
-            while True:
+            def draw():
                 screen.fill(background_color)
                 if response_time:
                     display_centered_text(
@@ -346,19 +569,10 @@ def multiplication_and_division_loop(
                         foreground_color,
                         font
                     )
-
                 pygame.display.flip()
-                clock.tick(fps)
 
-                for event in pygame.event.get():
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_q:
-                            return
-                        else:
-                            another = True
-
-                if another:
-                    break
+            if wait_for_keypress(draw) == pygame.K_q:
+                return
 
             o1, o2 = np.random.randint(low=1, high=10**n_digits, size=2)
             o3 = o1 * o2
@@ -375,6 +589,8 @@ def multiplication_and_division_loop(
                     fps=fps,
                     font=font,
                     operation=operation,
+                    database=database,
+                    keystroke_log=keystrokes,
                 )
 
                 if end:
@@ -390,21 +606,33 @@ def write_multiplication_or_division_result(
         response_time,
         is_correct,
         operation='mult',
+        database=None,
+        attempt_key=None,
 ):
     if operation == 'mult':
-        operands = '{};{}'.format(o1, o2)
+        operands = [o1, o2]
     else:
-        operands = '{};{}'.format(o3, o2)
+        operands = [o3, o2]
 
-    stream.write(
-        '{},{:.2f},{},{},{}\n'.format(
+    if stream is not None:
+        stream.write(
+            '{},{:.3f},{},{},{}{}\n'.format(
+                ';'.join(map(str, operands)),
+                response_time,
+                response,
+                is_correct,
+                datetime.datetime.now().strftime('%Y-%m-%d-%H:%M:%S'),
+                '' if attempt_key is None else ',{}'.format(attempt_key),
+            )
+        )
+    if database is not None:
+        database.record(
+            operation,
             operands,
-            response_time,
             response,
+            response_time,
             is_correct,
-            datetime.datetime.now().strftime('%Y-%m-%d-%H:%M:%S'),
         )
-    )
 
 
 def give_multiplication_or_division_problem(
@@ -419,6 +647,8 @@ def give_multiplication_or_division_problem(
         font=None,
         font_size=100,
         operation='mult',
+        database=None,
+        keystroke_log=None,
 ):
     if font is None:
         font = pygame.font.SysFont(
@@ -427,17 +657,14 @@ def give_multiplication_or_division_problem(
         )
 
     n_digits = max(len(digitize(o1)), len(digitize(o2)))
-    clock = pygame.time.Clock()
-
-    start_time = pygame.time.get_ticks()
 
+    # timed from the first frame of the problem
+    attempt = None
     entered_digits = []
-    response = None
-    response_time = None
-    response_entered = False
-    response_correct = False
 
-    while True:
+    def draw():
+        nonlocal attempt
+
         screen.fill(background_color)
         if operation == 'mult':
             columns = 2 * n_digits + max(2 * n_digits - 1, 0) // 3
@@ -465,36 +692,47 @@ def give_multiplication_or_division_problem(
             )
         pygame.display.flip()
 
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                collect_digits(entered_digits, event.key)
-                if event.key in ENTER_KEYS:
-                    response_time = (pygame.time.get_ticks() - start_time) / 1000.
-                    response_entered = True
-                    response = numerify(entered_digits)
-
-                    if operation == 'mult':
-                        response_correct = (response == o3)
-                    else:
-                        response_correct = (response == o1)
-
-        if response_entered:
-            write_multiplication_or_division_result(
-                result_stream,
-                o1,
-                o2,
-                o3,
-                response,
-                response_time,
-                response_correct,
-                operation=operation,
-            )
-            if response_correct:
-                return response_correct, response_time
-            else:
-                return response_correct, None
+        if attempt is None:
+            attempt = Attempt()
+
+    def handle_event(event):
+        if event.type != pygame.KEYDOWN:
+            return
+        attempt.record(event.key, loop.event_time_ns)
+        collect_digits(entered_digits, event.key)
+        loop.redraw()
+        if event.key not in ENTER_KEYS:
+            return
+
+        response_time = attempt.seconds(loop.event_time_ns)
+        response = numerify(entered_digits)
+
+        if operation == 'mult':
+            response_correct = (response == o3)
+        else:
+            response_correct = (response == o1)
 
-        clock.tick(fps)
+        write_multiplication_or_division_result(
+            result_stream,
+            o1,
+            o2,
+            o3,
+            response,
+            response_time,
+            response_correct,
+            operation=operation,
+            database=database,
+            attempt_key=attempt.key,
+        )
+        if keystroke_log is not None:
+            keystroke_log.write(attempt.to_bytes())
+        if response_correct:
+            loop.stop((response_correct, response_time))
+        else:
+            loop.stop((response_correct, None))
+
+    loop = EventLoop(draw=draw, handle_event=handle_event, name=operation)
+    return loop.run()
 
 
 def abacus_reading(
@@ -505,7 +743,10 @@ def abacus_reading(
     result_filename = datetime.date.today().strftime(
         '%Y_%m_%d_abacus_reading.dat'
     )
-    with open(result_filename, 'a') as result_file:
+    with ResultWriter(
+            result_filename,
+            **RESULT_WRITER_OPTIONS
+    ) as result_file:
         csv_file = csv.writer(result_file, delimiter=',')
 
         while True:
@@ -538,17 +779,8 @@ def abacus_reading(
                 flash_seconds *= 1.1
 
             # See if user wants to do another
-            screen.fill(BLACK)
-            while True:
-                break_out = False
-                for event in pygame.event.get():
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_q:
-                            return
-                        else:
-                            break_out = True
-                if break_out:
-                    break
+            if wait_for_keypress() == pygame.K_q:
+                return
 
 if __name__ == '__main__':
     screen = pygame.display.set_mode(SCREEN_SIZE)
@@ -696,6 +928,8 @@ if __name__ == '__main__':
         ],
     )
 
+    # convert new results while the menu is on screen
+    start_history_warmup()
     main_menu.present_loop(
         screen,
         BLACK,
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The modules of abacus_training import each other as top level modules
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'abacus_training')
+)
+
+
+@pytest.fixture
+def write_lines(tmp_path):
+    """Writes lines to a file of tmp_path, returning its name"""
+    def write(name, lines):
+        filename = tmp_path / name
+        filename.write_text(''.join(lines))
+        return str(filename)
+
+    return write
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+import analytics
+
+
+def as_line(operands, response_time, correct, method='ARABIC'):
+    return '{},{:.3f},0,{},2024-01-05-10:00:00,{}\n'.format(
+        ';'.join(map(str, operands)), response_time, correct, method
+    )
+
+
+def test_aggregate_file_of_add_subtract(write_lines):
+    filename = write_lines('2024_01_05_abacus_as.dat', [
+        as_line([1, 2], 1., True),
+        as_line([1, 2], 2., False),
+        as_line([1, 2, 3], 3., True),
+        as_line([1, 2], 4., True, method='VERBAL'),
+    ])
+    aggregate = analytics.aggregate_file('abacus_as', filename)
+
+    assert aggregate['results'] == 4
+    assert aggregate['correct'] == 3
+    groups = {
+        (method, n_operands): sum(counts)
+        for method, n_operands, _, counts in aggregate['response_times']
+    }
+    assert groups == {('ARABIC', 2): 2, ('ARABIC', 3): 1, ('VERBAL', 2): 1}
+
+
+def test_aggregate_file_of_abacus_reading(write_lines):
+    filename = write_lines('2024_01_05_abacus_reading.dat', [
+        '2024-01-05-12:00:00,17611,17611,1.000,True\n',
+        '2024-01-05-12:00:03,8271,8721,0.500,False\n',
+        '2024-01-05-12:00:06,5,5,0.750,True\n',
+    ])
+    aggregate = analytics.aggregate_file('abacus_reading', filename)
+
+    assert aggregate['results'] == 3
+    assert aggregate['correct'] == 2
+    assert aggregate['flash_seconds'] == pytest.approx(2.25)
+    assert aggregate['fastest_correct_flash_seconds'] == pytest.approx(.75)
+    assert aggregate['response_times'] == []
+
+
+def test_histogram_percentiles():
+    response_times = np.random.RandomState(0).lognormal(1., .5, 100000)
+    counts = np.bincount(
+        analytics.response_time_bins(response_times),
+        minlength=analytics.RESPONSE_TIME_BINS.shape[0] - 1,
+    )
+
+    np.testing.assert_allclose(
+        analytics.histogram_percentiles(counts),
+        np.percentile(response_times, analytics.PERCENTILES),
+        rtol=.03,
+    )
+
+
+def test_merge():
+    aggregate = {
+        'results': 3,
+        'correct': 2,
+        'response_times': [['ARABIC', 2, [1, 5], [1, 2]]],
+        'flash_seconds': 0.,
+        'fastest_correct_flash_seconds': None,
+    }
+    merged = analytics.merge([aggregate, aggregate])
+
+    assert merged['results'] == 6
+    assert merged['correct'] == 4
+    counts = merged['response_times'][('ARABIC', 2)]
+    assert counts[1] == 2 and counts[5] == 4 and counts.sum() == 6
+
+
+def test_aggregate_all_reads_only_changed_files(
+        tmp_path, monkeypatch, write_lines
+):
+    cache_filename = str(tmp_path / 'cache.json')
+    write_lines('2024_01_05_abacus_as.dat', [as_line([1, 2], 1., True)])
+    changed = write_lines(
+        '2024_01_06_mult.dat',
+        ['3;4,1.000,12,True,2024-01-06-10:00:00\n'],
+    )
+
+    def aggregate_all():
+        return analytics.aggregate_all(
+            str(tmp_path), cache_filename, max_workers=1
+        )
+
+    files = aggregate_all()
+    assert sorted(files) == ['2024_01_05_abacus_as.dat', '2024_01_06_mult.dat']
+
+    read = []
+
+    def aggregate_file(kind, filename):
+        read.append(filename)
+        return analytics.empty_aggregate()
+
+    monkeypatch.setattr(analytics, 'aggregate_file', aggregate_file)
+    cached = aggregate_all()
+    assert read == []
+    assert cached == files
+
+    with open(changed, 'a') as f:
+        f.write('3;5,1.000,15,False,2024-01-06-10:00:01\n')
+    aggregate_all()
+    assert read == [changed]
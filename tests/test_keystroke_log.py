@@ -0,0 +1,132 @@
+import csv
+import io
+
+import numpy as np
+import pygame
+
+import keystroke_log
+from keystroke_log import (
+    BACKSPACE,
+    ENTER,
+    Attempt,
+    attempt_key,
+    digit_latencies,
+    join_keystrokes,
+    key_code,
+    keystroke_filename,
+    read_keystroke_log,
+)
+
+
+def test_keystroke_filename():
+    assert keystroke_filename('2024_01_05_abacus_as.dat') == (
+        '2024_01_05_abacus_as.keys'
+    )
+
+
+def test_key_code():
+    assert key_code(pygame.K_7) == 7
+    assert key_code(pygame.K_KP0) == 0
+    assert key_code(pygame.K_BACKSPACE) == BACKSPACE
+    assert key_code(pygame.K_RETURN) == ENTER
+    assert key_code(pygame.K_KP_ENTER) == ENTER
+    assert key_code(pygame.K_a) is None
+
+
+def test_attempt_times_keystrokes_from_when_it_was_shown():
+    attempt = Attempt(shown_ns=10 ** 9)
+    attempt.record(pygame.K_1, 10 ** 9 + 250000)
+    attempt.record(pygame.K_a, 10 ** 9 + 300000)
+    attempt.record(pygame.K_BACKSPACE, 10 ** 9 + 400999)
+    # before it was shown, and past what the log can hold
+    attempt.record(pygame.K_2, 10 ** 9 - 5000)
+    attempt.record(pygame.K_RETURN, 10 ** 9 + 10 ** 13)
+
+    assert attempt.seconds(3 * 10 ** 9) == 2.
+    assert attempt.keystrokes == [
+        (250, 1),
+        (400, BACKSPACE),
+        (0, 2),
+        (keystroke_log.MAX_MICROSECONDS, ENTER),
+    ]
+
+
+def test_log_round_trip(tmp_path):
+    attempts = [Attempt(shown_ns=0), Attempt(shown_ns=0)]
+    for microseconds, key in [(1500, pygame.K_4), (2500, pygame.K_RETURN)]:
+        attempts[0].record(key, 1000 * microseconds)
+    filename = tmp_path / '2024_01_05_mult.keys'
+    data = b''.join(attempt.to_bytes() for attempt in attempts)
+    # the start of an attempt still being written
+    filename.write_bytes(data + Attempt(shown_ns=0).to_bytes()[:5])
+
+    logged = read_keystroke_log(str(filename))
+
+    assert [shown_ns for shown_ns, _ in logged] == [
+        attempt.wall_shown_ns for attempt in attempts
+    ]
+    assert logged[0][1].tolist() == [(1500, 4), (2500, ENTER)]
+    assert logged[1][1].shape == (0,)
+
+    filename.write_bytes(data[:-1])
+    assert len(read_keystroke_log(str(filename))) == 1
+
+
+def test_rows_are_joined_to_keystrokes_by_key(tmp_path):
+    attempts = [Attempt(shown_ns=n * 10 ** 9) for n in range(3)]
+    for attempt in attempts:
+        attempt.record(pygame.K_RETURN, attempt.shown_ns + 1000)
+    rows = [
+        ['1;2', '1.000', '3', 'True', '2024-01-05-10:00:00', 'SPOKEN', key]
+        for key in [attempts[0].key, '', attempts[2].key]
+    ]
+    rows[1] = rows[1][:6]
+    # the second attempt's keystrokes were lost, and a later one's row
+    filename = tmp_path / '2024_01_05_abacus_as.keys'
+    filename.write_bytes(b''.join(
+        attempt.to_bytes()
+        for attempt in [attempts[0], attempts[2], Attempt()]
+    ))
+
+    assert attempt_key('abacus_as', rows[0]) == attempts[0].key
+    assert attempt_key('abacus_as', rows[1]) is None
+    joined = join_keystrokes('abacus_as', rows, str(filename))
+    assert joined[0].tolist() == [(1, ENTER)]
+    assert joined[1] is None
+    assert joined[2].tolist() == [(1, ENTER)]
+
+
+def test_result_rows_end_with_the_attempt_key():
+    from add_subtract import write_problem_result
+    from result_store import parse_row
+    from training import (
+        NumberStyle,
+        write_multiplication_or_division_result,
+    )
+
+    stream = io.StringIO()
+    style = NumberStyle.VERBAL
+    write_problem_result(stream, [1, 2], 3, 1., True, style, attempt_key=7)
+    write_multiplication_or_division_result(
+        stream, 2, 3, 6, 6, 1., True, attempt_key=8
+    )
+    write_problem_result(stream, [1, 2], 3, 1., True, style)
+    as_row, mult_row, unkeyed_row = csv.reader(io.StringIO(
+        stream.getvalue()
+    ))
+
+    assert attempt_key('abacus_as', as_row) == 7
+    assert attempt_key('mult', mult_row) == 8
+    assert attempt_key('abacus_as', unkeyed_row) is None
+    assert parse_row('abacus_as', as_row)['presentation_method'] == 'VERBAL'
+    assert parse_row('mult', mult_row)['operands'] == [2, 3]
+
+
+def test_digit_latencies():
+    keystrokes = np.array(
+        [(100000, 1), (300000, BACKSPACE), (600000, 2), (650000, ENTER)],
+        dtype=keystroke_log.KEYSTROKE_DTYPE,
+    )
+
+    np.testing.assert_allclose(digit_latencies(keystrokes), [.1, .5])
+    assert digit_latencies(keystrokes[3:]).shape == (0,)
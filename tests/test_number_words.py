@@ -0,0 +1,97 @@
+import pytest
+
+from number_words import (
+    LANGUAGES,
+    all_fragments,
+    can_split,
+    number_fragments,
+)
+
+
+FRAGMENTS = {
+    'en': [
+        (0, ['zero']),
+        (15, ['fifteen']),
+        (71, ['seventy-one']),
+        (110, ['one hundred', 'ten']),
+        (1001, ['one', 'thousand', 'one']),
+        (10050, ['ten', 'thousand', 'fifty']),
+        (21000, ['twenty-one', 'thousand']),
+        (1000000, ['one', 'million']),
+        (-110, ['minus', 'one hundred', 'ten']),
+    ],
+    'fr': [
+        (0, ['zéro']),
+        (15, ['quinze']),
+        (71, ['soixante et onze']),
+        (80, ['quatre-vingts']),
+        (99, ['quatre-vingt-dix-neuf']),
+        (110, ['cent', 'dix']),
+        (1001, ['mille', 'un']),
+        (10050, ['dix', 'mille', 'cinquante']),
+        (21000, ['vingt et un', 'mille']),
+        (2000000, ['deux', 'millions']),
+        (-7, ['moins', 'sept']),
+    ],
+    'de': [
+        (0, ['null']),
+        (15, ['fünfzehn']),
+        (21, ['einundzwanzig']),
+        (110, ['einhundert', 'zehn']),
+        (1001, ['ein', 'tausend', 'eins']),
+        (10050, ['zehn', 'tausend', 'fünfzig']),
+        (21000, ['einundzwanzig', 'tausend']),
+        (1000000, ['eine Million']),
+        (3000000, ['drei', 'Millionen']),
+        (-7, ['minus', 'sieben']),
+    ],
+    'zh-CN': [
+        (0, ['零']),
+        (15, ['十', '五']),
+        (110, ['一百', '一十']),
+        (1001, ['一千', '零', '一']),
+        (10050, ['一', '万', '零', '五十']),
+        (21000, ['二', '万', '一千']),
+        (1000000, ['一百', '万']),
+        (-7, ['负', '七']),
+    ],
+    'ja': [
+        (0, ['ゼロ']),
+        (15, ['十', '五']),
+        (110, ['百', '十']),
+        (1001, ['千', '一']),
+        (10050, ['一', '万', '五十']),
+        (21000, ['二', '万', '千']),
+        (1000000, ['百', '万']),
+        (-7, ['マイナス', '七']),
+    ],
+}
+
+
+@pytest.mark.parametrize('language, number, fragments', [
+    (language, number, fragments)
+    for language, table in sorted(FRAGMENTS.items())
+    for number, fragments in table
+])
+def test_number_fragments(language, number, fragments):
+    assert number_fragments(number, language) == fragments
+
+
+@pytest.mark.parametrize('language', LANGUAGES)
+def test_fragments_are_all_listed(language):
+    listed = set(all_fragments(language))
+    numbers = (
+        list(range(-1200, 1200))
+        + [10 ** digits - 1 for digits in range(1, 13)]
+        + [7 * 10 ** digits + 1 for digits in range(12)]
+    )
+    for number in numbers:
+        assert set(number_fragments(number, language)) <= listed, number
+
+
+def test_can_split():
+    assert can_split(-999999999999, 'en')
+    assert not can_split(10 ** 12, 'en')
+    assert not can_split(5, 'eo')
+    with pytest.raises(ValueError):
+        number_fragments(10 ** 12, 'en')
@@ -0,0 +1,217 @@
+import numpy as np
+import pytest
+
+import operation as op
+
+
+N_PROBLEMS = 20000
+
+
+def digit_pair_probs(op_freq=None):
+    if op_freq is None:
+        op_freq = np.ones(op.OPERATION_COUNT) / op.OPERATION_COUNT
+    return (
+        op.digit_pair_prob(op_freq, op.add_op_index_to_digit_pairs),
+        op.digit_pair_prob(op_freq, op.sub_op_index_to_digit_pairs),
+    )
+
+
+def digit_frequencies(operands, num_digits):
+    """Frequency of each digit at each place of each operand, and of
+    each operand being negative
+    """
+    operands = np.asarray(operands, dtype=np.int64)
+    powers = 10 ** np.arange(num_digits)
+    digits = (np.abs(operands)[:, :, None] // powers) % 10
+    frequencies = np.stack(
+        [(digits == digit).mean(axis=0) for digit in range(10)],
+        axis=-1
+    )
+    return frequencies, (operands < 0).mean(axis=0)
+
+
+@pytest.mark.parametrize('add_prob', [1., .5])
+def test_generate_mixed_problems_matches_scalar_digit_frequencies(add_prob):
+    num_digits, num_operands = 3, 4
+    add_prob_table, sub_prob_table = digit_pair_probs()
+
+    np.random.seed(0)
+    batch = op.generate_mixed_problems(
+        N_PROBLEMS,
+        add_prob_table,
+        add_prob,
+        sub_prob_table,
+        num_digits,
+        num_operands,
+    )
+    # generate_mixed_problem with the samplers built once
+    add_sampler = op.DigitPairSampler(add_prob_table)
+    sub_sampler = op.DigitPairSampler(sub_prob_table)
+    scalar = [
+        op.generate_sampled_problem(
+            add_sampler, add_prob, sub_sampler, num_digits, num_operands
+        )
+        for _ in range(N_PROBLEMS)
+    ]
+
+    assert batch.shape == (N_PROBLEMS, num_operands)
+    assert (batch.sum(axis=1) >= 0).all()
+    batch_digits, batch_negative = digit_frequencies(batch, num_digits)
+    scalar_digits, scalar_negative = digit_frequencies(scalar, num_digits)
+    np.testing.assert_allclose(batch_digits, scalar_digits, atol=.02)
+    np.testing.assert_allclose(batch_negative, scalar_negative, atol=.02)
+
+
+def test_generate_sampled_problems_matches_scalar_operation_histograms():
+    num_digits, num_operands = 4, 3
+    op_freq = np.random.RandomState(1).random_sample(op.OPERATION_COUNT)
+    op_freq /= op_freq.sum()
+    add_sampler = op.compile_digit_pair_sampler(
+        op_freq, op.add_op_index_to_digit_pairs
+    )
+    sub_sampler = op.compile_digit_pair_sampler(
+        op_freq, op.sub_op_index_to_digit_pairs
+    )
+
+    np.random.seed(0)
+    batch = op.generate_sampled_problems(
+        N_PROBLEMS, add_sampler, .5, sub_sampler, num_digits, num_operands
+    )
+    scalar = np.array([
+        op.generate_sampled_problem(
+            add_sampler, .5, sub_sampler, num_digits, num_operands
+        )
+        for _ in range(N_PROBLEMS)
+    ])
+
+    batch_ops = op.operation_histograms(batch).sum(axis=0)
+    scalar_ops = op.operation_histograms(scalar).sum(axis=0)
+    np.testing.assert_allclose(
+        batch_ops / batch_ops.sum(),
+        scalar_ops / scalar_ops.sum(),
+        atol=.01,
+    )
+
+
+def test_alias_table_frequencies():
+    prob = np.array([
+        [.5, .25, .125, .125, 0.],
+        [0., 0., 0., 0., 3.],
+        [0., 0., 0., 0., 0.],
+    ])
+    table = op.AliasTable(prob)
+    u = np.random.RandomState(3).random_sample(100000)
+
+    for row_n, row in enumerate(prob):
+        expected = row / row.sum() if row.sum() else np.full(5, .2)
+        draws = table.sample(u, row=row_n)
+        np.testing.assert_allclose(
+            np.bincount(draws, minlength=5) / u.shape[0],
+            expected,
+            atol=.005,
+        )
+        assert [table.sample_one(x, row=row_n) for x in u[:1000]] == (
+            draws[:1000].tolist()
+        )
+
+
+def test_digit_pair_sampler_frequencies():
+    add_prob_table, _ = digit_pair_probs()
+    sampler = op.DigitPairSampler(add_prob_table)
+    random = np.random.RandomState(4)
+    n_draws = 200000
+
+    first = sampler.sample_first(random.random_sample(n_draws))
+    second = sampler.sample_second(first, random.random_sample(n_draws))
+
+    frequencies = np.bincount(
+        10 * first + second, minlength=100
+    ).reshape(10, 10) / n_draws
+    np.testing.assert_allclose(frequencies, add_prob_table, atol=.003)
+
+
+def test_compile_digit_pair_sampler_is_memoized():
+    op_freq = np.ones(op.OPERATION_COUNT) / op.OPERATION_COUNT
+    sampler = op.compile_digit_pair_sampler(
+        op_freq, op.add_op_index_to_digit_pairs
+    )
+
+    assert op.compile_digit_pair_sampler(
+        op_freq.copy(), op.add_op_index_to_digit_pairs
+    ) is sampler
+    assert op.compile_digit_pair_sampler(
+        op_freq, op.sub_op_index_to_digit_pairs
+    ) is not sampler
+
+
+def test_digit_pair_sampler_is_memoized():
+    add_prob_table = op.digit_pair_prob(
+        np.ones(op.OPERATION_COUNT) / op.OPERATION_COUNT,
+        op.add_op_index_to_digit_pairs,
+    )
+    sampler = op.digit_pair_sampler(add_prob_table)
+
+    assert op.digit_pair_sampler(add_prob_table.copy()) is sampler
+    assert op.digit_pair_sampler(add_prob_table.T.copy()) is not sampler
+
+
+def scalar_histograms(problems):
+    histograms = np.zeros((len(problems), op.OPERATION_COUNT), dtype=np.int64)
+    for problem_n, operands in enumerate(problems):
+        np.add.at(histograms[problem_n], op.problem_operations(operands), 1)
+    return histograms
+
+
+@pytest.mark.parametrize('operands', [
+    [0, 0],
+    [9, 1],
+    [999, 1],
+    [1, -1],
+    [1000, -1],
+    [5, 5, -5, -5],
+    [999999, 999999, 999999],
+    [123456, -23456, 7, -100000],
+])
+def test_operation_histograms_of_edge_cases(operands):
+    np.testing.assert_array_equal(
+        op.problem_operation_counts(operands),
+        scalar_histograms([operands])[0],
+    )
+
+
+def test_operation_histograms_match_problem_operations():
+    random = np.random.RandomState(5)
+    n_operands = random.randint(2, 6, size=2000)
+    problems = [
+        [int(random.randint(0, 10 ** 6))] + [
+            int(random.randint(-10 ** 6 + 1, 10 ** 6))
+            for _ in range(n - 1)
+        ]
+        for n in n_operands
+    ]
+    problems = [
+        operands for operands in problems if sum(operands) >= 0
+    ]
+    padded = np.zeros((len(problems), n_operands.max()), dtype=np.int64)
+    for problem_n, operands in enumerate(problems):
+        padded[problem_n, :len(operands)] = operands
+
+    np.testing.assert_array_equal(
+        op.operation_histograms(padded),
+        scalar_histograms(problems),
+    )
+
+
+def test_operation_histograms_in_chunks(monkeypatch):
+    np.random.seed(0)
+    add_prob_table, sub_prob_table = digit_pair_probs()
+    problems = op.generate_mixed_problems(
+        1000, add_prob_table, .5, sub_prob_table, 5, 4
+    )
+    expected = op.operation_histograms(problems)
+
+    monkeypatch.setattr(op, 'HISTOGRAM_CHUNK_SIZE', 64)
+    np.testing.assert_array_equal(op.operation_histograms(problems), expected)
+    np.testing.assert_array_equal(
+        expected, scalar_histograms(problems.tolist())
+    )
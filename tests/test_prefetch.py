@@ -0,0 +1,99 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from prefetch import (
+    BackgroundCall,
+    Prefetcher,
+)
+
+
+def slow(iterator, seconds):
+    for item in iterator:
+        time.sleep(seconds)
+        yield item
+
+
+def test_items_in_order():
+    with Prefetcher(iter(range(10)), depth=2) as prefetcher:
+        assert list(prefetcher) == list(range(10))
+        # the end is kept for later calls
+        with pytest.raises(StopIteration):
+            next(prefetcher)
+
+
+def test_first_item_is_waited_for():
+    with Prefetcher(
+            slow(itertools.count(), .05),
+            fallback=lambda: 'fallback',
+    ) as prefetcher:
+        assert next(prefetcher) == 0
+
+
+def test_fallback_when_no_item_is_ready():
+    release = threading.Event()
+
+    def items():
+        yield 0
+        release.wait()
+        yield 1
+
+    with Prefetcher(
+            items(),
+            fallback=lambda: 'fallback',
+            first_timeout=.01,
+    ) as prefetcher:
+        assert next(prefetcher) == 0
+        assert next(prefetcher) == 'fallback'
+        release.set()
+        time.sleep(.1)
+        assert next(prefetcher) == 1
+
+
+def test_first_timeout_falls_back():
+    with Prefetcher(
+            slow(itertools.count(), .3),
+            fallback=lambda: 'fallback',
+            first_timeout=.01,
+    ) as prefetcher:
+        assert next(prefetcher) == 'fallback'
+
+
+def test_iterator_errors_are_raised():
+    def items():
+        yield 0
+        raise KeyError('broken')
+
+    with Prefetcher(items()) as prefetcher:
+        assert next(prefetcher) == 0
+        with pytest.raises(KeyError):
+            next(prefetcher)
+
+
+def test_close_stops_the_worker():
+    produced = []
+
+    def items():
+        for item in itertools.count():
+            produced.append(item)
+            yield item
+
+    prefetcher = Prefetcher(items(), depth=2)
+    assert next(prefetcher) == 0
+    prefetcher.close()
+
+    assert not prefetcher._thread.is_alive()
+    n_produced = len(produced)
+    time.sleep(.2)
+    assert len(produced) == n_produced <= 5
+
+
+def test_background_call():
+    assert BackgroundCall(sum, [1, 2, 3]).result() == 6
+
+    call = BackgroundCall(int, 'not a number')
+    with pytest.raises(ValueError):
+        call.result()
+    assert call.done()
@@ -0,0 +1,93 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from result_database import ResultDatabase
+from skill import SkillModel
+
+
+@pytest.fixture
+def filename(tmp_path):
+    return str(tmp_path / 'results.sqlite')
+
+
+def record_results(database):
+    database.record('abacus_as', [12, -3], 9, 1.5, True, 'ARABIC')
+    database.record('abacus_as', [250, 31, -7], 270, 4.25, False, 'VERBAL')
+    database.record('abacus_as', [12, -3], 9, 2., True, 'ARABIC')
+    database.record('mult', [3, 4], 12, 1., True)
+
+
+def test_summaries(filename):
+    with ResultDatabase(filename, batch_size=2) as database:
+        record_results(database)
+        summaries = sorted(database.summaries())
+
+    assert summaries == [
+        ('12;-3', 2, False, 3.5, 2.),
+        ('250;31;-7', 1, True, 4.25, 4.25),
+    ]
+
+
+def test_load_columns(filename):
+    with ResultDatabase(filename) as database:
+        assert database.load() is None
+        record_results(database)
+        columns = database.load()
+
+    np.testing.assert_array_equal(
+        columns['operands'], [[12, -3, 0], [250, 31, -7], [12, -3, 0]]
+    )
+    np.testing.assert_array_equal(columns['n_operands'], [2, 3, 2])
+    np.testing.assert_array_equal(columns['response'], [9, 270, 9])
+    np.testing.assert_allclose(columns['response_time'], [1.5, 4.25, 2.])
+    np.testing.assert_array_equal(columns['correct'], [True, False, True])
+    assert columns['timestamp'].shape == (3,)
+
+
+def test_results_are_kept_on_close(filename):
+    database = ResultDatabase(filename, batch_size=100, flush_seconds=60.)
+    record_results(database)
+    database.close()
+
+    with ResultDatabase(filename) as database:
+        assert len(database.load()['correct']) == 3
+    with ResultDatabase(filename, kind='mult') as database:
+        assert database.load()['operands'].tolist() == [[3, 4]]
+
+
+def test_sessions_are_added_with_their_first_result(filename):
+    with ResultDatabase(filename) as database:
+        database.load()
+    with ResultDatabase(filename) as database:
+        record_results(database)
+    with ResultDatabase(filename) as database:
+        record_results(database)
+
+    connection = sqlite3.connect(filename)
+    sessions = connection.execute(
+        'SELECT DISTINCT session_id FROM attempts'
+    ).fetchall()
+    n_sessions, = connection.execute(
+        'SELECT COUNT(*) FROM sessions'
+    ).fetchone()
+    connection.close()
+    assert len(sessions) == n_sessions == 2
+
+
+def test_skill_model_from_database(filename):
+    with ResultDatabase(filename) as database:
+        record_results(database)
+        model = SkillModel.load(database=database)
+        columns = database.load()
+
+    expected = SkillModel()
+    expected.add_columns(columns)
+    np.testing.assert_allclose(
+        model.operation_seconds(), expected.operation_seconds()
+    )
+    np.testing.assert_allclose(model.error_rates(), expected.error_rates())
+    assert not np.allclose(
+        model.error_rates(), SkillModel().error_rates()
+    )
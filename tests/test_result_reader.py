@@ -0,0 +1,102 @@
+import numpy as np
+
+from result_reader import (
+    read_many_results,
+    read_results,
+    stream_results,
+)
+
+
+AS_LINES = [
+    '12;-3,1.500,9,True,2024-01-05-10:00:00,ARABIC\n',
+    '250;31;-7,4.250,274,True,2024-01-05-10:00:07,VERBAL\n',
+    '12;-3,2.000,8,False,2024-01-05-10:00:12,ARABIC\n',
+]
+
+
+def test_read_results_of_add_subtract(write_lines):
+    filename = write_lines('2024_01_05_abacus_as.dat', AS_LINES)
+    table = read_results(filename)
+
+    assert len(table) == 3
+    np.testing.assert_array_equal(
+        table.operands, [[12, -3, 0], [250, 31, -7], [12, -3, 0]]
+    )
+    np.testing.assert_array_equal(table.n_operands, [2, 3, 2])
+    np.testing.assert_allclose(table.response_time, [1.5, 4.25, 2.])
+    np.testing.assert_array_equal(table.response, [9, 274, 8])
+    np.testing.assert_array_equal(table.correct, [True, True, False])
+    assert table.presentation_method.tolist() == ['ARABIC', 'VERBAL', 'ARABIC']
+    assert table.problem.tolist() == ['12;-3', '250;31;-7', '12;-3']
+    assert table.time_of_day.tolist() == [
+        '2024-01-05-10:00:00', '2024-01-05-10:00:07', '2024-01-05-10:00:12',
+    ]
+    assert (table.date == np.datetime64('2024-01-05')).all()
+
+    incorrect = table[~table.correct]
+    assert len(incorrect) == 1
+    assert incorrect.problem.tolist() == ['12;-3']
+
+
+def test_read_results_of_other_kinds(write_lines):
+    mult = read_results(
+        write_lines('2024_01_05_mult.dat', [
+            '34;4,3.240,136,True,2024-01-05-11:00:00\n',
+        ]),
+        kind='mult',
+    )
+    np.testing.assert_array_equal(mult.operands, [[34, 4]])
+    assert 'presentation_method' not in mult.columns
+
+    reading = read_results(
+        write_lines('2024_01_05_abacus_reading.dat', [
+            '2024-01-05-12:00:00,17611,17611,1.060,True\n',
+            '2024-01-05-12:00:03,8271,8721,0.900,False\n',
+        ]),
+        kind='abacus_reading',
+    )
+    np.testing.assert_array_equal(reading.operands, [[17611], [8271]])
+    np.testing.assert_array_equal(reading.response, [17611, 8721])
+    np.testing.assert_allclose(reading.flash_seconds, [1.06, .9])
+    np.testing.assert_array_equal(reading.correct, [True, False])
+
+
+def test_partial_last_line_is_left_out(write_lines):
+    filename = write_lines(
+        '2024_01_05_abacus_as.dat',
+        AS_LINES + ['12;-3,1.0'],
+    )
+
+    assert len(read_results(filename)) == 3
+    assert sum(len(table) for table in stream_results([filename])) == 3
+
+
+def test_stream_results_matches_read_many_results(write_lines):
+    filenames = [
+        write_lines('2024_01_05_abacus_as.dat', AS_LINES),
+        write_lines('2024_01_06_abacus_as.dat', AS_LINES[1:] * 3),
+    ]
+    whole = read_many_results(filenames)
+    chunks = list(stream_results(filenames, chunk_rows=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1, 2, 2, 2]
+    np.testing.assert_array_equal(
+        np.concatenate([chunk.response for chunk in chunks]),
+        whole.response,
+    )
+    np.testing.assert_array_equal(
+        np.concatenate([chunk.date for chunk in chunks]),
+        whole.date,
+    )
+    assert len(read_many_results([])) == 0
+
+
+def test_group_max(write_lines):
+    table = read_results(
+        write_lines('2024_01_05_abacus_as.dat', AS_LINES)
+    )
+    problems, slowest = table.group_max('response_time')
+
+    assert problems.tolist() == ['12;-3', '250;31;-7']
+    np.testing.assert_allclose(slowest, [2., 4.25])
+    assert slowest.dtype == table.response_time.dtype
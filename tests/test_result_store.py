@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+import pytest
+
+import result_store
+from result_reader import read_many_results
+from result_store import ResultStore
+
+
+def as_lines(n_lines, first=0):
+    return ''.join(
+        '{};{},{:.3f},{},True,2024-01-05-10:00:00,ARABIC\n'.format(
+            line_n, -1, 1. + line_n % 7, line_n - 1
+        )
+        for line_n in range(first, first + n_lines)
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(
+        directory=str(tmp_path / 'store'),
+        data_directory=str(tmp_path),
+    )
+
+
+def data_file(store, name='2024_01_05_abacus_as.dat'):
+    return os.path.join(store.data_directory, name)
+
+
+def append(filename, text):
+    with open(filename, 'a') as f:
+        f.write(text)
+
+
+def stored_responses(store):
+    return ResultStore(store.directory).load('abacus_as')['response'].tolist()
+
+
+def test_incremental_updates(store):
+    filename = data_file(store)
+    append(filename, as_lines(5))
+    assert store.update('abacus_as') == 5
+    assert store.update('abacus_as') == 0
+
+    append(filename, as_lines(3, first=5))
+    assert store.update('abacus_as') == 3
+
+    assert stored_responses(store) == list(range(-1, 7))
+    offsets = store.manifest['abacus_as']['offsets']
+    assert offsets == {os.path.basename(filename): os.path.getsize(filename)}
+
+
+def test_partial_last_line_waits_for_its_end(store):
+    filename = data_file(store)
+    line = as_lines(1, first=1)
+    append(filename, as_lines(1) + line[:10])
+    assert store.update('abacus_as') == 1
+
+    append(filename, line[10:])
+    assert store.update('abacus_as') == 1
+    assert stored_responses(store) == [-1, 0]
+
+
+def test_chunks_are_merged(store):
+    filename = data_file(store)
+    first = 0
+    for n_lines in [8, 4, 2, 1, 1, 20]:
+        append(filename, as_lines(n_lines, first=first))
+        first += n_lines
+        store.update('abacus_as')
+        rows = [
+            chunk['rows'] for chunk in store.manifest['abacus_as']['chunks']
+        ]
+        # every chunk is bigger than the ones after it
+        assert rows == sorted(rows, reverse=True)
+        assert len(set(rows)) == len(rows)
+
+    assert rows == [36]
+    assert stored_responses(store) == list(range(-1, first - 1))
+    assert os.listdir(os.path.join(store.directory, 'abacus_as')) == [
+        store.manifest['abacus_as']['chunks'][0]['name']
+    ]
+    columns = store.load('abacus_as')
+    expected = read_many_results([filename]).columns
+    for column in ['operands', 'response_time', 'correct', 'timestamp']:
+        np.testing.assert_array_equal(columns[column], expected[column])
+
+
+def test_crash_before_manifest_is_written(store, monkeypatch):
+    filename = data_file(store)
+    append(filename, as_lines(4))
+    store.update('abacus_as')
+    append(filename, as_lines(4, first=4))
+
+    def crash():
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(store, '_write_manifest', crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.update('abacus_as')
+    assert len(os.listdir(os.path.join(store.directory, 'abacus_as'))) == 2
+
+    reopened = ResultStore(store.directory, store.data_directory)
+    assert reopened.update('abacus_as') == 4
+    assert stored_responses(store) == list(range(-1, 7))
+    assert len(os.listdir(os.path.join(store.directory, 'abacus_as'))) == 1
+
+
+def test_truncated_column_is_converted_again(store):
+    append(data_file(store), as_lines(4))
+    store.update('abacus_as')
+    chunk = store.manifest['abacus_as']['chunks'][0]['name']
+    np.save(
+        store._column_filename('abacus_as', chunk, 'response'),
+        np.zeros(2, dtype=np.int64),
+    )
+
+    reopened = ResultStore(store.directory, store.data_directory)
+    assert reopened.update('abacus_as') == 4
+    assert stored_responses(store) == list(range(-1, 3))
+
+
+@pytest.mark.parametrize('rewrite', ['shorter', 'same_size'])
+def test_rewritten_file_is_converted_again(store, rewrite, caplog):
+    filename = data_file(store)
+    other = data_file(store, '2024_01_06_abacus_as.dat')
+    append(filename, as_lines(4))
+    append(other, as_lines(2, first=100))
+    store.update('abacus_as')
+
+    if rewrite == 'shorter':
+        text = as_lines(2, first=50)
+    else:
+        text = as_lines(4).replace('True', 'Fals')
+    with open(filename, 'w') as f:
+        f.write(text)
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert store.update('abacus_as') == (4 if rewrite == 'shorter' else 6)
+    assert 'again' in caplog.text
+    expected = read_many_results([filename, other])
+    columns = ResultStore(store.directory).load('abacus_as')
+    np.testing.assert_array_equal(columns['response'], expected.response)
+    np.testing.assert_array_equal(columns['correct'], expected.correct)
+
+
+def test_malformed_rows_are_skipped(store, caplog):
+    filename = data_file(store)
+    append(filename, as_lines(2) + 'not a result\n1;2,x,3\n' + as_lines(1, 2))
+
+    assert store.update('abacus_as') == 3
+    assert stored_responses(store) == [-1, 0, 1]
+    assert 'Skipped 2 malformed rows' in caplog.text
+
+
+def test_legacy_store_is_converted_again(store):
+    append(data_file(store), as_lines(3))
+    os.makedirs(os.path.join(store.directory, 'abacus_as'))
+    store.manifest = {
+        'abacus_as': {'offsets': {'2024_01_05_abacus_as.dat': 1}},
+    }
+
+    assert store.update('abacus_as') == 3
+    assert stored_responses(store) == [-1, 0, 1]
+
+
+def test_parallel_update_matches(store, monkeypatch):
+    for day in range(1, 4):
+        append(
+            data_file(store, '2024_01_0{}_abacus_as.dat'.format(day)),
+            as_lines(5, first=10 * day),
+        )
+    monkeypatch.setattr(result_store, 'PARALLEL_MIN_FILES', 2)
+
+    assert store.update('abacus_as', max_workers=2) == 15
+    assert stored_responses(store) == [
+        response for day in range(1, 4)
+        for response in range(10 * day - 1, 10 * day + 4)
+    ]
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+import result_writer
+from result_writer import (
+    BatchWriter,
+    ResultWriter,
+)
+
+
+def wait_for(condition, timeout=2.):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(.01)
+    return condition()
+
+
+def test_rows_are_written_on_close(tmp_path):
+    filename = tmp_path / 'results.dat'
+    writer = ResultWriter(str(filename), flush_rows=100, flush_seconds=60.)
+    writer.write('1;2,1.000,3,True\n')
+    writer.write('4;5,2.000,9,True\n')
+    assert filename.read_text() == ''
+
+    writer.close()
+    assert filename.read_text() == '1;2,1.000,3,True\n4;5,2.000,9,True\n'
+    with pytest.raises(ValueError):
+        writer.write('6;7,1.000,13,True\n')
+
+
+def test_rows_are_committed_in_groups():
+    groups = []
+    writer = BatchWriter(groups.append, flush_rows=3, flush_seconds=60.)
+    for item in range(7):
+        writer.put(item)
+
+    assert wait_for(lambda: len(groups) == 2)
+    assert groups == [[0, 1, 2], [3, 4, 5]]
+    writer.flush()
+    assert groups == [[0, 1, 2], [3, 4, 5], [6]]
+    writer.close()
+
+
+def test_rows_are_committed_after_flush_seconds():
+    groups = []
+    writer = BatchWriter(groups.append, flush_rows=100, flush_seconds=.1)
+    start = time.monotonic()
+    writer.put('row')
+
+    assert wait_for(lambda: groups == [['row']])
+    assert time.monotonic() - start >= .1
+    writer.close()
+
+
+def test_open_writers_are_closed_at_exit(tmp_path):
+    filename = tmp_path / 'results.dat'
+    writer = ResultWriter(str(filename), flush_rows=100, flush_seconds=60.)
+    writer.write('1;2,1.000,3,True\n')
+
+    result_writer._close_open_writers()
+    assert writer.closed
+    assert filename.read_text() == '1;2,1.000,3,True\n'
+
+
+def test_commit_errors_are_raised_by_the_next_call(caplog):
+    committed = []
+    failed = threading.Event()
+
+    def commit(items):
+        if 'bad' in items:
+            failed.set()
+            raise OSError('disk full')
+        committed.extend(items)
+
+    writer = BatchWriter(commit, flush_rows=1, flush_seconds=60.)
+    writer.put('bad')
+    assert failed.wait(2.)
+    assert wait_for(lambda: writer._error is not None)
+
+    with pytest.raises(OSError):
+        writer.put('good')
+    # the thread carries on after the error
+    writer.put('good')
+    writer.flush()
+    assert committed == ['good']
+    assert 'Could not commit' in caplog.text
+    writer.close()
+
+
+def test_write_raises_error_of_writer_thread(tmp_path):
+    writer = ResultWriter(str(tmp_path / 'results.dat'), flush_rows=1)
+    # a text file cannot be written bytes
+    writer.write(b'1;2,1.000,3,True\n')
+    assert wait_for(lambda: writer._error is not None)
+
+    with pytest.raises(TypeError):
+        writer.write('1;2,1.000,3,True\n')
+    writer.close()
@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+from history import HistoryIndex
+from scheduler import (
+    INITIAL_EASE,
+    MIN_EASE,
+    RETIRE_INTERVAL,
+    RETRY_INTERVAL,
+    ReviewScheduler,
+)
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return ReviewScheduler(
+        str(tmp_path / 'schedule.json'),
+        mean_response_time=10.,
+    )
+
+
+def test_pop_due_in_order_of_due_time(scheduler):
+    scheduler.add([3, 4], 5., False, now=200.)
+    scheduler.add([1, 2], 5., False, now=100.)
+    scheduler.add([5, 6], 5., False, now=300.)
+
+    assert scheduler.pop_due(now=100.) is None
+    assert scheduler.pop_due(now=1000.) == [1, 2]
+    assert scheduler.pop_due(now=1000.) == [3, 4]
+    assert scheduler.pop_due(now=1000.) == [5, 6]
+    assert scheduler.pop_due(now=1000.) is None
+
+
+def test_rescheduled_problem_is_popped_once(scheduler):
+    scheduler.add([1, 2], 5., False, now=0.)
+    scheduler.add([1, 2], 5., False, now=10.)
+
+    assert scheduler.pop_due(now=1000.) == [1, 2]
+    assert scheduler.pop_due(now=1000.) is None
+
+
+def test_only_incorrect_or_slow_problems_are_scheduled(scheduler):
+    scheduler.add([1, 2], 5., True, now=0.)
+    assert len(scheduler) == 0
+
+    scheduler.add([3, 4], 100., True, now=0.)
+    assert len(scheduler) == 1
+
+
+def test_reschedule(scheduler):
+    scheduler.add([1, 2], 10., False, now=0.)
+    review = scheduler.reviews['1;2']
+    assert (review.due, review.interval) == (RETRY_INTERVAL, RETRY_INTERVAL)
+    assert review.ease == pytest.approx(INITIAL_EASE - .2)
+    assert (review.lapses, review.reviews) == (1, 1)
+
+    scheduler.add([1, 2], 10., True, now=1000.)
+    assert review.ease == pytest.approx(INITIAL_EASE - .15)
+    assert review.interval == pytest.approx(RETRY_INTERVAL * review.ease)
+    assert review.due == pytest.approx(1000. + review.interval)
+
+    interval = review.interval
+    scheduler.add([1, 2], 1000., True, now=2000.)
+    assert review.ease == pytest.approx(INITIAL_EASE - .3)
+    assert review.interval == pytest.approx(interval * MIN_EASE)
+
+    scheduler.add([1, 2], 10., False, now=3000.)
+    assert review.interval == RETRY_INTERVAL
+    assert review.lapses == 2
+
+
+def test_learned_problem_retires(scheduler):
+    scheduler.add([1, 2], 10., False, now=0.)
+    review = scheduler.reviews['1;2']
+    review.interval = RETIRE_INTERVAL
+
+    scheduler.add([1, 2], 1., True, now=10.)
+    assert len(scheduler) == 0
+    assert scheduler.pop_due(now=2 * RETIRE_INTERVAL) is None
+
+
+def test_save_and_load(scheduler):
+    scheduler.add([1, 2], 5., False, now=0.)
+    scheduler.add([3, -4], 5., False, now=10.)
+    scheduler.save()
+
+    loaded = ReviewScheduler.load(scheduler.filename)
+
+    assert loaded.mean_response_time == scheduler.mean_response_time
+    assert {
+        problem: review.to_list()
+        for problem, review in loaded.reviews.items()
+    } == {
+        problem: review.to_list()
+        for problem, review in scheduler.reviews.items()
+    }
+    assert loaded.pop_due(now=1000.) == [1, 2]
+    assert loaded.pop_due(now=1000.) == [3, -4]
+
+
+def test_restore_unanswered(scheduler):
+    scheduler.add([1, 2], 5., False, now=0.)
+    scheduler.add([3, 4], 5., False, now=10.)
+    assert scheduler.pop_due(now=1000.) == [1, 2]
+    assert scheduler.pop_due(now=1000.) == [3, 4]
+    scheduler.add([3, 4], 5., False, now=1000.)
+
+    scheduler.restore_unanswered()
+
+    assert scheduler.pop_due(now=1000.) == [1, 2]
+    assert scheduler.pop_due(now=1000.) is None
+
+
+def test_from_history(tmp_path):
+    history = HistoryIndex.from_columns({
+        'n_operands': np.array([2, 2, 2, 2]),
+        'operands': np.array([[1, 2], [3, 4], [3, 4], [5, 6]]),
+        'response_time': np.array([1., 1., 2., 10.]),
+        'correct': np.array([True, False, True, True]),
+    })
+    scheduler = ReviewScheduler.from_history(
+        history,
+        filename=str(tmp_path / 'schedule.json'),
+        now=0.,
+    )
+
+    assert scheduler.mean_response_time == pytest.approx(3.5)
+    assert sorted(scheduler.reviews) == ['3;4', '5;6']
+    assert scheduler.reviews['3;4'].lapses == 1
+    assert scheduler.reviews['3;4'].reviews == 2
@@ -0,0 +1,164 @@
+import threading
+
+import numpy as np
+import pytest
+
+import operation as op
+from skill import (
+    PRIOR_CORRECT,
+    PRIOR_ERRORS,
+    PRIOR_OPERATION_SECONDS,
+    SkillModel,
+)
+
+
+def random_problems(n_problems, seed=0):
+    np.random.seed(seed)
+    op_freq = np.ones(op.OPERATION_COUNT) / op.OPERATION_COUNT
+    return op.generate_mixed_problems(
+        n_problems,
+        op.digit_pair_prob(op_freq, op.add_op_index_to_digit_pairs),
+        .5,
+        op.digit_pair_prob(op_freq, op.sub_op_index_to_digit_pairs),
+        3,
+        3,
+    )
+
+
+def test_prior():
+    model = SkillModel()
+
+    np.testing.assert_allclose(
+        model.operation_seconds(), PRIOR_OPERATION_SECONDS
+    )
+    np.testing.assert_allclose(
+        model.error_rates(), PRIOR_ERRORS / (PRIOR_ERRORS + PRIOR_CORRECT)
+    )
+    np.testing.assert_allclose(
+        model.op_freq(), np.ones(op.OPERATION_COUNT) / op.OPERATION_COUNT
+    )
+
+
+def test_posterior_recovers_operation_seconds():
+    problems = random_problems(5000)
+    counts = op.operation_histograms(problems)
+    true_seconds = np.linspace(.2, 1.5, op.OPERATION_COUNT)
+    response_times = 2. + counts @ true_seconds
+    model = SkillModel()
+    model.add_columns({
+        'operands': problems,
+        'response_time': response_times,
+        'correct': np.ones(len(problems), dtype=bool),
+    })
+
+    performed = counts.sum(axis=0) > 100
+    np.testing.assert_allclose(
+        model.operation_seconds()[performed],
+        true_seconds[performed],
+        atol=.02,
+    )
+
+
+def test_errors_are_shared_by_the_operations_performed():
+    model = SkillModel()
+    counts = np.zeros((2, op.OPERATION_COUNT))
+    counts[0, [1, 2]] = [1, 3]
+    counts[1, 1] = 2
+    model.add_counts(counts, np.array([5., 5.]), np.array([False, True]))
+
+    np.testing.assert_allclose(
+        model.errors[[1, 2]], PRIOR_ERRORS + np.array([.25, .75])
+    )
+    np.testing.assert_allclose(
+        model.correct[[1, 2]], PRIOR_CORRECT + np.array([1., 0.])
+    )
+    assert model.error_rates()[2] > model.error_rates()[0]
+
+
+def test_add_matches_add_columns():
+    problems = random_problems(50)
+    response_times = np.random.RandomState(1).uniform(1., 10., 50)
+    correct = np.random.RandomState(2).random_sample(50) < .8
+
+    one_by_one = SkillModel()
+    for operands, response_time, is_correct in zip(
+            problems.tolist(), response_times, correct
+    ):
+        one_by_one.add(operands, response_time, is_correct)
+    together = SkillModel()
+    together.add_columns({
+        'operands': problems,
+        'response_time': response_times,
+        'correct': correct,
+    })
+
+    np.testing.assert_allclose(one_by_one.precision, together.precision)
+    np.testing.assert_allclose(one_by_one.errors, together.errors)
+    np.testing.assert_allclose(one_by_one.op_freq(), together.op_freq())
+
+
+def test_op_freq_favours_weak_operations():
+    model = SkillModel()
+    counts = np.zeros((20, op.OPERATION_COUNT))
+    counts[:, 5] = 1
+    model.add_counts(counts, np.full(20, 5.), np.zeros(20, dtype=bool))
+    op_freq = model.op_freq()
+
+    assert op_freq.sum() == pytest.approx(1.)
+    assert op_freq.argmax() == 5
+    assert op_freq.min() > 0
+    # digit_pair_prob checks that it gets a distribution
+    for op_index_to_digit_pairs in (
+            op.add_op_index_to_digit_pairs,
+            op.sub_op_index_to_digit_pairs,
+    ):
+        prob = op.digit_pair_prob(op_freq, op_index_to_digit_pairs)
+        assert prob.sum() == pytest.approx(1.)
+
+
+def test_concurrent_updates_and_sampling():
+    problems = random_problems(400).tolist()
+    model = SkillModel()
+    errors = []
+
+    def add_results(thread_n):
+        try:
+            for operands in problems[thread_n::4]:
+                model.add(operands, 3., len(operands) % 2 == 0)
+        except Exception as e:
+            errors.append(e)
+
+    def sample():
+        try:
+            for _ in range(200):
+                op_freq = model.op_freq()
+                add_sampler = op.compile_digit_pair_sampler(
+                    op_freq, op.add_op_index_to_digit_pairs
+                )
+                sub_sampler = op.compile_digit_pair_sampler(
+                    op_freq, op.sub_op_index_to_digit_pairs
+                )
+                operands = op.generate_sampled_problem(
+                    add_sampler, .5, sub_sampler, 4, 3
+                )
+                assert sum(operands) >= 0
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=add_results, args=(thread_n,))
+        for thread_n in range(4)
+    ] + [threading.Thread(target=sample) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(op._compiled_samplers) <= op.MAX_COMPILED_SAMPLERS
+    expected = SkillModel()
+    for operands in problems:
+        expected.add(operands, 3., len(operands) % 2 == 0)
+    np.testing.assert_allclose(model.precision, expected.precision)
+    np.testing.assert_allclose(model.errors, expected.errors)
+    np.testing.assert_allclose(model.op_freq(), expected.op_freq())
@@ -0,0 +1,146 @@
+import os
+import shutil
+import time
+
+import pygame
+import pytest
+
+import speech
+from speech import (
+    SPEECH_EVENT,
+    NumberSpeech,
+    SpeechBackend,
+    SpeechCache,
+    SpeechPlayer,
+    ToneBackend,
+)
+
+
+class Mp3Backend(SpeechBackend):
+    name = 'mp3'
+    extension = '.mp3'
+
+    def __init__(self):
+        self.synthesized = []
+
+    def synthesize(self, text, language, filename):
+        self.synthesized.append(text)
+        with open(filename, 'wb') as f:
+            f.write(text.encode('utf-8'))
+
+
+def test_cache_synthesizes_once(tmp_path):
+    backend = Mp3Backend()
+    cache = SpeechCache(backend, directory=str(tmp_path))
+
+    filename = cache.get('twelve', 'en')
+    assert cache.get('twelve', 'en') == filename
+    assert backend.synthesized == ['twelve']
+    assert os.listdir(str(tmp_path)) == [os.path.basename(filename)]
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = SpeechCache(Mp3Backend(), directory=str(tmp_path), max_bytes=10)
+    old = cache.get('aaaa', 'en')
+    os.utime(old, (0, 0))
+    # being synthesized by another thread
+    (tmp_path / 'partial.part.mp3').write_bytes(b'x' * 100)
+    cache.get('bbbb', 'en')
+    new = cache.get('cccc', 'en')
+
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+    assert (tmp_path / 'partial.part.mp3').exists()
+
+
+def test_sound_of_decodable_backend_is_the_cached_file(tmp_path):
+    cache = SpeechCache(ToneBackend(), directory=str(tmp_path))
+
+    assert cache.can_make_sounds()
+    assert cache.sound('1', 'en') == cache.get('1', 'en')
+
+
+def test_sound_converts_once(tmp_path, monkeypatch):
+    backend = Mp3Backend()
+    cache = SpeechCache(backend, directory=str(tmp_path))
+    conversions = []
+
+    def convert(command):
+        conversions.append(command)
+        shutil.copy(command[-2], command[-1])
+
+    monkeypatch.setattr(speech.subprocess, 'check_call', convert)
+    filename = cache.sound('seven', 'en')
+
+    assert filename.endswith('.wav')
+    assert cache.sound('seven', 'en') == filename
+    assert len(conversions) == 1
+    assert os.listdir(str(tmp_path)) == [os.path.basename(filename)]
+
+
+def test_number_speech_without_converter_fails_visibly(
+        tmp_path,
+        monkeypatch,
+        caplog,
+):
+    backend = Mp3Backend()
+    monkeypatch.setattr(speech.shutil, 'which', lambda name: None)
+    number_speech = NumberSpeech(
+        'en', SpeechCache(backend, directory=str(tmp_path))
+    )
+    number_speech.load_in_background()
+
+    assert number_speech.failed
+    assert not number_speech.ready
+    assert backend.synthesized == []
+    assert 'spoken whole' in caplog.text
+
+
+@pytest.fixture
+def pygame_audio(monkeypatch):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    monkeypatch.setenv('SDL_AUDIODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.mixer.init()
+    yield
+    pygame.mixer.quit()
+    pygame.display.quit()
+
+
+def speech_events(timeout):
+    events = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        events += pygame.event.get(SPEECH_EVENT)
+        time.sleep(.01)
+    return events
+
+
+@pytest.mark.parametrize('n_channels', [8, 0])
+def test_speech_player_reports_progress(tmp_path, pygame_audio, n_channels):
+    pygame.mixer.set_num_channels(n_channels)
+    player = SpeechPlayer(
+        SpeechCache(ToneBackend(), directory=str(tmp_path)),
+        compose_numbers=False,
+    )
+    player.speak(['1', '2'], 'en', inter_text_pause=0.)
+    events = speech_events(1.)
+
+    assert [(event.spoken, event.total) for event in events] == [
+        (1, 2), (2, 2),
+    ]
+    assert all(event.utterance == player.utterance for event in events)
+    assert not player.speaking
+
+
+def test_stopped_speech_player_reports_nothing(tmp_path, pygame_audio):
+    player = SpeechPlayer(
+        SpeechCache(ToneBackend(), directory=str(tmp_path)),
+        compose_numbers=False,
+    )
+    player.speak(['1', '2'], 'en', inter_text_pause=5.)
+    first = speech_events(.5)
+    player.stop()
+
+    assert len(first) == 1
+    assert speech_events(.3) == []